@@ -0,0 +1,125 @@
+"""Fake HID transport for benchmarks.
+
+Installs a transport that reports a number of supported keyboards and records
+every report written to them, so the library can be benchmarked without a
+physical keyboard.
+
+Example:
+    >>> with installed(keyboards=2) as reports:
+    ...     get_keyboards()[0].apply_color((255, 0, 0))
+    >>> len(reports)
+    8
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from regium_klavye.transports import Transport, get_transport, set_transport
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+RK68 = (0x258A, 0x005E, 1)
+"""Vendor ID, product ID and interface of the keyboard reported by default."""
+
+Report = tuple[float, bytes, bytes]
+"""Time the report was written at, the device path and the report."""
+
+
+class FakeDevice:
+    """Open device that records reports instead of writing them.
+
+    Args:
+        reports: List every written report is appended to.
+        path: Path the device was opened with.
+    """
+
+    __slots__ = ("reports", "path")
+
+    def __init__(self, reports: list[Report], path: bytes):
+        self.reports = reports
+        self.path: bytes | None = path
+
+    def send_feature_report(self, data: bytes | bytearray) -> int:  # noqa: D102
+        if self.path is None:
+            raise ValueError("not open")
+        self.reports.append((time.perf_counter(), self.path, bytes(data)))
+        return len(data)
+
+    write = send_feature_report
+
+    def close(self) -> None:  # noqa: D102
+        self.path = None
+
+
+def fake_devices(keyboards: int = 1, other_devices: int = 0) -> list[dict]:
+    """Get enumeration results with supported keyboards and unrelated devices."""
+    vid, pid, interface = RK68
+    devices = [
+        {
+            "vendor_id": vid,
+            "product_id": pid,
+            "interface_number": interface,
+            "path": b"/dev/fake-keyboard%d" % index,
+        }
+        for index in range(keyboards)
+    ]
+    devices.extend(
+        {
+            "vendor_id": 0x1000 + index,
+            "product_id": 0x0001,
+            "interface_number": 0,
+            "path": b"/dev/fake-device%d" % index,
+        }
+        for index in range(other_devices)
+    )
+    return devices
+
+
+class FakeTransport(Transport):
+    """Transport enumerating fake devices and opening :class:`FakeDevice`.
+
+    Args:
+        devices: Devices reported by enumeration, see :func:`fake_devices`.
+        reports: List every written report is appended to.
+    """
+
+    __slots__ = ("devices", "reports")
+
+    name = "fake"
+
+    def __init__(self, devices: list[dict], reports: list[Report]):
+        self.devices = devices
+        self.reports = reports
+
+    def enumerate(self, vid: int = 0, pid: int = 0) -> list[dict]:  # noqa: D102
+        return [
+            dict(device)
+            for device in self.devices
+            if vid in (0, device["vendor_id"]) and pid in (0, device["product_id"])
+        ]
+
+    def open(self, path: bytes) -> FakeDevice:  # noqa: D102
+        return FakeDevice(self.reports, path)
+
+
+@contextmanager
+def installed(keyboards: int = 1, other_devices: int = 0) -> Iterator[list[Report]]:
+    """Use a :class:`FakeTransport` for the duration of the block.
+
+    Args:
+        keyboards: Number of supported keyboards reported by enumeration.
+        other_devices: Number of unsupported devices reported by enumeration.
+
+    Yields:
+        List of every report written while the fakes are installed.
+    """
+    reports: list[Report] = []
+    original = get_transport()
+    set_transport(FakeTransport(fake_devices(keyboards, other_devices), reports))
+    try:
+        yield reports
+    finally:
+        set_transport(original)
@@ -0,0 +1,117 @@
+"""Command line startup time benchmark.
+
+Runs commands that dont need any device in fresh interpreters and reports the
+median wall time of each. It also fails if any of them imports a module that is
+slow to import or only needed to talk to devices, which is the usual way startup
+regressions creep in.
+
+Usage:
+    python benchmarks/startup.py [--runs RUNS] [--max-ms MAX_MS]
+"""
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS: dict[str, list[str]] = {
+    "import": ["-c", "import regium_klavye"],
+    "help": ["-m", "regium_klavye", "--help"],
+    "udev": ["-m", "regium_klavye", "udev", "-r"],
+    "list-all": ["-m", "regium_klavye", "list", "--all"],
+}
+
+FORBIDDEN_IMPORTS = (
+    "hid",
+    "numpy",
+    "asyncio",
+    "concurrent.futures",
+    "regium_klavye.rkapi",
+    "regium_klavye.keyboard_parts",
+)
+"""Modules that commands without devices must not import."""
+
+
+def _imported_modules(args: list[str]) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def _time_command(args: list[str], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *args],
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(runs: int = 10) -> dict[str, dict[str, float | list[str]]]:
+    """Benchmark every command.
+
+    Returns:
+        Median and minimum time in milliseconds and forbidden modules imported,
+        for each command name.
+    """
+    results: dict[str, dict[str, float | list[str]]] = {}
+    for name, args in COMMANDS.items():
+        timings = _time_command(args, runs)
+        imported = _imported_modules(args)
+        results[name] = {
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+            "forbidden_imports": sorted(
+                module for module in FORBIDDEN_IMPORTS if module in imported
+            ),
+        }
+    return results
+
+
+def main() -> None:  # noqa: D103
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="Fail if the median of any command is above this value.",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for name, result in run(args.runs).items():
+        print(
+            f"{name:<10} median {result['median_ms']:7.1f} ms  "
+            f"min {result['min_ms']:7.1f} ms"
+        )
+        if result["forbidden_imports"]:
+            failed = True
+            print(f"  imports {', '.join(result['forbidden_imports'])}")
+        if args.max_ms is not None and result["median_ms"] > args.max_ms:
+            failed = True
+            print(f"  median is above {args.max_ms} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Benchmarks of the encode path, report writes, enumeration and startup.
+
+Keyboards are faked with :mod:`fake_hid`, so no physical keyboard is needed.
+Report pacing is disabled while benchmarking, so apply benchmarks measure the
+time spent in the library rather than the delay between reports.
+
+Results are printed as a table, and can be written as JSON and compared with a
+stored baseline. The comparison fails if any benchmark got slower than the
+tolerance allows. Changes to the encode path should come with numbers:
+
+    python benchmarks/suite.py --compare benchmarks/baseline.json
+
+Usage:
+    python benchmarks/suite.py [--output PATH] [--compare PATH] [--save PATH]
+        [--tolerance TOLERANCE] [--only NAME ...] [--skip-startup]
+"""
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import fake_hid  # noqa: E402
+import startup  # noqa: E402
+
+if TYPE_CHECKING:
+    from typing import Any, Callable
+
+    from regium_klavye import Keyboard
+
+Result = dict[str, float]
+"""Median and minimum time per call in microseconds, and extra measurements."""
+
+BENCHMARKS: dict[str, Callable[[], Result]] = {}
+
+
+def benchmark(func: Callable[[], Result]) -> Callable[[], Result]:
+    """Register a benchmark under the name of the function."""
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def measure(func: Callable[[], Any], number: int = 200, repeat: int = 15) -> Result:
+    """Time a function, the median of each repeat is less sensitive to noise.
+
+    Args:
+        func: Function to call.
+        number: Calls timed together in each repeat.
+        repeat: Number of repeats.
+    """
+    func()  # Warm up caches such as compiled profiles.
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "median_us": round(statistics.median(timings), 3),
+        "min_us": round(min(timings), 3),
+    }
+
+
+def _keyboard() -> Keyboard:
+    from regium_klavye.rkapi import get_keyboard
+
+    keyboard = get_keyboard(*fake_hid.RK68[:2])
+    keyboard.report_delay = 0
+    return keyboard
+
+
+@benchmark
+def create_keyboard() -> Result:
+    """Create a keyboard object, done for every keyboard found."""
+    from regium_klavye.keyboard_parts import Keyboard
+
+    vid, pid = fake_hid.RK68[:2]
+    return measure(lambda: Keyboard(vid, pid, b"benchmark"))
+
+
+@benchmark
+def set_color() -> Result:
+    """Set one color for every key."""
+    keyboard = _keyboard()
+    return measure(lambda: keyboard.set_color((255, 0, 0)))
+
+
+@benchmark
+def set_key_color_all_keys() -> Result:
+    """Set the color of every key one at a time."""
+    keyboard = _keyboard()
+    keys = keyboard.frame_keys
+
+    def set_keys() -> None:
+        for key in keys:
+            keyboard.set_key_color(key, (0, 255, 0))
+
+    return measure(set_keys, number=20)
+
+
+@benchmark
+def update_keys_all_keys() -> Result:
+    """Set the color of every key with a single bulk update."""
+    keyboard = _keyboard()
+    colors = dict.fromkeys(keyboard.frame_keys, (0, 255, 0))
+    return measure(lambda: keyboard.update_keys(colors))
+
+
+@benchmark
+def set_group_color() -> Result:
+    """Set the color of a row of keys."""
+    keyboard = _keyboard()
+    return measure(lambda: keyboard.set_group_color("row1", (0, 0, 255)))
+
+
+@benchmark
+def color_data() -> Result:
+    """Encode colors of every key into the reports."""
+    keyboard = _keyboard()
+    keyboard.set_color((0, 0, 255))
+    return measure(keyboard._color_data)
+
+
+@benchmark
+def set_frame() -> Result:
+    """Set the color of every key with a frame."""
+    keyboard = _keyboard()
+    frame = bytes(range(256)) * (len(keyboard.frame_keys) * 3 // 256 + 1)
+    frame = frame[: len(keyboard.frame_keys) * 3]
+    return measure(lambda: keyboard.set_frame(frame))
+
+
+@benchmark
+def set_animation() -> Result:
+    """Build an animation report with every parameter provided."""
+    keyboard = _keyboard()
+    anim_name = next(iter(keyboard.anim_options))
+    options = {
+        param: definition["default"]
+        for param, definition in keyboard.anim_params.items()
+    }
+    return measure(lambda: keyboard.set_animation(anim_name, options))
+
+
+def _apply(
+    keyboard: Keyboard, apply: Callable[[], Any], number: int = 200, repeat: int = 15
+) -> Result:
+    with fake_hid.installed() as reports, keyboard:
+        result = measure(apply, number, repeat)
+    # Reports written by each call, the warm up call included.
+    result["reports"] = round(len(reports) / (number * repeat + 1), 3)
+    return result
+
+
+@benchmark
+def apply_color_full() -> Result:
+    """Encode and write every color report."""
+    keyboard = _keyboard()
+    return _apply(keyboard, lambda: keyboard.apply_color((255, 0, 0), force=True))
+
+
+@benchmark
+def apply_color_unchanged() -> Result:
+    """Apply colors that were already written, nothing is written."""
+    keyboard = _keyboard()
+    return _apply(keyboard, lambda: keyboard.apply_color((255, 0, 0)))
+
+
+@benchmark
+def apply_color_one_key() -> Result:
+    """Change a single key and write the reports that changed."""
+    keyboard = _keyboard()
+    key = keyboard.frame_keys[0]
+    colors = iter([(255, 0, 0), (0, 255, 0)] * 10000)
+
+    def apply() -> None:
+        keyboard.set_key_color(key, next(colors))
+        keyboard.apply_color()
+
+    return _apply(keyboard, apply)
+
+
+@benchmark
+def apply_transaction() -> Result:
+    """Change every key, a group and a key, then write them as one update."""
+    keyboard = _keyboard()
+    colors = iter([(255, 0, 0), (0, 255, 0)] * 10000)
+
+    def apply() -> None:
+        with keyboard.transaction():
+            keyboard.set_color(next(colors))
+            keyboard.set_group_color("arrows", (0, 0, 255))
+            keyboard.set_key_color("ESC", (255, 255, 255))
+            keyboard.apply_color()
+
+    return _apply(keyboard, apply)
+
+
+@benchmark
+def get_keyboards() -> Result:
+    """Enumerate keyboards among many unrelated devices."""
+    from regium_klavye.rkapi import get_keyboards
+
+    # A typical system has far more HID devices than keyboards.
+    with fake_hid.installed(keyboards=1, other_devices=40):
+        return measure(get_keyboards, number=20)
+
+
+@benchmark
+def get_keyboards_monitored() -> Result:
+    """Get keyboards from the device registry while it monitors hotplug."""
+    from regium_klavye.devices import DEVICES
+    from regium_klavye.rkapi import get_keyboards
+
+    with fake_hid.installed(keyboards=1, other_devices=40):
+        if not DEVICES.start():
+            return {}
+        try:
+            return measure(get_keyboards, number=20)
+        finally:
+            DEVICES.stop()
+
+
+def run_startup(runs: int = 10) -> dict[str, Result]:
+    """Run the startup benchmarks in fresh interpreters, in microseconds."""
+    return {
+        f"startup_{name}": {
+            "median_us": round(result["median_ms"] * 1000, 3),  # type: ignore
+            "min_us": round(result["min_ms"] * 1000, 3),  # type: ignore
+        }
+        for name, result in startup.run(runs).items()
+    }
+
+
+def run(names: list[str] | None = None, skip_startup: bool = False) -> dict[str, Any]:
+    """Run benchmarks and get the results in the JSON format.
+
+    Args:
+        names: Names of benchmarks to run, all of them by default.
+        skip_startup: Skip the startup benchmarks, which take the longest.
+    """
+    results: dict[str, Result] = {}
+    with fake_hid.installed():
+        for name, func in BENCHMARKS.items():
+            if names is None or name in names:
+                if result := func():
+                    results[name] = result
+    if not skip_startup and (names is None or "startup" in names):
+        results.update(run_startup())
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": "numpy" in sys.modules,
+        "results": results,
+    }
+
+
+def compare(
+    results: dict[str, Any], baseline: dict[str, Any], tolerance: float
+) -> list[str]:
+    """Compare results with a baseline.
+
+    The minimum of each benchmark is compared, it is the least affected by other
+    processes running on the machine.
+
+    Returns:
+        A line for each benchmark that got slower than the tolerance allows.
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        if (previous := baseline["results"].get(name)) is None:
+            continue
+        ratio = result["min_us"] / previous["min_us"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                f"{name} is {ratio:.2f}x slower "
+                f"({previous['min_us']:.1f} us -> {result['min_us']:.1f} us)"
+            )
+    return regressions
+
+
+def main() -> None:  # noqa: D103
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="Write results as JSON to this path.")
+    parser.add_argument("--compare", help="Baseline JSON to compare with.")
+    parser.add_argument("--save", help="Store results as a new baseline.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed slow down compared to the baseline, 0.25 is 25%%.",
+    )
+    parser.add_argument(
+        "--only", nargs="+", help='Benchmarks to run, "startup" for startup ones.'
+    )
+    parser.add_argument("--skip-startup", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.only, args.skip_startup)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+
+    for name, result in results["results"].items():
+        line = (
+            f"{name:<26} median {result['median_us']:10.1f} us  "
+            f"min {result['min_us']:10.1f} us"
+        )
+        if "reports" in result:
+            line += f"  {result['reports']:.2f} reports"
+        if baseline and (previous := baseline["results"].get(name)):
+            line += f"  {result['min_us'] / previous['min_us']:5.2f}x"
+        print(line)
+
+    for path in (args.output, args.save):
+        if path:
+            with open(path, "w") as file:
+                json.dump(results, file, indent=2, sort_keys=True)
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(regression)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
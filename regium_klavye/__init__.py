@@ -5,6 +5,46 @@ keymapping for supported keyboards.
 For a full list of supported actions please read the documentation.
 """
 
-from . import rkapi, udev
-from .keyboard_parts import AnimationNotSetError, Key, Keyboard, KeyNotFoundError
-from .keyboard_profiles import PROFILES
+from importlib import import_module
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from . import effects, rkapi, udev
+    from .keyboard_parts import (
+        AnimationNotSetError,
+        AsyncKeyboard,
+        GroupNotFoundError,
+        Key,
+        Keyboard,
+        KeyNotFoundError,
+    )
+    from .keyboard_profiles import PROFILES
+
+# Attributes are imported on first access so that importing the package, which
+# also happens for every command line call, doesnt import hid or enumerate devices.
+_LAZY_ATTRIBUTES = {
+    "effects": ".effects",
+    "rkapi": ".rkapi",
+    "udev": ".udev",
+    "AnimationNotSetError": ".keyboard_parts",
+    "AsyncKeyboard": ".keyboard_parts",
+    "GroupNotFoundError": ".keyboard_parts",
+    "Key": ".keyboard_parts",
+    "Keyboard": ".keyboard_parts",
+    "KeyNotFoundError": ".keyboard_parts",
+    "PROFILES": ".keyboard_profiles",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name: str):
+    try:
+        module_name = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    module = import_module(module_name, __name__)
+    value = module if module_name == f".{name}" else getattr(module, name)
+    globals()[name] = value
+    return value
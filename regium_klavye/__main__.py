@@ -3,16 +3,23 @@ from __future__ import annotations
 
 import os
 import platform
+import signal
 import sys
-from argparse import ArgumentParser
+from argparse import SUPPRESS, ArgumentParser, ArgumentTypeError
 from enum import Enum
 from typing import TYPE_CHECKING
 
-from .rkapi import PROFILES, KeyboardNotFoundError, get_keyboards
+from .keyboard_profiles import PROFILES
 from .udev import UDEV_PATH, get_udev, is_rules_up_to_date, setup_rules
 
+# Modules that import hid, enumerate devices or are otherwise slow to import are
+# imported in the handlers that need them. Commands such as "udev" or "--help" are
+# often called from scripts and hotkeys, where startup time dominates.
+
 if TYPE_CHECKING:
-    from typing import Any, NoReturn
+    from typing import Any, Callable, Iterable, NoReturn
+
+    from .keyboard_parts import Keyboard
 
 
 class NamedColors(Enum):
@@ -45,6 +52,46 @@ def _parse_color(color: tuple[str] | str) -> list[int]:
     )
 
 
+def _parse_device(device: str) -> int | str:
+    if device == "all":
+        return device
+    try:
+        return int(device)
+    except ValueError:
+        raise ArgumentTypeError('Device must be a number or "all".')
+
+
+def _selected_keyboards(choices: dict[str, Any]) -> list[Keyboard]:
+    if choices["device"] == "all":
+        return choices["keyboards"]
+    return [choices["keyboards"][choices["device"]]]
+
+
+def _get_keyboards() -> list[Keyboard]:
+    from .rkapi import KeyboardNotFoundError, get_keyboards
+
+    try:
+        return get_keyboards()
+    except KeyboardNotFoundError:
+        sys.exit("No supported keyboards detected.")
+    except ModuleNotFoundError as error:
+        sys.exit(str(error))
+
+
+def _apply(keyboards: list[Keyboard], command: Callable[[Keyboard], Any]) -> NoReturn:
+    """Apply a command to keyboards in parallel and exit with their errors."""
+    from .rkapi import fan_out
+
+    errors = [
+        f"{result['keyboard'].long_name}: {result['error']}"
+        for result in fan_out(keyboards, command)
+        if result["error"] is not None
+    ]
+    if errors:
+        sys.exit("\n".join(errors))
+    sys.exit()
+
+
 def _check_linux(write=False) -> None:
     """Perform checks for Linux based systems."""
     if platform.system() != "Linux":
@@ -126,19 +173,37 @@ def _handle_list(list_parser: ArgumentParser, choices: dict[str, Any]) -> NoRetu
 
 
 def _handle_set_color(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
-    keyboard = choices["keyboards"][choices["device"]]
-    if not keyboard.has_rgb:
-        sys.exit(f"{keyboard.long_name} does not support color changing.")
+    keyboards = _selected_keyboards(choices)
+    for keyboard in keyboards:
+        if not keyboard.has_rgb:
+            sys.exit(f"{keyboard.long_name} does not support color changing.")
 
     color = tuple([val for val in choices["color"]])
-    keyboard.apply_color(color)
+    _apply(keyboards, lambda keyboard: keyboard.apply_color(color))
 
-    sys.exit()
+
+def _handle_set_key(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    from .keyboard_parts import GroupNotFoundError, KeyNotFoundError
+
+    if not choices["keys"] and not choices["group"]:
+        sys.exit("Provide at least one key or group.")
+
+    keyboards = _selected_keyboards(choices)
+    color = tuple(choices["color"])
+    for keyboard in keyboards:
+        if not keyboard.has_rgb:
+            sys.exit(f"{keyboard.long_name} does not support color changing.")
+        try:
+            keyboard.update_keys(dict.fromkeys(choices["keys"], color))
+            for group in choices["group"] or ():
+                keyboard.set_group_color(group, color)
+        except (KeyNotFoundError, GroupNotFoundError, ValueError) as error:
+            sys.exit(str(error))
+    _apply(keyboards, lambda keyboard: keyboard.apply_color())
 
 
 def _handle_set_anim(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
     keyboards = choices["keyboards"]
-    keyboard = choices["keyboards"][choices["device"]]
     if choices["animation"] is None:
         anim_info = "Below is a list of accepted animations for detected "
         "keyboards."
@@ -161,7 +226,10 @@ def _handle_set_anim(parser: ArgumentParser, choices: dict[str, Any]) -> NoRetur
 
             anim_options.append(explanation)
         print("\n".join(anim_options))
-    else:
+        sys.exit()
+
+    keyboards = _selected_keyboards(choices)
+    for keyboard in keyboards:
         if choices["animation"] not in keyboard.anim_options:
             sys.exit(f"Invalid animation provided for {keyboard.long_name}.")
         parsed_params: dict[str, int | list[int]] = {}
@@ -181,17 +249,502 @@ def _handle_set_anim(parser: ArgumentParser, choices: dict[str, Any]) -> NoRetur
                 'Run "regium_klavye set-anim" for a full list options '
                 "available for the keyboard."
             )
-        keyboard.apply_animation()
+    _apply(keyboards, lambda keyboard: keyboard.apply_animation())
+
+
+def _handle_calibrate(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    from .pacing import PACING_PATH, calibrate, save_report_delay
+
+    keyboards = _selected_keyboards(choices)
+    for keyboard in keyboards:
+        if not keyboard.has_rgb:
+            sys.exit(f"{keyboard.long_name} does not support color changing.")
+
+    verify = None
+    if choices["no_verify"] is False:
+
+        def verify(color: tuple[int, int, int], delay: float) -> bool:
+            name = {(255, 0, 0): "red", (0, 255, 0): "green", (0, 0, 255): "blue"}
+            answer = input(
+                f"[{delay * 1000:.1f} ms] Are all keys {name[color]}? [y/N] "
+            )
+            return answer.strip().lower() in ("y", "yes")
+
+    # Calibration is done one device at a time, it may require user input.
+    for keyboard in keyboards:
+        if choices["reset"] is True:
+            save_report_delay(keyboard.vid, keyboard.pid, None)
+            print(f"Removed the stored report delay for {keyboard.long_name}.")
+            continue
+
+        with keyboard:
+            delay = calibrate(keyboard, verify)
+
+        save_report_delay(keyboard.vid, keyboard.pid, delay)
+        print(
+            f"Report delay for {keyboard.long_name} set to {delay * 1000:.1f} ms "
+            f"and stored in {PACING_PATH}."
+        )
+    sys.exit()
+
+
+def _handle_record(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    try:
+        from . import effects
+    except ImportError:
+        sys.exit('Recording effects requires NumPy, install the "numpy" extra.')
+
+    keyboards = _selected_keyboards(choices)
+    if len(keyboards) != 1:
+        sys.exit("Recordings are made for a single device.")
+    keyboard = keyboards[0]
+    if not keyboard.has_custom_anim:
+        sys.exit(f"{keyboard.long_name} does not support custom animations.")
+
+    colors = [_parse_color(color) for color in choices["colors"] or ()]
+    colors = colors or [NamedColors.red.value, NamedColors.blue.value]
+    match choices["effect"]:
+        # Gradients only change when they move.
+        case "linear":
+            effect = effects.LinearGradient(keyboard, colors, speed=4)
+        case "radial":
+            effect = effects.RadialGradient(keyboard, colors, speed=4)
+        case "wave":
+            effect = effects.Wave(keyboard, colors)
+        case _:
+            effect = effects.Ripple(keyboard, colors, interval=2)
+
+    try:
+        with keyboard.recorder(choices["path"]) as recorder:
+            keyboard.apply_custom_animation(effect, choices["fps"], choices["duration"])
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        sys.exit(str(error))
+    print(f"Recorded {recorder.frames} frames to {choices['path']}.")
+    sys.exit()
+
+
+def _handle_play(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    from .recording import Player, Recording
+
+    try:
+        recording = Recording(choices["path"])
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+
+    keyboards = _selected_keyboards(choices)
+    try:
+        players = [
+            Player(keyboard, recording, choices["speed"]) for keyboard in keyboards
+        ]
+    except ValueError as error:
+        sys.exit(str(error))
+
+    from threading import Thread
+
+    loops = None if choices["loop"] else 1
+    errors: list[str] = []
+
+    def play(player: Player) -> None:
+        try:
+            player.run(loops)
+        except Exception as error:
+            errors.append(f"{player.keyboard.long_name}: {error}")
+
+    # Players run on threads so an interrupt can stop all of them.
+    threads = [Thread(target=play, args=(player,)) for player in players]
+    with recording:
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            for player in players:
+                player.stop()
+            for thread in threads:
+                thread.join()
+
+    if errors:
+        sys.exit("\n".join(errors))
+    sys.exit()
+
+
+def _handle_audio(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    try:
+        from .audio import DEFAULT_COLORS, AudioVisualizer, open_source
+    except ImportError:
+        sys.exit('Audio reactive lighting requires NumPy, install the "numpy" extra.')
+
+    keyboards = _selected_keyboards(choices)
+    if len(keyboards) != 1:
+        sys.exit("Audio can only be shown on a single device.")
+    keyboard = keyboards[0]
+    if not keyboard.has_custom_anim:
+        sys.exit(f"{keyboard.long_name} does not support custom animations.")
+
+    colors = [_parse_color(color) for color in choices["colors"] or ()]
+    try:
+        with open_source(
+            choices["path"], choices["rate"], choices["channels"], choices["format"]
+        ) as source:
+            visualizer = AudioVisualizer(
+                keyboard, source, choices["fps"], colors or DEFAULT_COLORS
+            )
+            visualizer.run(choices["duration"])
+    except KeyboardInterrupt:
+        pass
+    except (OSError, ValueError) as error:
+        sys.exit(str(error))
+    sys.exit()
+
+
+def _handle_stream(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    from .stream import FrameStream, grid_size
+
+    keyboards = _selected_keyboards(choices)
+    if len(keyboards) != 1:
+        sys.exit("Frames can only be streamed to a single device.")
+    keyboard = keyboards[0]
+
+    if choices["print_order"]:
+        width, height = grid_size(keyboard)
+        print(f"{len(keyboard.frame_keys) * 3} bytes per frame in key order:")
+        print(" ".join(keyboard.frame_keys))
+        print(f"{width * height * 3} bytes per frame in the {width}x{height} grid.")
+        sys.exit()
+    if not keyboard.has_custom_anim:
+        sys.exit(f"{keyboard.long_name} does not support custom animations.")
+
+    try:
+        with FrameStream(keyboard, choices["path"], choices["grid"]) as stream:
+            stream.run()
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        sys.exit(str(error))
+    sys.exit()
+
+
+BATCH_COMMANDS = (
+    "list",
+    "set-color",
+    "set-key",
+    "set-anim",
+    "record",
+    "play",
+    "audio",
+    "stream",
+)
+"""Commands that can be used in a batch."""
+
+
+def _handle_batch(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    """Run every line of a script as a command of its own.
+
+    Lines are parsed with the main parser, so they are written like the arguments
+    of a call to regium_klavye. Keyboards are detected once and each device is
+    opened the first time a line uses it, the session is kept until the end.
+    """
+    import shlex
+    from contextlib import ExitStack
+
+    try:
+        script = sys.stdin if choices["path"] == "-" else open(choices["path"])
+    except OSError as error:
+        sys.exit(str(error))
+    with script:
+        lines = script.readlines()
+
+    # Lines target the device given to batch unless they provide their own.
+    parser.set_defaults(device=choices["device"])
+    keyboards = choices["keyboards"]
+    failed = 0
+    with ExitStack() as sessions:
+        for number, line in enumerate(lines, 1):
+            try:
+                if not (args := shlex.split(line, comments=True)):
+                    continue
+                line_choices = vars(parser.parse_args(args))
+                if (command := line_choices["command"]) is None:
+                    sys.exit("No command provided.")
+                if command not in BATCH_COMMANDS:
+                    sys.exit(f"{command} cannot be used in a batch.")
+                if line_choices.get("color", False):
+                    line_choices["color"] = _parse_color(line_choices["color"])
+                line_choices["keyboards"] = keyboards
+                if command != "list" and _valid_device(line_choices):
+                    for keyboard in _selected_keyboards(line_choices):
+                        if not keyboard.is_open:
+                            sessions.enter_context(keyboard)
+                _run(parser, line_choices)
+            except SystemExit as result:
+                # Handlers exit when they are done, a message or non zero code
+                # means the command failed.
+                if result.code is None or result.code == 0:
+                    continue
+                error = result.code
+            except Exception as _error:
+                error = _error
+
+            failed += 1
+            # Argument errors are already printed by the parser.
+            if isinstance(error, int):
+                print(f"Line {number} failed.", file=sys.stderr)
+            else:
+                print(f"Line {number}: {error}", file=sys.stderr)
+            if choices["stop_on_error"]:
+                break
+
+    if failed:
+        sys.exit(f"{failed} of the commands failed.")
+    sys.exit()
+
+
+def _needs_keyboards(choices: dict[str, Any]) -> bool:
+    match choices["command"]:
+        case "list":
+            return not choices["all"]
+        case (
+            "set-color"
+            | "set-key"
+            | "set-anim"
+            | "calibrate"
+            | "record"
+            | "play"
+            | "audio"
+            | "stream"
+            | "batch"
+        ):
+            return True
+    return False
+
+
+def _add_anim_params(
+    set_anim_parser: ArgumentParser, anim_params: Iterable[dict[str, int]]
+):
+    """Add animation parameters supported by any of the keyboards.
+
+    Args:
+        set_anim_parser: Parser to add the parameters to.
+        anim_params: Number of values each parameter takes, for each keyboard.
+    """
+    # Parameters taking more than a single value accept multiple arguments.
+    multiple_values: dict[str, bool] = {}
+    for params in anim_params:
+        for param, value_count in params.items():
+            is_multiple = value_count != 1
+            multiple_values[param] = multiple_values.get(param, False) or is_multiple
+
+    for param, is_multiple in multiple_values.items():
+        set_anim_parser.add_argument(
+            "--" + param,
+            required=False,
+            default=False,
+            **({"nargs": "+"} if is_multiple else {}),
+        )
+
+
+def _daemon_request(
+    request: dict[str, Any], no_daemon: bool = False
+) -> dict[str, Any] | None:
+    """Send a request to the daemon, None if it isnt running or was disabled.
+
+    A daemon that cant be reached, such as one that timed out, is also None so
+    the devices are used directly instead.
+
+    Args:
+        request: Request to send.
+        no_daemon: The daemon was disabled with --no-daemon.
+    """
+    if no_daemon:
+        return None
+
+    from .daemon import send_request
+    from .instrumentation import timed
+
+    try:
+        with timed("daemon"):
+            return send_request(request)
+    except OSError as error:
+        print(f"Failed to communicate with the daemon: {error}", file=sys.stderr)
+        return None
+
+
+def _key_frames(choices: dict[str, Any]) -> list[dict[str, Any]] | None:
+    """Get set-frame requests for a set-key command, None if it cant be forwarded.
+
+    Like a set-key command without the daemon, keys that arent set are turned off.
+    """
+    if not choices["keys"] and not choices["group"]:
+        return None
+    response = _daemon_request({"command": "describe"}, choices["no_daemon"])
+    if response is None or not response["ok"]:
+        return None
+
+    described = response["result"]
+    if choices["device"] == "all":
+        devices = list(range(len(described)))
+    elif choices["device"] < len(described):
+        devices = [choices["device"]]
+    else:
+        return None
+
+    color = bytes(choices["color"])
+    requests: list[dict[str, Any]] = []
+    for device in devices:
+        keyboard = described[device]
+        if not keyboard["has_rgb"]:
+            sys.exit(f"{keyboard['long_name']} does not support color changing.")
+        positions = {key: index for index, key in enumerate(keyboard["frame_keys"])}
+        labels = list(choices["keys"])
+        for group in choices["group"] or ():
+            if group not in keyboard["groups"]:
+                sys.exit(f"The {group} group was not found on {keyboard['name']}.")
+            labels.extend(keyboard["groups"][group])
+
+        frame = bytearray(len(positions) * 3)
+        for label in labels:
+            if (position := positions.get(label)) is None:
+                sys.exit(f"The {label} key was not found on {keyboard['name']}.")
+            frame[position * 3 : position * 3 + 3] = color
+        requests.append(
+            {"command": "set-frame", "device": device, "frame": frame.hex()}
+        )
+    return requests
+
+
+def _forward(choices: dict[str, Any], anim_params: Iterable[str]) -> None:
+    """Forward a device command to the daemon, exits if the daemon handled it."""
+    match choices["command"]:
+        case "set-color":
+            request = {"command": "set-color", "color": choices["color"]}
+        case "set-key":
+            if (requests := _key_frames(choices)) is None:
+                return
+            errors: list[str] = []
+            for request in requests:
+                if (response := _daemon_request(request, choices["no_daemon"])) is None:
+                    return
+                if not response["ok"]:
+                    errors.append(response["error"])
+            sys.exit("\n".join(errors) or None)
+        case "set-anim" if choices["animation"] is not None:
+            params: dict[str, list[int]] = {}
+            for param in anim_params:
+                if choices.get(param, False) is False:
+                    continue
+                try:
+                    params[param] = [int(_param) for _param in choices[param]]
+                except ValueError:
+                    sys.exit(f"Invalid argument provided for {param}.")
+            request = {
+                "command": "set-anim",
+                "animation": choices["animation"],
+                "params": params,
+            }
+        case _:
+            return
+
+    request["device"] = choices["device"]
+    if (response := _daemon_request(request, choices["no_daemon"])) is None:
+        return
+    if not response["ok"]:
+        sys.exit(response["error"])
+    sys.exit()
+
+
+def _handle_daemon(daemon_parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    from .daemon import SOCKET_PATH, Daemon
+
+    if choices["stop"] is True or choices["status"] is True:
+        response = _daemon_request(
+            {"command": "stop" if choices["stop"] else "ping"}, choices["no_daemon"]
+        )
+        if response is None:
+            sys.exit("Daemon is not running.")
+        if choices["status"] is True:
+            print(f"Daemon is running with PID {response['result']['pid']}.")
+        sys.exit()
+
+    if _daemon_request({"command": "ping"}, choices["no_daemon"]) is not None:
+        sys.exit(f"A daemon is already running at {SOCKET_PATH}.")
+
+    daemon = Daemon(metrics_path=choices["metrics_file"])
+    try:
+        keyboards = daemon.keyboards
+    except ModuleNotFoundError as error:
+        sys.exit(str(error))
+    if not keyboards:
+        sys.exit("No supported keyboards detected.")
+
+    def terminate(*_) -> NoReturn:
+        # Exit through an exception so the socket is removed, only once.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        sys.exit()
+
+    signal.signal(signal.SIGTERM, terminate)
+    print(f"Listening on {SOCKET_PATH}.")
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        sys.exit(str(error))
     sys.exit()
 
 
+def _instrumentation_parser() -> ArgumentParser:
+    parser = ArgumentParser(add_help=False)
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Print time spent enumerating, opening, encoding, pacing and writing "
+        "when exiting.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        help="Write metrics in the Prometheus text format to this path when exiting. "
+        "The daemon writes it after every request instead.",
+        metavar="PATH",
+    )
+    return parser
+
+
+def _setup_instrumentation(instrumentation_parser: ArgumentParser) -> None:
+    """Enable instrumentation before any device is enumerated, if requested."""
+    options, _ = instrumentation_parser.parse_known_args()
+    if not options.timings and options.metrics_file is None:
+        return
+
+    import atexit
+
+    from .instrumentation import enable, write_prometheus
+
+    metrics = enable()
+
+    def report() -> None:
+        if options.timings:
+            print(metrics.summary(), file=sys.stderr)
+        if options.metrics_file is not None:
+            write_prometheus(options.metrics_file, metrics)
+
+    atexit.register(report)
+
+
 def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
     """Parse choices and return subparser used nad the choices."""
+    instrumentation_parser = _instrumentation_parser()
+    _setup_instrumentation(instrumentation_parser)
+
     udev_parser = ArgumentParser()
     # Set udev_parser as ArgumentParser.
     # So type checkers dont complain in final match check for unbound variable.
     parser = ArgumentParser(
         "Regium Klavye",
+        parents=[instrumentation_parser],
         description="Regium Klavye is a command line (CLI) application for "
         "controlling RGB, Keymapping and animations for supported keyboards.",
         epilog=(
@@ -209,11 +762,18 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
         "--device",
         required=False,
         default=0,
-        type=int,
-        help="Number of the device to apply settings for. List of detected devices "
+        type=_parse_device,
+        help='Number of the device to apply settings for, or "all" to apply them '
+        "to every detected device in parallel. List of detected devices "
         'can be read via "regium_klavye list"',
     )
 
+    parser.add_argument(
+        "--no-daemon",
+        action="store_true",
+        help="Talk to the keyboards directly even if a daemon is running.",
+    )
+
     # UDEV PARSER
     if platform.system() == "Linux":
         udev_parser = subparsers.add_parser(
@@ -256,11 +816,6 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
         help="List all supported keyboards including ones not found on this device.",
     )
 
-    try:
-        keyboards = get_keyboards()
-    except KeyboardNotFoundError:
-        sys.exit("No supported keyboards detected.")
-
     # SET-COLOR PARSER
     set_color_parser = subparsers.add_parser(
         "set-color",
@@ -277,6 +832,227 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
         nargs="+",
     )
 
+    # SET-KEY PARSER
+    set_key_parser = subparsers.add_parser(
+        "set-key",
+        help="Set color for some keys or groups of keys, other keys keep the color "
+        "they were given earlier in the same batch.",
+    )
+
+    set_key_parser.add_argument("keys", nargs="*", help="Labels of keys to set.")
+
+    set_key_parser.add_argument(
+        "-g",
+        "--group",
+        action="append",
+        help="Group of keys to set such as letters, arrows or row1, can be repeated.",
+    )
+
+    set_key_parser.add_argument(
+        "-c",
+        "--color",
+        help="Color values to set the keys to, or a named color.",
+        required=True,
+        nargs="+",
+    )
+
+    # CALIBRATE PARSER
+    calibrate_parser = subparsers.add_parser(
+        "calibrate",
+        description="Find the smallest delay between reports the keyboard handles "
+        "correctly and store it for the device. The keyboard will flash colors "
+        "during calibration.",
+    )
+
+    calibrate_parser.add_argument(
+        "--no-verify",
+        action="store_true",
+        help="Dont ask to confirm every step by looking at the keyboard. Only write "
+        "errors are detected then, so the delay is never stored below the profile "
+        "default.",
+    )
+
+    # Confirming every step is the default, the flag is kept for older scripts.
+    calibrate_parser.add_argument(
+        "-i", "--interactive", action="store_true", help=SUPPRESS
+    )
+
+    calibrate_parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Remove the stored delay and use the profile default again.",
+    )
+
+    # DAEMON PARSER
+    daemon_parser = subparsers.add_parser(
+        "daemon",
+        description="Keep detected keyboards open and apply commands sent by other "
+        "calls of regium_klavye, which then only cost a round trip to the daemon.",
+    )
+
+    daemon_parser.add_argument(
+        "--stop", action="store_true", help="Stop the running daemon."
+    )
+
+    daemon_parser.add_argument(
+        "--status", action="store_true", help="Check if a daemon is running."
+    )
+
+    # RECORD PARSER
+    record_parser = subparsers.add_parser(
+        "record",
+        description="Render an effect on the keyboard and record the reports written "
+        'to a file, which can be replayed with "regium_klavye play" without '
+        "rendering it again. Requires NumPy.",
+    )
+
+    record_parser.add_argument("path", help="File to write the recording to.")
+
+    record_parser.add_argument(
+        "-e",
+        "--effect",
+        choices=("linear", "radial", "wave", "ripple"),
+        default="wave",
+        help="Effect to render.",
+    )
+
+    record_parser.add_argument(
+        "-c",
+        "--colors",
+        action="append",
+        nargs="+",
+        help="Color used by the effect, can be repeated. Colors can be set by name "
+        f"or RGB values, valid named colors are {[i.name for i in NamedColors]}.",
+        metavar="COLOR",
+    )
+
+    record_parser.add_argument(
+        "--duration",
+        type=float,
+        default=10.0,
+        help="Seconds to record for.",
+    )
+
+    record_parser.add_argument(
+        "--fps", type=float, default=30.0, help="Frames per second to render."
+    )
+
+    # PLAY PARSER
+    play_parser = subparsers.add_parser(
+        "play", description="Replay a recording made with regium_klavye record."
+    )
+
+    play_parser.add_argument("path", help="Recording to replay.")
+
+    play_parser.add_argument(
+        "--loop",
+        action="store_true",
+        help="Replay the recording until interrupted.",
+    )
+
+    play_parser.add_argument(
+        "--speed", type=float, default=1.0, help="Playback speed, 2 is twice as fast."
+    )
+
+    # AUDIO PARSER
+    audio_parser = subparsers.add_parser(
+        "audio",
+        description="Show the levels of frequency bands of audio on key columns. "
+        "Reads raw PCM or a WAV file, which is recognized by its header. "
+        "Requires NumPy.",
+    )
+
+    audio_parser.add_argument(
+        "path",
+        nargs="?",
+        default="-",
+        help='File or named pipe to read from, "-" or nothing for stdin.',
+    )
+
+    audio_parser.add_argument(
+        "--rate", type=int, default=48000, help="Sample rate of raw PCM in Hz."
+    )
+
+    audio_parser.add_argument(
+        "--channels", type=int, default=2, help="Number of channels of raw PCM."
+    )
+
+    audio_parser.add_argument(
+        "--format",
+        choices=("s16le", "s32le", "f32le"),
+        default="s16le",
+        help="Sample format of raw PCM.",
+    )
+
+    audio_parser.add_argument(
+        "--fps", type=float, default=30.0, help="Frames per second to show."
+    )
+
+    audio_parser.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="Seconds of audio to show, until the input ends by default.",
+    )
+
+    audio_parser.add_argument(
+        "-c",
+        "--colors",
+        action="append",
+        nargs="+",
+        help="Color from the bottom row to the top row, can be repeated.",
+        metavar="COLOR",
+    )
+
+    # STREAM PARSER
+    stream_parser = subparsers.add_parser(
+        "stream",
+        description="Show raw RGB frames written by another program. A frame is a "
+        "red, green and blue byte for each key in the order printed by --print-order, "
+        "or for each cell of a grid of the layout with --grid.",
+    )
+
+    stream_parser.add_argument(
+        "path",
+        nargs="?",
+        default="-",
+        help='File or named pipe to read from, "-" or nothing for stdin.',
+    )
+
+    stream_parser.add_argument(
+        "--grid",
+        action="store_true",
+        help="Read frames as a row major grid with one pixel per key unit.",
+    )
+
+    stream_parser.add_argument(
+        "--print-order",
+        action="store_true",
+        help="Print the order of keys and the size of the grid, then exit.",
+    )
+
+    # BATCH PARSER
+    batch_parser = subparsers.add_parser(
+        "batch",
+        description="Run commands from a script, one command per line written like "
+        'the arguments of regium_klavye, such as "-d 1 set-color -c red". Keyboards '
+        "are detected and opened once for the whole script. Lines starting with # "
+        "are comments.",
+    )
+
+    batch_parser.add_argument(
+        "path",
+        nargs="?",
+        default="-",
+        help='Script to run, "-" or nothing for stdin.',
+    )
+
+    batch_parser.add_argument(
+        "--stop-on-error",
+        action="store_true",
+        help="Stop at the first command that fails instead of running the rest.",
+    )
+
     # SET-ANIM PARSER
     # Help response is handled later since it relies on detected keyboards to display.
     set_anim_parser = subparsers.add_parser(
@@ -293,30 +1069,30 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
         "animations and parameters for detected keyboards.",
     )
 
-    all_anim_params: set[str] = set()
-    for profile in PROFILES.values():
-        anim_params = profile["commands"]["animations"]["params"].keys()
-        all_anim_params.update(anim_params)
-
-    # Iterate over all profiles and get length of argument
-    for param in all_anim_params:
-        arg_len_params = {}
-        for profile in PROFILES.values():
-            try:
-                animations = profile["commands"]["animations"]
-                default = animations["params"][param]["default"]
-                if len(default) != 1:
-                    arg_len_params["nargs"] = "+"
-                else:
-                    arg_len_params = {}
-            except KeyError:
-                continue
-            set_anim_parser.add_argument(
-                "--" + param,
-                required=False,
-                default=False,
-                **arg_len_params,
-            )
+    keyboards: list[Keyboard] | None = None
+    anim_params: list[dict[str, int]] = []
+    # Animation parameters depend on the detected keyboards, they are only added
+    # when they can be used so other commands dont have to enumerate devices.
+    # A running daemon already knows the keyboards. The command is found before
+    # they are added, options that dont exist yet are left for the full parse.
+    known, _ = parser.parse_known_args(
+        [arg for arg in sys.argv[1:] if arg not in ("-h", "--help")]
+    )
+    if known.command in ("set-anim", "batch"):
+        response = _daemon_request({"command": "describe"}, known.no_daemon)
+        if response is not None and response["ok"]:
+            anim_params = [keyboard["anim_params"] for keyboard in response["result"]]
+        else:
+            _check_linux()
+            keyboards = _get_keyboards()
+            anim_params = [
+                {
+                    param: len(definition["default"])
+                    for param, definition in keyboard.anim_params.items()
+                }
+                for keyboard in keyboards
+            ]
+        _add_anim_params(set_anim_parser, anim_params)
 
     choices = vars(parser.parse_args())
 
@@ -325,7 +1101,11 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
     if choices.get("color", False):
         choices["color"] = _parse_color(choices["color"])
 
-    choices["keyboards"] = keyboards
+    if keyboards is None and _needs_keyboards(choices):
+        _forward(choices, {param for params in anim_params for param in params})
+        keyboards = _get_keyboards()
+
+    choices["keyboards"] = keyboards or []
 
     match choices["command"]:
         case "udev":
@@ -334,31 +1114,72 @@ def _get_choices() -> tuple[ArgumentParser, dict[str, Any]]:
             _parser = list_parser
         case "set-color":
             _parser = set_color_parser
+        case "set-key":
+            _parser = set_key_parser
         case "set-anim":
             _parser = set_anim_parser
+        case "calibrate":
+            _parser = calibrate_parser
+        case "daemon":
+            _parser = daemon_parser
+        case "record":
+            _parser = record_parser
+        case "play":
+            _parser = play_parser
+        case "audio":
+            _parser = audio_parser
+        case "stream":
+            _parser = stream_parser
+        case "batch":
+            # Lines of the script are parsed with the main parser.
+            _parser = parser
         case _:
             sys.exit(parser.format_help())
 
     return _parser, choices
 
 
-def main():  # noqa: D103
-    parser, choices = _get_choices()
+def _valid_device(choices: dict[str, Any]) -> bool:
+    return choices["device"] == "all" or choices["device"] < len(choices["keyboards"])
+
 
+def _run(parser: ArgumentParser, choices: dict[str, Any]) -> NoReturn:
+    """Run the handler of a command."""
     match choices["command"]:
         case "udev":
             _handle_udev(parser, choices)
         case "list":
             _handle_list(parser, choices)
-        case _ if len(choices["keyboards"]) - 1 < choices["device"]:
+        case "daemon":
+            _handle_daemon(parser, choices)
+        case _ if not _valid_device(choices):
             sys.exit(
                 "Invalid device number provided or device not supported. "
                 'Use "regium_klavye list" for a list of supported and detected devices.'
             )
         case "set-color":
             _handle_set_color(parser, choices)
+        case "set-key":
+            _handle_set_key(parser, choices)
         case "set-anim":
             _handle_set_anim(parser, choices)
+        case "calibrate":
+            _handle_calibrate(parser, choices)
+        case "record":
+            _handle_record(parser, choices)
+        case "play":
+            _handle_play(parser, choices)
+        case "audio":
+            _handle_audio(parser, choices)
+        case "stream":
+            _handle_stream(parser, choices)
+        case "batch":
+            _handle_batch(parser, choices)
+    sys.exit(parser.format_help())
+
+
+def main():  # noqa: D103
+    _run(*_get_choices())
 
 
 
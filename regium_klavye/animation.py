@@ -0,0 +1,126 @@
+"""Host driven animations.
+
+Frames are rendered on the host by a callback and presented to the keyboard at a
+fixed rate. The schedule is based on a monotonic clock, so frames that take long
+to render or write do not make the animation drift. When the keyboard cant keep
+up, frames are dropped rather than queued.
+"""
+from __future__ import annotations
+
+from threading import Event
+from time import monotonic
+from typing import TYPE_CHECKING, TypedDict
+
+from .instrumentation import count
+
+if TYPE_CHECKING:
+    from typing import Any, Callable
+
+    from .keyboard_parts import Keyboard
+
+    RenderCallback = Callable[[int, float], Any]
+
+
+class AnimationStats(TypedDict):
+    """Counters of a finished animation run."""
+
+    presented: int
+    # Frames that were rendered and presented to the keyboard.
+
+    unchanged: int
+    # Frames the render callback reported as unchanged, nothing was written.
+
+    dropped: int
+    # Frames skipped because the previous frame took longer than its slot.
+
+    elapsed: float
+    # Time in seconds the animation ran for.
+
+
+class AnimationEngine:
+    """Render and present frames to a keyboard at a target rate.
+
+    The render callback is called with the frame number and the time in seconds
+    since the animation started. The frame number is based on the schedule, if
+    frames were dropped it skips ahead so the animation stays in time.
+    The callback returns a frame accepted by :meth:`Keyboard.set_frame`, or None
+    if the frame did not change since the previous one. Unchanged frames dont
+    encode or write anything.
+
+    Args:
+        keyboard: Keyboard to present frames to.
+        render: Callback that renders a frame.
+        fps: Target frames per second.
+    """
+
+    __slots__ = ("keyboard", "render", "_period", "_stop")
+
+    def __init__(self, keyboard: Keyboard, render: RenderCallback, fps: float = 30):
+        if fps <= 0:
+            raise ValueError("Frames per second must be above 0.")
+        self.keyboard = keyboard
+        self.render = render
+        self._period = 1 / fps
+        self._stop = Event()
+
+    @property
+    def fps(self) -> float:
+        """Target frames per second."""
+        return 1 / self._period
+
+    def stop(self) -> None:
+        """Stop a running animation, can be called from another thread."""
+        self._stop.set()
+
+    def run(
+        self, duration: float | None = None, frames: int | None = None
+    ) -> AnimationStats:
+        """Run the animation until stopped or a limit is reached.
+
+        Args:
+            duration: Stop after this many seconds.
+            frames: Stop once the frame number reaches this value.
+        """
+        self._stop.clear()
+        stats: AnimationStats = {
+            "presented": 0,
+            "unchanged": 0,
+            "dropped": 0,
+            "elapsed": 0.0,
+        }
+        period = self._period
+        start = monotonic()
+        frame_number = 0
+
+        while not self._stop.is_set():
+            elapsed = monotonic() - start
+            if duration is not None and elapsed >= duration:
+                break
+            if frames is not None and frame_number >= frames:
+                break
+
+            frame = self.render(frame_number, elapsed)
+            if frame is None:
+                stats["unchanged"] += 1
+            else:
+                self.keyboard.set_frame(frame)
+                self.keyboard.apply_color()
+                stats["presented"] += 1
+
+            # Deadlines are derived from the start time instead of adding up
+            # sleeps, so time spent rendering and writing doesnt cause drift.
+            now = monotonic()
+            next_frame = frame_number + 1
+            late_frame = int((now - start) / period)
+            # A frame less than a period late is presented right away, frames are
+            # only skipped once a whole period passed after their deadline.
+            if late_frame > next_frame:
+                stats["dropped"] += late_frame - next_frame
+                count("frames_dropped", late_frame - next_frame)
+                next_frame = late_frame
+            frame_number = next_frame
+
+            self._stop.wait(max(start + frame_number * period - monotonic(), 0))
+
+        stats["elapsed"] = monotonic() - start
+        return stats
@@ -0,0 +1,447 @@
+"""Lighting that follows audio.
+
+Raw PCM is read from a file, a named pipe or stdin, WAV files are recognized by
+their header. Audio is processed in blocks, one block for each frame. The energy
+of frequency bands is computed with a NumPy FFT over the newest samples and each
+band lights a column of keys like a bar graph, columns come from the profile
+layout (see :attr:`Keyboard.key_centers`).
+
+Audio sets the pace. Streams are read as fast as they arrive, and files are read
+at the speed they would play at unless realtime is disabled, which renders them
+as fast as possible for offline use. When more audio is waiting in a pipe than
+:data:`MAX_BUFFERED` blocks, the oldest blocks are skipped so latency doesnt
+grow. Frames are handed to a :class:`~regium_klavye.keyboard_parts.Presenter`,
+so writing to the keyboard never holds up reading audio.
+
+NumPy is required, it is installed with the "numpy" extra.
+
+Example:
+    >>> with open_source("song.wav") as source:
+    ...     AudioVisualizer(keyboard, source).run()
+"""
+from __future__ import annotations
+
+import os
+import wave
+from threading import Event
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, TypedDict
+
+import numpy as np
+
+from .effects import palette
+from .helpers.pipes import is_pipe, pending_bytes
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import BinaryIO, Callable, Sequence
+
+    from .keyboard_parts import Keyboard
+
+SAMPLE_FORMATS: dict[str, np.dtype] = {
+    "s16le": np.dtype("<i2"),
+    "s32le": np.dtype("<i4"),
+    "f32le": np.dtype("<f4"),
+}
+"""Raw sample formats and their NumPy type."""
+
+_WAV_FORMATS = {1: np.dtype("u1"), 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+"""NumPy type of WAV samples by sample width, 24 bit samples arent supported."""
+
+MAX_BUFFERED = 2
+"""Blocks a pipe can hold before older blocks are skipped."""
+
+DEFAULT_COLORS = ((0, 255, 0), (255, 255, 0), (255, 0, 0))
+"""Colors of the bar graph from the bottom row to the top row."""
+
+
+class PcmSource:
+    """Blocks of samples read from a binary file.
+
+    Samples of every channel are averaged into a single channel scaled to -1..1.
+
+    Args:
+        file: File to read from, closed with the source.
+        rate: Sample rate in Hz.
+        channels: Number of interleaved channels.
+        dtype: Type of a sample.
+        realtime: Read regular files no faster than they would play. Pipes and
+            other streams are always read as fast as audio arrives.
+        read: Reads up to a number of bytes of samples, defaults to the read
+            method of the file.
+    """
+
+    __slots__ = (
+        "file",
+        "rate",
+        "channels",
+        "dtype",
+        "skipped",
+        "_read",
+        "_scale",
+        "_offset",
+        "_is_pipe",
+        "_realtime",
+        "_start",
+        "_samples_read",
+    )
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        rate: int = 48000,
+        channels: int = 2,
+        dtype: np.dtype = SAMPLE_FORMATS["s16le"],
+        realtime: bool = True,
+        read: Callable[[int], bytes] | None = None,
+    ):
+        if rate <= 0 or channels <= 0:
+            raise ValueError("Sample rate and channels must be above 0.")
+        self.file = file
+        self.rate = rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.skipped = 0
+        """Number of blocks skipped because reading fell behind."""
+        self._read = read or file.read
+
+        # Integer samples are scaled to -1..1, unsigned ones are centered first.
+        if self.dtype.kind == "f":
+            self._scale, self._offset = 1.0, 0.0
+        else:
+            info = np.iinfo(self.dtype)
+            self._scale = 2 / (int(info.max) - int(info.min) + 1)
+            self._offset = (int(info.max) + int(info.min) + 1) / 2
+
+        self._is_pipe = is_pipe(file)
+        self._realtime = realtime and not self._is_pipe
+        self._start: float | None = None
+        self._samples_read = 0
+
+    def __repr__(self) -> str:
+        """Get source as string."""
+        return (
+            f"PcmSource(rate={self.rate}, channels={self.channels}, "
+            f"dtype={self.dtype})"
+        )
+
+    def __enter__(self) -> PcmSource:
+        """Use the source as a context manager, closing it on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the source."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self.file.close()
+
+    def read_block(self, samples: int) -> np.ndarray | None:
+        """Read the next block of samples.
+
+        Blocks until the block is available, or until it is due if realtime
+        reading is enabled for a file. If a pipe holds more than
+        :data:`MAX_BUFFERED` blocks, older blocks are skipped.
+
+        Args:
+            samples: Number of samples of each channel in the block.
+
+        Returns:
+            Samples as float32 between -1 and 1, None once the input ended.
+        """
+        block_size = samples * self.channels * self.dtype.itemsize
+        if self._is_pipe:
+            self._skip_stale(block_size)
+
+        data = self._read(block_size)
+        if len(data) < block_size:
+            return None
+
+        if self._realtime:
+            now = monotonic()
+            if self._start is None:
+                self._start = now
+            due = self._start + self._samples_read / self.rate
+            if due > now:
+                sleep(due - now)
+        self._samples_read += samples
+
+        block = np.frombuffer(data, dtype=self.dtype).reshape(samples, self.channels)
+        mono = block.mean(axis=1, dtype=np.float32)
+        if self._offset:
+            mono -= self._offset
+        mono *= self._scale
+        return mono
+
+    def _skip_stale(self, block_size: int) -> None:
+        pending = pending_bytes(self.file)
+        if pending is None or pending <= MAX_BUFFERED * block_size:
+            return
+        # Keep the newest block waiting, whole blocks so channels stay aligned.
+        stale = (pending // block_size - 1) * block_size
+        self._read(stale)
+        self.skipped += stale // block_size
+
+
+def open_source(
+    path: str,
+    rate: int = 48000,
+    channels: int = 2,
+    sample_format: str = "s16le",
+    realtime: bool = True,
+) -> PcmSource:
+    """Open a WAV file or raw PCM from a file, a named pipe or stdin.
+
+    The sample rate, channels and format are read from the header of WAV files
+    and ignored, they describe raw PCM otherwise.
+
+    Args:
+        path: Path to read from, "-" for stdin.
+        rate: Sample rate of raw PCM in Hz.
+        channels: Number of interleaved channels of raw PCM.
+        sample_format: Format of raw PCM samples, one of :data:`SAMPLE_FORMATS`.
+        realtime: See :class:`PcmSource`.
+
+    Raises:
+        ValueError: The sample format or WAV file isnt supported.
+    """
+    if sample_format not in SAMPLE_FORMATS:
+        raise ValueError(
+            f"Unknown sample format {sample_format}, expected one of "
+            f"{', '.join(SAMPLE_FORMATS)}."
+        )
+
+    # Stdin is duplicated so closing the source doesnt close sys.stdin.
+    file = os.fdopen(os.dup(0), "rb") if path == "-" else open(path, "rb")
+    try:
+        if file.peek(12)[:4] != b"RIFF":
+            return PcmSource(
+                file, rate, channels, SAMPLE_FORMATS[sample_format], realtime
+            )
+
+        reader = wave.open(file)
+        dtype = _WAV_FORMATS.get(reader.getsampwidth())
+        if dtype is None:
+            raise ValueError(f"Unsupported WAV sample width {reader.getsampwidth()}.")
+        frame_size = reader.getnchannels() * reader.getsampwidth()
+        return PcmSource(
+            file,
+            reader.getframerate(),
+            reader.getnchannels(),
+            dtype,
+            realtime,
+            read=lambda size: reader.readframes(size // frame_size),
+        )
+    except wave.Error as error:
+        file.close()
+        raise ValueError(f"Invalid WAV file: {error}") from None
+    except Exception:
+        file.close()
+        raise
+
+
+class BandAnalyzer:
+    """Levels of logarithmically spaced frequency bands.
+
+    Levels are normalized against a peak that adapts to the loudness of the
+    audio, and fall slowly after a peak so the lights dont flicker.
+
+    Args:
+        rate: Sample rate in Hz.
+        bands: Number of bands.
+        window: Samples used for each FFT, the newest samples read.
+        low: Lowest frequency in Hz.
+        high: Highest frequency in Hz, limited to half of the sample rate.
+        dynamic_range: Decibels below the peak that have a level of 0.
+        release: Seconds a level takes to fall from 1 to 0.
+    """
+
+    __slots__ = (
+        "rate",
+        "window",
+        "levels",
+        "_samples",
+        "_hann",
+        "_edges",
+        "_peak",
+        "_dynamic_range",
+        "_release",
+    )
+
+    def __init__(
+        self,
+        rate: int,
+        bands: int,
+        window: int = 2048,
+        low: float = 40.0,
+        high: float = 16000.0,
+        dynamic_range: float = 45.0,
+        release: float = 0.4,
+    ):
+        if bands <= 0:
+            raise ValueError("Number of bands must be above 0.")
+        self.rate = rate
+        self.window = window
+        self.levels = np.zeros(bands, dtype=np.float32)
+        """Level of each band between 0 and 1, from the lowest frequencies."""
+        self._samples = np.zeros(window, dtype=np.float32)
+        self._hann = np.hanning(window).astype(np.float32)
+
+        # Each band covers at least one FFT bin, low bands are narrower than bins.
+        high = min(high, rate / 2)
+        edges = np.rint(np.geomspace(low, high, bands + 1) * window / rate)
+        edges = edges.astype(np.intp)
+        for index in range(1, len(edges)):
+            edges[index] = max(edges[index], edges[index - 1] + 1)
+        if edges[-1] > window // 2 + 1:
+            raise ValueError("Too many bands for the window size.")
+        self._edges = edges
+
+        self._peak = -np.inf
+        self._dynamic_range = dynamic_range
+        self._release = release
+
+    def __repr__(self) -> str:
+        """Get analyzer as string."""
+        return f"BandAnalyzer(rate={self.rate}, bands={len(self.levels)})"
+
+    def update(self, block: np.ndarray) -> np.ndarray:
+        """Add a block of mono samples and get the level of every band."""
+        samples = self._samples
+        if len(block) >= len(samples):
+            samples[:] = block[-len(samples) :]
+        else:
+            samples[: -len(block)] = samples[len(block) :]
+            samples[-len(block) :] = block
+
+        spectrum = np.fft.rfft(samples * self._hann)
+        power = spectrum.real**2 + spectrum.imag**2
+        edges = self._edges
+        energy = np.add.reduceat(power[: edges[-1]], edges[:-1])
+        decibels = 10 * np.log10(energy + 1e-12)
+
+        # The peak follows loud audio right away and quiet audio slowly.
+        elapsed = len(block) / self.rate
+        self._peak = max(float(decibels.max()), self._peak - 6 * elapsed)
+        levels = (decibels - (self._peak - self._dynamic_range)) / self._dynamic_range
+        np.clip(levels, 0, 1, out=levels)
+        np.maximum(levels, self.levels - elapsed / self._release, out=self.levels)
+        return self.levels
+
+
+class AudioStats(TypedDict):
+    """Counters of a finished audio visualization."""
+
+    frames: int
+    # Frames rendered and presented.
+
+    skipped: int
+    # Blocks of audio skipped because reading fell behind.
+
+    elapsed: float
+    # Time in seconds the visualization ran for.
+
+
+class AudioVisualizer:
+    """Show the levels of frequency bands on key columns.
+
+    Each band lights the keys of a column from the bottom row up, in proportion
+    to its level. Columns are one key unit wide.
+
+    Args:
+        keyboard: Keyboard to show the levels on.
+        source: Audio to read.
+        fps: Frames per second, each frame reads a block of rate / fps samples.
+        colors: Colors from the bottom row to the top row.
+    """
+
+    __slots__ = (
+        "keyboard",
+        "source",
+        "analyzer",
+        "_block",
+        "_columns",
+        "_threshold",
+        "_rows",
+        "_colors",
+        "_lit",
+        "_scaled",
+        "_frame",
+        "_stop",
+    )
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        source: PcmSource,
+        fps: float = 30,
+        colors: Sequence[tuple[int, int, int]] = DEFAULT_COLORS,
+    ):
+        if fps <= 0:
+            raise ValueError("Frames per second must be above 0.")
+        self.keyboard = keyboard
+        self.source = source
+        self._block = max(int(source.rate / fps), 1)
+
+        width, height = keyboard.size
+        centers = np.array(list(keyboard.key_centers.values()), dtype=np.float32)
+        columns = int(np.ceil(width))
+        self.analyzer = BandAnalyzer(source.rate, columns)
+        self._columns = np.minimum(centers[:, 0].astype(np.intp), columns - 1)
+        # Height of each key from the bottom, between 0 and 1.
+        height_ratio = 1 - centers[:, 1] / height
+        self._rows = height
+        self._threshold = height_ratio - 0.5 / height
+        table = palette(colors)
+        indexes = np.clip(height_ratio * (len(table) - 1), 0, len(table) - 1)
+        self._colors = table[indexes.astype(np.intp)].astype(np.float32)
+        self._lit = np.empty((len(centers), 1), dtype=np.float32)
+        self._scaled = np.empty((len(centers), 3), dtype=np.float32)
+        self._frame = np.empty((len(centers), 3), dtype=np.uint8)
+        self._stop = Event()
+
+    def stop(self) -> None:
+        """Stop a running visualization, can be called from another thread."""
+        self._stop.set()
+
+    def render(self, levels: np.ndarray) -> np.ndarray:
+        """Render band levels into a frame for :meth:`Keyboard.set_frame`."""
+        lit = self._lit[:, 0]
+        np.subtract(levels[self._columns], self._threshold, out=lit)
+        lit *= self._rows
+        np.clip(lit, 0, 1, out=lit)
+        np.multiply(self._colors, self._lit, out=self._scaled)
+        np.copyto(self._frame, self._scaled, casting="unsafe")
+        return self._frame
+
+    def run(self, duration: float | None = None) -> AudioStats:
+        """Show audio until it ends, the duration passes or it is stopped.
+
+        Args:
+            duration: Seconds of audio to show, until the input ends if None.
+        """
+        self._stop.clear()
+        stats: AudioStats = {"frames": 0, "skipped": 0, "elapsed": 0.0}
+        blocks = None if duration is None else int(duration * self.source.rate)
+        blocks = None if blocks is None else max(blocks // self._block, 1)
+        start = monotonic()
+        skipped = self.source.skipped
+
+        with self.keyboard.presenter() as presenter:
+            while not self._stop.is_set() and (
+                blocks is None or stats["frames"] < blocks
+            ):
+                if (block := self.source.read_block(self._block)) is None:
+                    break
+                presenter.present(self.render(self.analyzer.update(block)))
+                stats["frames"] += 1
+
+        stats["skipped"] = self.source.skipped - skipped
+        stats["elapsed"] = monotonic() - start
+        return stats
@@ -0,0 +1,477 @@
+"""Resident daemon that keeps keyboards open and accepts requests over a socket.
+
+Every command line call has to import the library, enumerate devices and open
+them before anything is written. The daemon does that once and keeps the
+keyboards and their handles around, so a request only costs a round trip over a
+UNIX domain socket and the reports that actually changed.
+
+Requests and responses are JSON objects, one per line. A connection can send any
+number of requests and gets a response for each in the same order.
+
+Requests:
+    ``{"command": "ping"}``
+        Check if the daemon is running.
+    ``{"command": "describe"}``
+        Get the keyboards the daemon manages.
+    ``{"command": "set-color", "device": 0, "color": [255, 0, 0]}``
+        Set a color for every key of the keyboard.
+    ``{"command": "set-anim", "device": "all", "animation": "wave", "params": {}}``
+        Set an animation, params map parameter names to a list of integers.
+    ``{"command": "set-frame", "device": 0, "frame": "ff0000..."}``
+        Set the color of each key with a frame encoded as hexadecimal, see
+        :meth:`Keyboard.set_frame <regium_klavye.keyboard_parts.Keyboard.set_frame>`.
+    ``{"command": "refresh"}``
+        Enumerate the keyboards again.
+    ``{"command": "stop"}``
+        Stop the daemon.
+
+Responses are ``{"ok": true, "result": ...}`` on success and
+``{"ok": false, "error": "..."}`` otherwise. The device defaults to 0 and can be
+"all" to apply a request to every keyboard in parallel.
+"""
+from __future__ import annotations
+
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+from typing import TYPE_CHECKING
+
+from . import instrumentation
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Any, Callable
+
+    from .keyboard_parts import Keyboard
+
+_PRIVATE_DIR = f"/tmp/regium_klavye-{os.getuid()}"
+"""Directory the socket is created in when there is no runtime directory."""
+
+SOCKET_PATH = os.path.join(
+    os.environ.get("XDG_RUNTIME_DIR") or _PRIVATE_DIR, "regium_klavye.sock"
+)
+
+DEFAULT_TIMEOUT = 10.0
+"""Seconds a client waits for the daemon before giving up."""
+
+
+def _check_private_dir(path: str) -> None:
+    """Check the directory a socket in /tmp is in can only be used by this user.
+
+    Anyone can create the directory in /tmp first, so a socket is neither served
+    nor connected to unless it is owned by this user, isnt a symbolic link and
+    isnt accessible to others.
+
+    Raises:
+        FileNotFoundError: The directory doesnt exist.
+        PermissionError: The directory isnt private to this user.
+    """
+    directory = os.path.dirname(path)
+    if directory != _PRIVATE_DIR:
+        return
+    info = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(info.st_mode)
+        or info.st_uid != os.getuid()
+        or stat.S_IMODE(info.st_mode) != 0o700
+    ):
+        raise PermissionError(
+            f"Refusing to use {directory}, it must be a directory owned by this "
+            "user with mode 0700."
+        )
+
+
+class DaemonClient:
+    """Connection to a running daemon.
+
+    A client can be reused for any number of requests, which is what streaming
+    frames to the daemon should do.
+
+    Example:
+        >>> with DaemonClient() as client:
+        ...     client.request({"command": "set-color", "color": [0, 0, 255]})
+
+    Args:
+        path: Path of the daemons socket.
+        timeout: Seconds to wait for connecting and for each response.
+    """
+
+    __slots__ = ("path", "timeout", "_sock", "_file")
+
+    def __init__(self, path: str = SOCKET_PATH, timeout: float = DEFAULT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self._sock: socket.socket | None = None
+        self._file = None
+
+    def __repr__(self) -> str:
+        """Get client as string."""
+        return f"DaemonClient(path={self.path!r})"
+
+    def __enter__(self) -> DaemonClient:
+        """Connect to the daemon."""
+        self.connect()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the connection."""
+        self.close()
+
+    def connect(self) -> None:
+        """Connect to the daemon, does nothing if already connected.
+
+        Raises:
+            FileNotFoundError: No daemon created the socket.
+            ConnectionRefusedError: The socket exists but no daemon is running.
+            PermissionError: The directory of the socket isnt private.
+        """
+        if self._sock is not None:
+            return
+        _check_private_dir(self.path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._file = sock.makefile("rb")
+
+    def close(self) -> None:
+        """Close the connection."""
+        if self._sock is not None:
+            self._file.close()  # type: ignore
+            self._sock.close()
+            self._sock = self._file = None
+
+    def request(self, request: dict[str, Any]) -> dict[str, Any]:
+        """Send a request and wait for its response.
+
+        Raises:
+            OSError: Not connected or the daemon closed the connection.
+        """
+        if self._sock is None:
+            raise OSError("Client is not connected to the daemon.")
+        self._sock.sendall(json.dumps(request).encode() + b"\n")
+        line = self._file.readline()  # type: ignore
+        if not line:
+            raise OSError("Daemon closed the connection.")
+        return json.loads(line)
+
+
+def send_request(
+    request: dict[str, Any], path: str = SOCKET_PATH, timeout: float = DEFAULT_TIMEOUT
+) -> dict[str, Any] | None:
+    """Send a single request to the daemon.
+
+    Returns:
+        The response, or None if the daemon isnt running.
+    """
+    client = DaemonClient(path, timeout)
+    try:
+        client.connect()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    try:
+        return client.request(request)
+    finally:
+        client.close()
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: _Server
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            self.wfile.write(self.server.daemon.respond(line))
+            if self.server.daemon._stopping:
+                # Stopped after responding, so the client knows the request succeeded.
+                self.server.shutdown()
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: Daemon):
+        self.daemon = daemon
+        super().__init__(path, _RequestHandler)
+
+
+class Daemon:
+    """Keep keyboards open and apply requests received over a UNIX socket.
+
+    Requests are applied one at a time so reports reach each keyboard in the
+    order requests were received, a request for every keyboard is still applied
+    to them in parallel. Colors are encoded incrementally like any other
+    long lived :class:`Keyboard`, so only reports that changed are written.
+
+    While serving, hotplug events are monitored with
+    :data:`~regium_klavye.devices.DEVICES` and keyboards are detected again
+    when one is plugged in or removed.
+
+    Args:
+        path: Path to create the socket at.
+        keyboards: Keyboards to manage, detected keyboards are used by default.
+            They are detected again once a keyboard is plugged in or removed.
+        metrics_path: Write metrics for the Prometheus textfile collector to this
+            path after every request, while instrumentation is enabled.
+    """
+
+    __slots__ = (
+        "path",
+        "metrics_path",
+        "_keyboards",
+        "_generation",
+        "_lock",
+        "_server",
+        "_stopping",
+    )
+
+    def __init__(
+        self,
+        path: str = SOCKET_PATH,
+        keyboards: list[Keyboard] | None = None,
+        metrics_path: str | None = None,
+    ):
+        self.path = path
+        self.metrics_path = metrics_path
+        self._stopping = False
+        self._keyboards = keyboards
+        self._generation = -1
+        self._lock = threading.RLock()
+        self._server: _Server | None = None
+
+    def __repr__(self) -> str:
+        """Get daemon as string."""
+        return f"Daemon(path={self.path!r})"
+
+    @property
+    def keyboards(self) -> list[Keyboard]:
+        """Keyboards managed by the daemon, detected on first access."""
+        if self._keyboards is None:
+            self.refresh()
+        return self._keyboards  # type: ignore
+
+    def serve(self) -> None:
+        """Open the keyboards and handle requests until :meth:`shutdown` is called.
+
+        Raises:
+            OSError: Another daemon is already running on the same path.
+            PermissionError: The directory of the socket isnt private.
+        """
+        if send_request({"command": "ping"}, self.path) is not None:
+            raise OSError(f"A daemon is already running at {self.path}.")
+
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        _check_private_dir(self.path)
+        # The socket of a daemon that didnt exit cleanly is left behind.
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        umask = os.umask(0o077)
+        try:
+            self._server = _Server(self.path, self)
+        finally:
+            os.umask(umask)
+
+        from .devices import DEVICES
+
+        # Only stop monitoring if it wasnt started by the application.
+        monitoring = not DEVICES.is_monitoring and DEVICES.start()
+        self._stopping = False
+        try:
+            # Keyboards the daemon was given are kept until a hotplug change.
+            if self._keyboards is None:
+                self.refresh()
+            else:
+                self._generation = DEVICES.generation
+                self._open_keyboards()
+            self._server.serve_forever()
+        finally:
+            if monitoring:
+                DEVICES.stop()
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            self._close_keyboards()
+
+    def shutdown(self) -> None:
+        """Stop handling requests, can be called from any thread but the serving one."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def refresh(self) -> None:
+        """Enumerate keyboards again, such as after a keyboard was plugged in."""
+        from .devices import DEVICES
+        from .rkapi import get_keyboards
+
+        with self._lock:
+            self._close_keyboards()
+            self._generation = DEVICES.generation
+            self._keyboards = get_keyboards()
+            if self._server is not None:
+                self._open_keyboards()
+
+    def _open_keyboards(self) -> None:
+        for keyboard in self.keyboards:
+            try:
+                keyboard.open()
+            except OSError:
+                # Writes open a handle again when needed.
+                pass
+
+    def _close_keyboards(self) -> None:
+        for keyboard in self._keyboards or ():
+            keyboard.close()
+
+    def respond(self, line: bytes) -> bytes:
+        """Handle an encoded request and get the encoded response."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("Request must be a JSON object.")
+            response = {"ok": True, "result": self.handle(request)}
+        except Exception as error:
+            response = {"ok": False, "error": str(error) or type(error).__name__}
+
+        if self.metrics_path is not None and instrumentation.metrics is not None:
+            try:
+                instrumentation.write_prometheus(self.metrics_path)
+            except OSError:
+                # Metrics are best effort, they shouldnt fail the request.
+                pass
+        return json.dumps(response).encode() + b"\n"
+
+    def handle(self, request: dict[str, Any]) -> Any:
+        """Apply a decoded request and get its result.
+
+        Raises:
+            ValueError: The request is invalid or failed for a keyboard.
+        """
+        match request.get("command"):
+            case "ping":
+                return {"pid": os.getpid()}
+            case "describe":
+                return [_describe(keyboard) for keyboard in self.keyboards]
+            case "refresh":
+                self.refresh()
+                return [_describe(keyboard) for keyboard in self.keyboards]
+            case "stop":
+                self._stopping = True
+                return None
+            case "set-color":
+                with self._lock:
+                    return self._set_color(request)
+            case "set-anim":
+                with self._lock:
+                    return self._set_anim(request)
+            case "set-frame":
+                with self._lock:
+                    return self._set_frame(request)
+            case command:
+                raise ValueError(f"Unknown command {command!r}.")
+
+    def _set_color(self, request: dict[str, Any]) -> None:
+        color = tuple(request.get("color", ()))
+        keyboards = self._selected(request)
+        for keyboard in keyboards:
+            if not keyboard.has_rgb:
+                raise ValueError(
+                    f"{keyboard.long_name} does not support color changing."
+                )
+        self._apply(keyboards, lambda keyboard: keyboard.apply_color(color))
+
+    def _set_frame(self, request: dict[str, Any]) -> None:
+        frame = bytes.fromhex(request.get("frame", ""))
+
+        def apply(keyboard: Keyboard) -> None:
+            keyboard.set_frame(frame)
+            keyboard.apply_color()
+
+        self._apply(self._selected(request), apply)
+
+    def _set_anim(self, request: dict[str, Any]) -> None:
+        animation = request.get("animation")
+        params = request.get("params") or {}
+        keyboards = self._selected(request)
+        for keyboard in keyboards:
+            if animation not in keyboard.anim_options:
+                raise ValueError(
+                    f"Invalid animation provided for {keyboard.long_name}."
+                )
+            try:
+                keyboard.set_animation(
+                    animation,  # type: ignore
+                    {
+                        param: value
+                        for param, value in params.items()
+                        if param in keyboard.anim_params
+                    },
+                )
+            except ValueError:
+                raise ValueError(
+                    f"Invalid animation parameters provided for {keyboard.long_name}."
+                ) from None
+        self._apply(keyboards, lambda keyboard: keyboard.apply_animation())
+
+    def _selected(self, request: dict[str, Any]) -> list[Keyboard]:
+        from .devices import DEVICES
+
+        if DEVICES.is_monitoring and DEVICES.generation != self._generation:
+            self.refresh()
+
+        device = request.get("device", 0)
+        if device == "all":
+            return self.keyboards
+        if not isinstance(device, int) or device < 0:
+            raise ValueError('Device must be a number or "all".')
+        if device >= len(self.keyboards):
+            # The keyboard may have been plugged in after the daemon started.
+            self.refresh()
+        if device >= len(self.keyboards):
+            raise ValueError(
+                "Invalid device number provided or device not supported. "
+                'Use "regium_klavye list" for a list of supported and detected devices.'
+            )
+        return [self.keyboards[device]]
+
+    def _apply(
+        self, keyboards: list[Keyboard], command: Callable[[Keyboard], Any]
+    ) -> None:
+        from .rkapi import fan_out
+
+        errors = [
+            f"{result['keyboard'].long_name}: {result['error']}"
+            for result in fan_out(keyboards, command)
+            if result["error"] is not None
+        ]
+        if errors:
+            raise ValueError("\n".join(errors))
+
+
+def _describe(keyboard: Keyboard) -> dict[str, Any]:
+    return {
+        "name": keyboard.name,
+        "long_name": keyboard.long_name,
+        "has_rgb": keyboard.has_rgb,
+        "has_anim": keyboard.has_anim,
+        "anim_options": keyboard.anim_options,
+        # Number of values each parameter takes.
+        "anim_params": {
+            param: len(definition["default"])
+            for param, definition in keyboard.anim_params.items()
+        },
+        "frame_keys": keyboard.frame_keys,
+        "groups": keyboard.groups,
+    }
@@ -0,0 +1,245 @@
+"""Cache of connected and supported devices, kept up to date by hotplug events.
+
+Enumerating walks every HID device on the system. Long running processes can
+call :meth:`DeviceRegistry.start` once, after which lookups are served from an
+index of supported devices. The index is updated from kernel uevents received
+over netlink, which needs no extra services. Only devices with the vendor ID and
+product ID of a device that was plugged in or removed are enumerated again, any
+other device is ignored without enumerating.
+
+Without monitoring, or on systems without netlink, every lookup enumerates.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import re
+import select
+import socket
+from threading import Lock, Thread
+
+from .instrumentation import timed
+from .keyboard_profiles import PROFILES
+from .transports import get_transport
+
+_LOGGER = logging.getLogger(__name__)
+
+NETLINK_KOBJECT_UEVENT = 15
+_KERNEL_EVENTS = 1
+"""Netlink multicast group of uevents sent by the kernel."""
+
+# Hidraw devices live under their HID device, which is named "bus:vid:pid.id".
+_HID_DEVICE = re.compile(rb"/[0-9A-F]{4}:([0-9A-F]{4}):([0-9A-F]{4})\.[0-9A-F]+/")
+
+
+def is_supported(device: dict) -> bool:
+    """Check if an enumerated device is the interface of a supported keyboard."""
+    # Membership is checked on the registry index, unrelated profiles arent loaded.
+    if (vid := device["vendor_id"], pid := device["product_id"]) in PROFILES:
+        for model in PROFILES[(vid, pid)]["models"]:
+            if model["endpoint"] == device["interface_number"]:
+                return True
+    return False
+
+
+def _check_ids(vid: int | None, pid: int | None) -> None:
+    match vid, pid:
+        case (None, None) | (int(), None) | (int(), int()):
+            return
+        case _, int():
+            raise ValueError("Cannot take product id without vendor id.")
+        case _:
+            raise TypeError(f"Expected int or None, found {type(vid)} and {type(pid)}")
+
+
+def enumerate_devices(vid: int | None = None, pid: int | None = None) -> list[dict]:
+    """Enumerate supported devices, optionally only ones matching the IDs.
+
+    Raises:
+        ValueError: A product ID was provided without a vendor ID.
+        TypeError: An ID is neither an integer or None.
+    """
+    _check_ids(vid, pid)
+    with timed("enumerate"):
+        devices = get_transport().enumerate(vid or 0, pid or 0)
+    return [device for device in devices if is_supported(device)]
+
+
+class DeviceRegistry:
+    """Index of supported devices updated from hotplug events.
+
+    Example:
+        >>> registry = DeviceRegistry()
+        >>> registry.start()
+        True
+        >>> registry.devices(0x258A)  # Served from the index.
+
+    The :attr:`generation` increases every time the indexed devices change, which
+    lets callers that keep objects for devices notice they should get them again.
+    """
+
+    __slots__ = ("_index", "_lock", "_sock", "_wake", "_thread", "generation")
+
+    def __init__(self):
+        self._index: dict[tuple[int, int], list[dict]] | None = None
+        self._lock = Lock()
+        self._sock: socket.socket | None = None
+        self._wake: tuple[int, int] | None = None
+        self._thread: Thread | None = None
+        self.generation = 0
+
+    def __repr__(self) -> str:
+        """Get registry as string."""
+        return (
+            f"DeviceRegistry(monitoring={self.is_monitoring}, "
+            f"generation={self.generation})"
+        )
+
+    @property
+    def is_monitoring(self) -> bool:
+        """Check if hotplug events are being monitored."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def devices(self, vid: int | None = None, pid: int | None = None) -> list[dict]:
+        """Get supported devices, optionally only ones matching the IDs.
+
+        Devices are served from the index while monitoring, and enumerated
+        otherwise. See :func:`enumerate_devices` for the exceptions raised.
+        """
+        _check_ids(vid, pid)
+        with self._lock:
+            index = None if self._index is None else dict(self._index)
+
+        if index is None:
+            return enumerate_devices(vid, pid)
+        if pid is not None:
+            return list(index.get((vid, pid), ()))  # type: ignore
+        return [
+            device
+            for ids, devices in index.items()
+            if vid is None or ids[0] == vid
+            for device in devices
+        ]
+
+    def start(self) -> bool:
+        """Index supported devices and keep the index updated from hotplug events.
+
+        Returns:
+            True if monitoring was started or is already running, False if hotplug
+            events are not available on this system.
+        """
+        if self.is_monitoring:
+            return True
+        # Release the resources of monitoring that stopped after an error.
+        self.stop()
+
+        try:
+            sock = socket.socket(
+                socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT
+            )
+        except (AttributeError, OSError):
+            # Not Linux or netlink isnt allowed here.
+            return False
+        try:
+            sock.bind((0, _KERNEL_EVENTS))
+        except OSError:
+            sock.close()
+            return False
+
+        # The socket is bound first so devices plugged in meanwhile arent missed.
+        self._sock = sock
+        self._wake = os.pipe()
+        self._refresh_all()
+        self._thread = Thread(
+            target=self._run, name="regium_klavye_hotplug", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """Stop monitoring, lookups enumerate again afterwards."""
+        if self._thread is None:
+            return
+
+        os.write(self._wake[1], b"\x00")  # type: ignore
+        self._thread.join()
+        self._sock.close()  # type: ignore
+        for fd in self._wake:  # type: ignore
+            os.close(fd)
+        self._thread = self._sock = self._wake = None
+        with self._lock:
+            self._index = None
+
+    def _run(self) -> None:
+        sock, wake = self._sock, self._wake[0]  # type: ignore
+        while True:
+            readable, _, _ = select.select((sock, wake), (), ())
+            if wake in readable:
+                return
+            try:
+                try:
+                    message = sock.recv(16384)  # type: ignore
+                except OSError:
+                    # The receive buffer overflowed and events were lost.
+                    self._refresh_all()
+                    continue
+                self._handle_uevent(message)
+            except Exception:
+                _LOGGER.exception("Failed to handle a hotplug event.")
+                if not self._recover():
+                    return
+
+    def _recover(self) -> bool:
+        """Index every device again after an error, stop monitoring if that fails.
+
+        Returns:
+            True if the index was rebuilt, False if lookups enumerate from now on.
+        """
+        try:
+            self._refresh_all()
+            return True
+        except Exception:
+            _LOGGER.exception("Failed to index devices, hotplug monitoring stopped.")
+        with self._lock:
+            self._index = None
+            self.generation += 1
+        return False
+
+    def _handle_uevent(self, message: bytes) -> None:
+        fields = dict(
+            field.split(b"=", 1) for field in message.split(b"\x00") if b"=" in field
+        )
+        if fields.get(b"SUBSYSTEM") != b"hidraw":
+            return
+        if fields.get(b"ACTION") not in (b"add", b"remove"):
+            return
+        if (match := _HID_DEVICE.search(fields.get(b"DEVPATH", b""))) is None:
+            return
+
+        ids = (int(match.group(1), 16), int(match.group(2), 16))
+        if ids in PROFILES:
+            self._refresh(*ids)
+
+    def _refresh(self, vid: int, pid: int) -> None:
+        devices = enumerate_devices(vid, pid)
+        with self._lock:
+            if self._index is None:
+                return
+            if devices:
+                self._index[(vid, pid)] = devices
+            else:
+                self._index.pop((vid, pid), None)
+            self.generation += 1
+
+    def _refresh_all(self) -> None:
+        index: dict[tuple[int, int], list[dict]] = {}
+        for device in enumerate_devices():
+            ids = (device["vendor_id"], device["product_id"])
+            index.setdefault(ids, []).append(device)
+        with self._lock:
+            self._index = index
+            self.generation += 1
+
+
+DEVICES = DeviceRegistry()
+"""Registry used by :func:`regium_klavye.rkapi.get_keyboards`."""
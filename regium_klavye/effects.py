@@ -0,0 +1,289 @@
+"""Procedural lighting effects computed from the position of keys.
+
+Effects compute a value between 0 and 1 for every key at once with NumPy array
+operations over the key centers of a keyboard, see :attr:`Keyboard.key_centers`.
+No Python code runs per key, so effects can render at full frame rate on low
+power hosts. Values are turned into colors by looking them up in a palette that
+is interpolated from a few colors once.
+
+Effects are render callbacks, they can be passed to
+:meth:`Keyboard.apply_custom_animation` as is. :meth:`Effect.render` gives a
+single frame for :meth:`Keyboard.set_frame`.
+
+NumPy is required, it is installed with the "numpy" extra.
+
+Example:
+    >>> from regium_klavye.effects import Ripple, Wave
+    >>> keyboard.apply_custom_animation(Wave(keyboard, [(255, 0, 0), (0, 0, 255)]))
+    >>> ripple = Ripple(keyboard, [(0, 0, 0), (0, 255, 255)], origin="G")
+    >>> keyboard.apply_custom_animation(ripple, duration=2)
+"""
+from __future__ import annotations
+
+from math import cos, radians, sin, tau
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .helpers import validate_color
+
+if TYPE_CHECKING:
+    from typing import Sequence
+
+    from .keyboard_parts import Keyboard
+
+    Point = str | tuple[float, float]
+
+PALETTE_SIZE = 256
+"""Number of colors interpolated into a palette."""
+
+
+def palette(
+    colors: Sequence[tuple[int, int, int]],
+    size: int = PALETTE_SIZE,
+    cyclic: bool = False,
+) -> np.ndarray:
+    """Interpolate colors into a lookup table.
+
+    Args:
+        colors: Red, green and blue values spread evenly from the first entry of
+            the table to the last.
+        size: Number of entries in the table.
+        cyclic: Interpolate back to the first color at the end, so values that
+            wrap around from 1 to 0 dont jump between colors.
+
+    Returns:
+        A (size, 3) uint8 array.
+
+    Raises:
+        ValueError: No colors were provided.
+    """
+    if not colors:
+        raise ValueError("Expected at least one color.")
+    for rgb in colors:
+        validate_color(rgb)
+
+    stops = np.array(colors, dtype=np.float64)
+    if cyclic:
+        stops = np.concatenate((stops, stops[:1]))
+    positions = np.linspace(0, 1, len(stops))
+    samples = np.linspace(0, 1, size)
+
+    table = np.empty((size, 3), dtype=np.uint8)
+    for channel in range(3):
+        table[:, channel] = np.rint(np.interp(samples, positions, stops[:, channel]))
+    return table
+
+
+def _point(keyboard: Keyboard, point: Point | None) -> tuple[float, float]:
+    """Get the coordinates of a key label or point, the middle if None."""
+    if point is None:
+        width, height = keyboard.size
+        return width / 2, height / 2
+    if isinstance(point, str):
+        return keyboard.key_centers[point]
+    return point
+
+
+class Effect:
+    """Base class of effects.
+
+    Subclasses compute the value of every key in :meth:`values`, the value is
+    looked up in the palette to get the color of the key.
+
+    Args:
+        keyboard: Keyboard the effect is rendered for.
+        colors: Colors of the palette, see :func:`palette`.
+        cyclic: Create a cyclic palette, for values that wrap around.
+    """
+
+    __slots__ = ("x", "y", "palette", "_frame")
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        colors: Sequence[tuple[int, int, int]],
+        cyclic: bool = False,
+    ):
+        centers = np.array(list(keyboard.key_centers.values()), dtype=np.float64)
+        self.x: np.ndarray = centers[:, 0].copy()
+        """Horizontal center of each key in frame order."""
+        self.y: np.ndarray = centers[:, 1].copy()
+        """Vertical center of each key in frame order."""
+        self.palette = palette(colors, cyclic=cyclic)
+        self._frame = np.empty((len(centers), 3), dtype=np.uint8)
+
+    def __repr__(self) -> str:
+        """Get effect as string."""
+        return f"{type(self).__name__}(keys={len(self.x)})"
+
+    def __call__(self, frame_number: int, elapsed: float) -> np.ndarray:
+        """Render the frame at the elapsed time, for use as a render callback."""
+        return self.render(elapsed)
+
+    def values(self, elapsed: float) -> np.ndarray:
+        """Get the value of every key in frame order, between 0 and 1."""
+        raise NotImplementedError
+
+    def render(self, elapsed: float = 0.0) -> np.ndarray:
+        """Render the frame at a time.
+
+        Args:
+            elapsed: Time in seconds since the effect started.
+
+        Returns:
+            A (N, 3) uint8 frame accepted by :meth:`Keyboard.set_frame`. The same
+            array is reused by the next render.
+        """
+        values = self.values(elapsed) * (len(self.palette) - 1)
+        indexes = np.clip(values, 0, len(self.palette) - 1, out=values).astype(np.intp)
+        return np.take(self.palette, indexes, axis=0, out=self._frame)
+
+
+class LinearGradient(Effect):
+    """Colors change along a direction across the keyboard.
+
+    Args:
+        keyboard: Keyboard the effect is rendered for.
+        colors: Colors from the start of the gradient to its end.
+        angle: Direction of the gradient in degrees, 0 being left to right and 90
+            top to bottom.
+        speed: Key units per second the gradient moves in its direction. Moving
+            gradients repeat and wrap around to the first color.
+    """
+
+    __slots__ = ("_distance", "_speed")
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        colors: Sequence[tuple[int, int, int]],
+        angle: float = 0.0,
+        speed: float = 0.0,
+    ):
+        super().__init__(keyboard, colors, cyclic=bool(speed))
+        distance = self.x * cos(radians(angle)) + self.y * sin(radians(angle))
+        distance -= distance.min()
+        length = distance.max() or 1.0
+        self._distance = distance / length
+        self._speed = speed / length
+
+    def values(self, elapsed: float) -> np.ndarray:  # noqa: D102
+        if not self._speed:
+            return self._distance
+        return (self._distance - self._speed * elapsed) % 1.0
+
+
+class RadialGradient(Effect):
+    """Colors change with the distance from a point.
+
+    Args:
+        keyboard: Keyboard the effect is rendered for.
+        colors: Colors from the center of the gradient to its edge.
+        center: Key label or coordinates of the center, defaults to the middle of
+            the keyboard.
+        radius: Distance in key units the gradient reaches its last color at,
+            defaults to the distance of the furthest key.
+        speed: Key units per second the gradient moves outwards. Moving gradients
+            repeat and wrap around to the first color.
+    """
+
+    __slots__ = ("_distance", "_speed")
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        colors: Sequence[tuple[int, int, int]],
+        center: Point | None = None,
+        radius: float | None = None,
+        speed: float = 0.0,
+    ):
+        super().__init__(keyboard, colors, cyclic=bool(speed))
+        center_x, center_y = _point(keyboard, center)
+        distance = np.hypot(self.x - center_x, self.y - center_y)
+        radius = radius or distance.max() or 1.0
+        self._distance = distance / radius
+        self._speed = speed / radius
+
+    def values(self, elapsed: float) -> np.ndarray:  # noqa: D102
+        if not self._speed:
+            return self._distance
+        return (self._distance - self._speed * elapsed) % 1.0
+
+
+class Wave(Effect):
+    """A sine wave travelling across the keyboard.
+
+    Keys fade from the first color to the last and back.
+
+    Args:
+        keyboard: Keyboard the effect is rendered for.
+        colors: Colors from the trough of the wave to its crest.
+        wavelength: Distance between two crests in key units.
+        speed: Key units per second the wave travels.
+        angle: Direction the wave travels in degrees, 0 being left to right and 90
+            top to bottom.
+    """
+
+    __slots__ = ("_phase", "_frequency")
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        colors: Sequence[tuple[int, int, int]],
+        wavelength: float = 6.0,
+        speed: float = 6.0,
+        angle: float = 0.0,
+    ):
+        if wavelength <= 0:
+            raise ValueError("Wavelength must be above 0.")
+        super().__init__(keyboard, colors)
+        distance = self.x * cos(radians(angle)) + self.y * sin(radians(angle))
+        self._phase = distance * (tau / wavelength)
+        self._frequency = speed * tau / wavelength
+
+    def values(self, elapsed: float) -> np.ndarray:  # noqa: D102
+        wave = np.sin(self._phase - self._frequency * elapsed)
+        return np.multiply(wave, 0.5, out=wave) + 0.5
+
+
+class Ripple(Effect):
+    """A ring spreading out from a point.
+
+    Args:
+        keyboard: Keyboard the effect is rendered for.
+        colors: Colors from the background to the crest of the ring.
+        origin: Key label or coordinates the ring starts from, defaults to the
+            middle of the keyboard.
+        speed: Key units per second the ring spreads out.
+        width: Width of the ring in key units.
+        interval: Seconds between two ripples, a single ripple if None.
+    """
+
+    __slots__ = ("_distance", "_speed", "_width", "_interval")
+
+    def __init__(
+        self,
+        keyboard: Keyboard,
+        colors: Sequence[tuple[int, int, int]],
+        origin: Point | None = None,
+        speed: float = 10.0,
+        width: float = 1.5,
+        interval: float | None = None,
+    ):
+        if width <= 0:
+            raise ValueError("Width must be above 0.")
+        if interval is not None and interval <= 0:
+            raise ValueError("Interval must be above 0.")
+        super().__init__(keyboard, colors)
+        origin_x, origin_y = _point(keyboard, origin)
+        self._distance = np.hypot(self.x - origin_x, self.y - origin_y)
+        self._speed = speed
+        self._width = width
+        self._interval = interval
+
+    def values(self, elapsed: float) -> np.ndarray:  # noqa: D102
+        if self._interval is not None:
+            elapsed %= self._interval
+        offset = (self._distance - self._speed * elapsed) / self._width
+        return np.exp(-(offset * offset))
@@ -2,4 +2,4 @@
 
 
 from .colors import validate_color
-from .param_parser import parse_params
+from .param_parser import ParamParser, parse_params
@@ -26,5 +26,5 @@ def validate_color(rgb: Sequence[int] | None) -> None:
     for color in rgb:
         if not isinstance(color, int):
             raise TypeError(f"Expected sequence of integers, found {rgb}.")
-        if 0 <= color <= 255:
+        if not 0 <= color <= 255:
             raise ValueError("Color values must be between 0 and 255.")
@@ -4,67 +4,117 @@ from __future__ import annotations
 from typing import TYPE_CHECKING, Sequence
 
 if TYPE_CHECKING:
+    from typing import Callable
+
     from ..keyboard_profiles.profile_types import AnimationParam, ColorParam
 
 
+def _never_valid(value: list[int]) -> bool:
+    return False
+
+
+class ParamParser:
+    """Parameter definitions prepared once, to parse parameters many times.
+
+    Sequences of accepted values are turned into sets and defaults are gathered
+    up front, so parsing only checks the parameters that were provided.
+
+    Args:
+        base_params: Definition of each parameter, in the order their values are
+            sent to the keyboard.
+    """
+
+    __slots__ = ("defaults", "_names", "_params")
+
+    def __init__(self, base_params: dict[str, AnimationParam | ColorParam]):
+        self.defaults: dict[str, list[int]] = {
+            param: definition["default"] for param, definition in base_params.items()
+        }
+        """Default value of each parameter."""
+
+        self._names = frozenset(base_params)
+        self._params: tuple[
+            tuple[str, int, frozenset[int] | range | None, Callable], ...
+        ] = tuple(
+            (param, len(definition["default"]), *self._compile_check(definition))
+            for param, definition in base_params.items()
+        )
+
+    def __repr__(self) -> str:
+        """Get parser as string."""
+        return f"ParamParser(params={list(self.defaults)})"
+
+    @staticmethod
+    def _compile_check(
+        definition: AnimationParam | ColorParam,
+    ) -> tuple[frozenset[int] | range | None, Callable]:
+        match definition["checks"]:
+            case range() as checks:
+                return checks, _never_valid
+            case list() | tuple() as checks:
+                return frozenset(checks), _never_valid
+            case func if callable(func):
+                return None, func
+        return None, _never_valid
+
+    def parse(self, params: dict[str, Sequence[int]] | None) -> dict[str, list[int]]:
+        """Check parameters and fill in the missing ones with their defaults.
+
+        Args:
+            params: Parameters that were passed in from a function or user.
+
+        Raises:
+            ValueError: An unknown parameter was found or a value is invalid.
+        """
+        if params is None:
+            return dict(self.defaults)
+
+        if not self._names.issuperset(params):
+            raise ValueError(
+                f"Expected one or more from {sorted(self._names)}. "
+                f"Found {sorted(set(params) - self._names)}."
+            )
+
+        new_params: dict[str, list[int]] = {}
+        for param, length, accepted, check in self._params:
+            if param not in params:
+                new_params[param] = self.defaults[param]
+                continue
+
+            param_val = params[param]
+            if not (
+                isinstance(param_val, Sequence)
+                and len(param_val) == length
+                and all([isinstance(val, int) for val in param_val])
+            ):
+                raise ValueError(f"Invalid value provided for {param}.")
+
+            if accepted is not None:
+                is_valid = all(map(accepted.__contains__, param_val))
+            else:
+                is_valid = check(list(param_val))
+            if is_valid is not True:
+                raise ValueError(f"Invalid value provided for {param}.")
+
+            new_params[param] = param_val  # type: ignore
+
+        return new_params
+
+
 def parse_params(
     params: dict[str, Sequence[int]] | None,
     base_params: dict[str, AnimationParam | ColorParam],
 ) -> dict[str, list[int]]:
     """Parse and fill in the missing parameters.
 
+    Parameters parsed often should use a :class:`ParamParser` created once.
+
     Args:
         params: Parameters that were passed in from a function or user.
         base_params: Default parameters for params to be filled in.
 
     Raises:
         ValueError: Extra parameter was found.
+            A value is invalid.
     """
-    if params is None:
-        default_params = {}
-        for param in base_params.keys():
-            default_params[param] = base_params[param]["default"]
-        return default_params
-
-    if (param_s := set(params)) != (base_params_s := set(base_params)):
-        extra_params = param_s - base_params_s
-        ValueError(
-            f"Expected one or more from "
-            f"({base_params.keys()}. Found {sorted(extra_params)})"
-        )
-
-    _params: dict[str, Sequence[int]] = {}
-
-    new_params = {}
-    for param in base_params:
-        is_valid = False
-        if param not in params:
-            new_params[param] = base_params[param]["default"]
-            continue
-
-        param_val = params[param]
-        base_param_val = base_params[param]["default"]
-
-        if (
-            isinstance(param_val, Sequence)
-            and len(param_val) == len(base_param_val)
-            and all([isinstance(val, int) for val in param_val])
-        ):
-            _params[param] = list(param_val)
-        else:
-            raise ValueError(f"Invalid value provided for {param}.")
-
-        match base_params[param]["checks"]:
-            case list() | range() | tuple() as in_check if len(_params[param]) == len(
-                base_params[param]["default"]
-            ):
-                is_valid = all([value in in_check for value in _params[param]])
-            case func if callable(func):
-                is_valid = func(_params[param])
-
-        if is_valid is not True:
-            raise ValueError(f"Invalid value provided for {param}.")
-
-        new_params[param] = params[param]
-
-    return new_params
+    return ParamParser(base_params).parse(params)
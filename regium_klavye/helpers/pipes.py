@@ -0,0 +1,39 @@
+"""Operations related to reading from pipes."""
+from __future__ import annotations
+
+import os
+import stat
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import BinaryIO
+
+
+def is_pipe(file: BinaryIO) -> bool:
+    """Check if a file is a pipe or another stream rather than a regular file."""
+    try:
+        return not stat.S_ISREG(os.fstat(file.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        # In memory files and such.
+        return False
+
+
+def pending_bytes(file: BinaryIO) -> int | None:
+    """Get the number of bytes waiting to be read from a pipe.
+
+    Returns:
+        Number of bytes, None if it cant be known on this system or for the file.
+    """
+    try:
+        import fcntl
+        import termios
+    except ImportError:
+        return None
+
+    buffer = bytearray(4)
+    try:
+        fcntl.ioctl(file.fileno(), termios.FIONREAD, buffer)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return int.from_bytes(buffer, sys.byteorder)
@@ -0,0 +1,303 @@
+"""Counters and latency histograms of the time spent talking to keyboards.
+
+Instrumentation is disabled by default and every instrumented call site only
+checks :data:`metrics` for None, so it costs close to nothing until
+:func:`enable` is called.
+
+Phases timed in seconds:
+    ``enumerate``: Enumerating devices.
+    ``open``: Opening a device.
+    ``encode``: Encoding colors or an animation into reports.
+    ``pacing``: Waiting between two reports so the keyboard can keep up.
+    ``write``: Writing a single report.
+    ``daemon``: Forwarding a request to the daemon, or finding it isnt running.
+
+Counters:
+    ``reports``: Reports written.
+    ``bytes``: Bytes written.
+    ``errors``: Reports that failed to be written.
+    ``reopens``: Sessions reopened after a write failed.
+    ``frames_dropped``: Frames replaced or skipped before they were written.
+
+Example:
+    >>> from regium_klavye import instrumentation
+    >>> metrics = instrumentation.enable()
+    >>> keyboard.apply_color((255, 0, 0))
+    >>> metrics.counters["reports"]
+    8
+    >>> instrumentation.write_prometheus("/var/lib/node_exporter/rk.prom")
+"""
+from __future__ import annotations
+
+import os
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from threading import Lock
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, ContextManager, Iterator
+
+    Sink = Callable[[str, float], Any]
+
+PHASES = ("enumerate", "open", "encode", "pacing", "write", "daemon")
+COUNTERS = ("reports", "bytes", "errors", "reopens", "frames_dropped")
+
+BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+)
+"""Upper bounds in seconds of histogram buckets, a last bucket holds the rest."""
+
+_COUNTER_HELP = {
+    "reports": "Reports written to keyboards.",
+    "bytes": "Bytes written to keyboards.",
+    "errors": "Reports that failed to be written.",
+    "reopens": "Sessions reopened after a write failed.",
+    "frames_dropped": "Frames replaced or skipped before they were written.",
+}
+
+
+class Histogram:
+    """Latency histogram with fixed buckets.
+
+    Args:
+        buckets: Sorted upper bounds of the buckets in seconds.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "sum", "max")
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def __repr__(self) -> str:
+        """Get histogram as string."""
+        return f"Histogram(count={self.count}, sum={self.sum}, max={self.max})"
+
+    def observe(self, value: float) -> None:
+        """Add a value to the histogram."""
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls in.
+
+        Values above the last bucket are estimated as the largest value seen.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Counters and a latency histogram for each phase.
+
+    Sinks are called with the name and value of every observation, a phase with
+    the time it took in seconds and a counter with the amount it increased by.
+
+    Args:
+        buckets: Upper bounds of histogram buckets in seconds.
+    """
+
+    __slots__ = ("counters", "histograms", "sinks", "_lock")
+
+    def __init__(self, buckets: tuple[float, ...] = BUCKETS):
+        self.counters: dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.histograms: dict[str, Histogram] = {
+            phase: Histogram(buckets) for phase in PHASES
+        }
+        self.sinks: list[Sink] = []
+        self._lock = Lock()
+
+    def __repr__(self) -> str:
+        """Get metrics as string."""
+        return f"Metrics(counters={self.counters})"
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Increase a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        for sink in self.sinks:
+            sink(name, value)
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """Record the time a phase took."""
+        with self._lock:
+            if (histogram := self.histograms.get(phase)) is None:
+                histogram = self.histograms[phase] = Histogram()
+            histogram.observe(seconds)
+        for sink in self.sinks:
+            sink(phase, seconds)
+
+    @contextmanager
+    def timed(self, phase: str) -> Iterator[None]:
+        """Time the block as a phase, also when it raises."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, perf_counter() - start)
+
+    def timed_write(
+        self,
+        write: Callable[[Any, bytes | bytearray, int], None],
+        dev: Any,
+        data: bytes | bytearray,
+        report_type: int,
+        waited: float,
+    ) -> None:
+        """Write a report and record its pacing wait, duration and size."""
+        if waited:
+            self.observe("pacing", waited)
+        start = perf_counter()
+        try:
+            write(dev, data, report_type)
+        except Exception:
+            self.count("errors")
+            raise
+        finally:
+            self.observe("write", perf_counter() - start)
+        self.count("reports")
+        self.count("bytes", len(data))
+
+    def summary(self) -> str:
+        """Get a human readable summary of every phase and counter."""
+        lines = [
+            f"{'phase':<10}{'count':>8}{'total ms':>12}{'mean ms':>10}"
+            f"{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+        ]
+        for phase, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            lines.append(
+                f"{phase:<10}{histogram.count:>8}{histogram.sum * 1000:>12.3f}"
+                f"{histogram.sum / histogram.count * 1000:>10.3f}"
+                f"{histogram.quantile(0.5) * 1000:>10.3f}"
+                f"{histogram.quantile(0.99) * 1000:>10.3f}"
+                f"{histogram.max * 1000:>10.3f}"
+            )
+        lines.append(
+            ", ".join(f"{name}: {value}" for name, value in self.counters.items())
+        )
+        return "\n".join(lines)
+
+    def prometheus(self, prefix: str = "regium_klavye") -> str:
+        """Format the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in self.counters.items():
+                lines += [
+                    f"# HELP {prefix}_{name}_total {_COUNTER_HELP.get(name, name)}",
+                    f"# TYPE {prefix}_{name}_total counter",
+                    f"{prefix}_{name}_total {value}",
+                ]
+
+            metric = f"{prefix}_phase_seconds"
+            lines += [
+                f"# HELP {metric} Time spent in each phase of talking to keyboards.",
+                f"# TYPE {metric} histogram",
+            ]
+            for phase, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(
+                        f'{metric}_bucket{{phase="{phase}",le="{bound}"}} {cumulative}'
+                    )
+                lines += [
+                    f'{metric}_bucket{{phase="{phase}",le="+Inf"}} {histogram.count}',
+                    f'{metric}_sum{{phase="{phase}"}} {histogram.sum}',
+                    f'{metric}_count{{phase="{phase}"}} {histogram.count}',
+                ]
+        return "\n".join(lines) + "\n"
+
+
+metrics: Metrics | None = None
+"""Metrics being recorded, None while instrumentation is disabled."""
+
+_NOT_TIMED = nullcontext()
+
+
+def enable(sink: Sink | None = None) -> Metrics:
+    """Start recording metrics, keeps the current metrics if already enabled.
+
+    Args:
+        sink: Called with the name and value of every observation.
+    """
+    global metrics
+    if metrics is None:
+        metrics = Metrics()
+    if sink is not None:
+        metrics.sinks.append(sink)
+    return metrics
+
+
+def disable() -> Metrics | None:
+    """Stop recording metrics.
+
+    Returns:
+        The metrics recorded until now, None if instrumentation wasnt enabled.
+    """
+    global metrics
+    recorded, metrics = metrics, None
+    return recorded
+
+
+def timed(phase: str) -> ContextManager[None]:
+    """Time the block as a phase if instrumentation is enabled."""
+    if metrics is None:
+        return _NOT_TIMED
+    return metrics.timed(phase)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Increase a counter if instrumentation is enabled."""
+    if metrics is not None:
+        metrics.count(name, value)
+
+
+def write_prometheus(path: str, recorded: Metrics | None = None) -> None:
+    """Write metrics to a file for the node exporter textfile collector.
+
+    The file is replaced atomically so the collector never reads a partial file.
+
+    Args:
+        path: Path of the file, should end with ".prom".
+        recorded: Metrics to write, defaults to the ones being recorded.
+
+    Raises:
+        ValueError: Instrumentation isnt enabled and no metrics were provided.
+    """
+    if (recorded := recorded or metrics) is None:
+        raise ValueError("Instrumentation is not enabled.")
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w") as file:
+        file.write(recorded.prometheus())
+    os.replace(temporary, path)
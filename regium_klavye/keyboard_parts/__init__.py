@@ -2,4 +2,19 @@
 
 
 from .key import Key
-from .keyboard import AnimationNotSetError, Keyboard, KeyNotFoundError
+from .keyboard import (
+    AnimationNotSetError,
+    GroupNotFoundError,
+    Keyboard,
+    KeyNotFoundError,
+)
+from .presenter import Presenter
+
+
+def __getattr__(name: str):
+    # AsyncKeyboard imports asyncio, which is slow to import for synchronous users.
+    if name == "AsyncKeyboard":
+        from .async_keyboard import AsyncKeyboard
+
+        return AsyncKeyboard
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from types import TracebackType
+    from typing import Any, Callable, Mapping, TypeVar
+
+    from .keyboard import Keyboard
+
+    _T = TypeVar("_T")
+
+MAX_WORKERS = 4
+"""Maximum number of blocking HID calls running at the same time by default."""
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the executor shared by async keyboards for blocking HID calls.
+
+    The executor is created on first use and is bounded to :data:`MAX_WORKERS`.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS, thread_name_prefix="regium_klavye"
+        )
+    return _executor
+
+
+class AsyncKeyboard:
+    """Asynchronous wrapper around a :class:`Keyboard`.
+
+    Applying colors and animations runs the methods of the wrapped keyboard in an
+    executor, pacing between reports included, so the event loop is never
+    blocked and writes behave exactly like their synchronous versions, including
+    inside :meth:`Keyboard.transaction`. Calls for the same keyboard are
+    serialized to keep reports in order, while different keyboards can be updated
+    concurrently.
+
+    Setting colors and animations only changes the state of the wrapped keyboard
+    and is done directly. Only applying them is awaitable.
+
+    Args:
+        keyboard: Keyboard to wrap.
+        executor: Executor for blocking calls, defaults to a shared bounded one.
+    """
+
+    __slots__ = ("_keyboard", "_executor", "_lock")
+
+    def __init__(self, keyboard: Keyboard, executor: Executor | None = None):
+        self._keyboard = keyboard
+        self._executor = executor
+        self._lock = asyncio.Lock()
+
+    def __repr__(self) -> str:
+        """Get keyboard as string."""
+        return f"AsyncKeyboard({self._keyboard!r})"
+
+    async def __aenter__(self) -> AsyncKeyboard:
+        """Open a session that is kept until the block is exited."""
+        await self.open()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the session opened on enter."""
+        await self.close()
+
+    @property
+    def keyboard(self) -> Keyboard:
+        """The wrapped keyboard."""
+        return self._keyboard
+
+    @property
+    def name(self) -> str:
+        """Short name of the keyboard."""
+        return self._keyboard.name
+
+    @property
+    def long_name(self) -> str:
+        """Long name of the keyboard."""
+        return self._keyboard.long_name
+
+    def set_color(
+        self, rgb: tuple[int, int, int], options: dict[str, int] | None = None
+    ) -> None:
+        """See :meth:`Keyboard.set_color`."""
+        self._keyboard.set_color(rgb, options)
+
+    def set_key_color(self, key: str, rgb: tuple[int, int, int]) -> None:
+        """See :meth:`Keyboard.set_key_color`."""
+        self._keyboard.set_key_color(key, rgb)
+
+    def update_keys(self, colors: Mapping[str, tuple[int, int, int]]) -> None:
+        """See :meth:`Keyboard.update_keys`."""
+        self._keyboard.update_keys(colors)
+
+    def set_group_color(self, group: str, rgb: tuple[int, int, int]) -> None:
+        """See :meth:`Keyboard.set_group_color`."""
+        self._keyboard.set_group_color(group, rgb)
+
+    def set_frame(self, frame: Any) -> None:
+        """See :meth:`Keyboard.set_frame`."""
+        self._keyboard.set_frame(frame)
+
+    def set_color_params(self, options: dict[str, int]) -> None:
+        """See :meth:`Keyboard.set_color_params`."""
+        self._keyboard.set_color_params(options)
+
+    def set_animation(
+        self, anim_name: str, options: dict[str, int | list[int]] | None = None
+    ) -> None:
+        """See :meth:`Keyboard.set_animation`."""
+        self._keyboard.set_animation(anim_name, options)
+
+    async def _run(self, func: Callable[..., _T], *args: Any) -> _T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor or get_executor(), func, *args
+        )
+
+    async def open(self) -> None:
+        """Open a session with the keyboard, see :meth:`Keyboard.open`."""
+        async with self._lock:
+            await self._run(self._keyboard.open)
+
+    async def close(self) -> None:
+        """Close the session previously opened with :meth:`open`."""
+        async with self._lock:
+            await self._run(self._keyboard.close)
+
+    async def apply_color(
+        self, rgb: tuple[int, int, int] | None = None, force: bool = False
+    ) -> tuple[memoryview, ...]:
+        """Write the colors to the keyboard, see :meth:`Keyboard.apply_color`."""
+        async with self._lock:
+            return await self._run(self._keyboard.apply_color, rgb, force)
+
+    async def apply_animation(self) -> bytearray:
+        """Apply the previously set animation, see :meth:`Keyboard.apply_animation`."""
+        async with self._lock:
+            return await self._run(self._keyboard.apply_animation)
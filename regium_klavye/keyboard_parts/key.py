@@ -4,20 +4,37 @@ from ..helpers import validate_color
 class Key:
     """Represents a key on a Keyboard.
 
+    The colors of every key of a keyboard are stored together in one buffer and
+    a key is a view of its three bytes, changing the key changes the keyboard.
+    A key created without a buffer gets one of its own.
+
     All properties also implement setters to safely change attributes.
+
+    Args:
+        label: Label of the key.
+        indexes: Index of the key on the data to be sent, see :attr:`indexes`.
+        rgb: Color to set the key to, the key keeps the color in the buffer if
+            None.
+        colors: Buffer holding the red, green and blue value of keys.
+        position: Position of the key in the buffer.
     """
 
-    __slots__ = ("label", "_rgb", "_indexes")
+    __slots__ = ("label", "_indexes", "_colors", "_offset")
 
     def __init__(
         self,
         label: str,
         indexes: tuple[tuple[int, int], tuple[int, int], tuple[int, int]],
-        rgb: tuple[int, int, int] = (0, 0, 0),
+        rgb: tuple[int, int, int] | None = None,
+        colors: bytearray | None = None,
+        position: int = 0,
     ):
         self.label: str = label
         self.indexes = indexes
-        self.rgb = rgb
+        self._colors = bytearray(3) if colors is None else colors
+        self._offset = position * 3
+        if rgb is not None:
+            self.rgb = rgb
 
     def __repr__(self) -> str:
         """Get key as string."""
@@ -26,12 +43,12 @@ class Key:
     @property
     def rgb(self) -> tuple[int, int, int]:
         """Color value of the key."""
-        return self._rgb
+        return tuple(self._colors[self._offset : self._offset + 3])  # type: ignore
 
     @rgb.setter
     def rgb(self, val: tuple[int, int, int]) -> None:
         validate_color(val)
-        self._rgb: tuple[int, int, int] = val
+        self._colors[self._offset : self._offset + 3] = bytes(val)
 
     @property
     def indexes(self) -> tuple[tuple[int, int], tuple[int, int], tuple[int, int]]:
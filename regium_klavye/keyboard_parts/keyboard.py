@@ -1,18 +1,29 @@
 from __future__ import annotations
 
-from time import sleep
+from contextlib import contextmanager
+from time import monotonic
 from typing import TYPE_CHECKING
 
-import hid
-
-from ..helpers import parse_params, validate_color
+from .. import instrumentation
+from ..animation import AnimationEngine
+from ..helpers import validate_color
+from ..instrumentation import count, timed
 from ..keyboard_profiles import PROFILES
-from . import Key
+from ..keyboard_profiles.compiled import compile_profile, loaded_numpy
+from ..pacing import DEFAULT_REPORT_DELAY, Pacer, get_report_delay
+from ..transports import get_transport
+from .key import Key
+from .presenter import Presenter
 
 if TYPE_CHECKING:
-    from typing import Iterator
+    from types import TracebackType
+    from typing import Any, Iterable, Iterator, Mapping
 
+    from ..animation import AnimationStats, RenderCallback
+    from ..keyboard_profiles.compiled import CompiledProfile
     from ..keyboard_profiles.profile_types.commands import AnimationParam, ColorParam
+    from ..recording import Recorder
+    from ..transports import Device
 
 
 class Keyboard:
@@ -38,16 +49,26 @@ class Keyboard:
         "_model",
         "_final_anim_data",
         "_final_color_data",
-        "_anim_base",
+        "_sent_color_buffer",
+        "_sent_color_data",
+        "_sent_color_valid",
         "_anim_options",
         "_layout",
         "_current_color_params",
         "_color_params",
-        "_anim_padding",
         "_has_rgb",
         "_has_anim",
         "_has_custom_anim",
         "_path",
+        "_dev",
+        "_pacer",
+        "_compiled",
+        "_color_buffer",
+        "_frame",
+        "_groups",
+        "_recorder",
+        "_sent_anim_data",
+        "_transaction",
     )
 
     def __init__(self, vid: int, pid: int, path: bytes):
@@ -56,10 +77,31 @@ class Keyboard:
         self._vid: int = vid
         self._pid: int = pid
         self._path = path
+        self._dev: Device | None = None
+        self._pacer = Pacer(
+            get_report_delay(
+                vid, pid, _profile.get("report_delay", DEFAULT_REPORT_DELAY)
+            )
+        )
 
-        self._keys: dict[str, Key] = {
-            key[0]: Key(*key) for key in _profile["present_keys"]
-        }
+        self._compiled: CompiledProfile = compile_profile(_profile)
+        # Every color report back to back, keys are scattered into it when encoding.
+        # Reports are views into it, so encoding a frame doesnt allocate anything.
+        self._color_buffer = bytearray(self._compiled.color_template)
+        self._final_color_data: tuple[memoryview, ...] = tuple(
+            memoryview(self._color_buffer)[report]
+            for report in self._compiled.color_report_slices
+        )
+        # Colors of every key in frame order, see frame_keys. This is the only copy
+        # of the colors, Key objects are views into it.
+        self._frame = bytearray(self._compiled.frame_size)
+        # Created the first time keys are accessed, most uses never need them.
+        self._keys: dict[str, Key] | None = None
+        # Groups added with add_group, compiled like the ones of the profile.
+        self._groups: dict[str, tuple[int, ...]] = {}
+        self._recorder: Recorder | None = None
+        # Reports recorded by apply calls while a transaction is in progress.
+        self._transaction: list[tuple[str, bytes, bool]] | None = None
 
         self._layout = _profile.get("layout")
 
@@ -69,17 +111,25 @@ class Keyboard:
 
         self._anim_options = _profile["commands"]["animations"]["options"]
         self._anim_params = _profile["commands"]["animations"]["params"]
-        self._anim_base: list[int] = _profile["commands"]["animations"]["base"]
-        self._final_anim_data: bytearray
+        self._final_anim_data = bytearray()
         self._colors = _profile["commands"]["colors"]
         self._color_params = _profile["commands"]["colors"]["color_params"]["params"]
         self._kb_size = _profile["kb_size"]
         self._current_color_params: dict[str, list[int]] = {}
-        self._anim_padding = _profile["commands"]["animations"]["padding"]
         self._has_rgb = self._model["has_rgb"]
         self._has_anim = self._model["has_anim"]
         self._has_custom_anim = self._model["has_custom_anim"]
 
+        # Copy of the last successfully written color reports.
+        self._sent_color_buffer = bytearray(len(self._color_buffer))
+        self._sent_color_data: tuple[memoryview, ...] = tuple(
+            memoryview(self._sent_color_buffer)[report]
+            for report in self._compiled.color_report_slices
+        )
+        self._sent_color_valid = [False] * len(self._sent_color_data)
+        # Last animation report written, None once colors were written after it.
+        self._sent_anim_data: bytes | None = None
+
     @property
     def name(self) -> str:
         """Short name of the keyboard.
@@ -97,10 +147,55 @@ class Keyboard:
         """
         return self._model["long_name"]
 
+    @property
+    def vid(self) -> int:
+        """Vendor ID of the keyboard."""
+        return self._vid
+
+    @property
+    def pid(self) -> int:
+        """Product ID of the keyboard."""
+        return self._pid
+
     @property
     def valid_keys(self) -> list[str]:
         """Get all key labels on this keyboard."""
-        return sorted(self._keys.keys())
+        return sorted(self._compiled.key_order)
+
+    @property
+    def frame_keys(self) -> tuple[str, ...]:
+        """Get key labels in the order :meth:`set_frame` expects them."""
+        return self._compiled.key_order
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Width and height of the keyboard in key units."""
+        return self._kb_size
+
+    @property
+    def key_rects(self) -> dict[str, tuple[float, float, float, float]]:
+        """Get the x, y, width and height of each key in key units.
+
+        Coordinates are derived from the profile layout. The origin is the top left
+        corner of the keyboard and y increases downwards, a key unit being the
+        width of a letter key. Keys missing from the layout have an empty rectangle
+        in the middle of the keyboard.
+        """
+        return dict(zip(self._compiled.key_order, self._compiled.key_rects))
+
+    @property
+    def key_centers(self) -> dict[str, tuple[float, float]]:
+        """Get the center of each key in key units, see :attr:`key_rects`."""
+        return dict(zip(self._compiled.key_order, self._compiled.key_centers))
+
+    @property
+    def groups(self) -> dict[str, tuple[str, ...]]:
+        """Get key labels of every group, see :meth:`set_group_color`."""
+        key_order = self._compiled.key_order
+        return {
+            name: tuple(key_order[position] for position in positions)
+            for name, positions in {**self._compiled.groups, **self._groups}.items()
+        }
 
     @property
     def anim_options(self) -> list[str]:
@@ -137,15 +232,15 @@ class Keyboard:
 
     def __len__(self) -> int:
         """Get number of keys."""
-        return len(self._keys)
+        return len(self._compiled.key_order)
 
     def __getitem__(self, key: str) -> Key:
         """Get corresponding Key object with the key label provided."""
-        return self._keys[key]
+        return self._key_views()[key]
 
     def __iter__(self) -> Iterator[Key]:
         """Iterate over each key found on the keyboard."""
-        yield from self._keys.values()
+        yield from self._key_views().values()
 
     def __repr__(self) -> str:
         """Get keyboard as string."""
@@ -154,17 +249,233 @@ class Keyboard:
             f"long_name={self.long_name}, _vid={self._vid}, _pid={self._pid})"
         )
 
+    def __enter__(self) -> Keyboard:
+        """Open a session that is kept until the block is exited."""
+        self.open()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the session opened on enter."""
+        self.close()
+
+    @property
+    def report_delay(self) -> float:
+        """Minimum time in seconds between two reports written to the keyboard.
+
+        Defaults to the calibrated value for this device if one was stored with
+        :func:`~regium_klavye.pacing.save_report_delay`, otherwise the profile
+        default is used.
+        """
+        return self._pacer.delay
+
+    @report_delay.setter
+    def report_delay(self, delay: float) -> None:
+        if delay < 0:
+            raise ValueError("Report delay cannot be negative.")
+        self._pacer.delay = delay
+
+    @property
+    def is_open(self) -> bool:
+        """Check if a session is currently open for the keyboard."""
+        return self._dev is not None
+
+    def open(self) -> None:
+        """Open a session with the keyboard.
+
+        While a session is open every apply call reuses the same handle instead of
+        opening and closing the device each time. If the handle goes stale, for
+        example when the keyboard is replugged, it is reopened on the next write.
+        Calling this on an already open keyboard does nothing.
+        """
+        if self._dev is None:
+            self._dev = self._open_device()
+
+    def close(self) -> None:
+        """Close the session previously opened with :meth:`open`."""
+        if self._dev is not None:
+            dev, self._dev = self._dev, None
+            dev.close()
+
+    @contextmanager
+    def _session(self) -> Iterator[Keyboard]:
+        """Keep a session open for the block, without closing one opened before."""
+        if self._dev is not None:
+            yield self
+            return
+        with self:
+            yield self
+
+    def _open_device(self) -> Device:
+        with timed("open"):
+            return get_transport().open(self._path)
+
+    def _write_reports(
+        self, reports: Iterable[bytes | bytearray], report_type: int
+    ) -> None:
+        """Write reports using the open session or a temporary handle."""
+        reports = tuple(reports)
+        if not reports:
+            return
+        if (recorder := self._recorder) is not None:
+            started = monotonic()
+
+        if self._dev is None:
+            dev = self._open_device()
+            try:
+                self._send_reports(dev, reports, report_type, self._pacer)
+            finally:
+                dev.close()
+        else:
+            try:
+                self._send_reports(self._dev, reports, report_type, self._pacer)
+            except (OSError, ValueError):
+                # The handle went stale (device was replugged, suspended etc.).
+                # Reopen once and retry, a second failure is raised to the caller.
+                count("reopens")
+                self.close()
+                self.open()
+                self._send_reports(self._dev, reports, report_type, self._pacer)
+
+        if recorder is not None:
+            recorder.record(started, reports, report_type)
+
+    @classmethod
+    def _send_reports(
+        cls,
+        dev: Device,
+        reports: Iterable[bytes | bytearray],
+        report_type: int,
+        pacer: Pacer,
+    ) -> None:
+        # Read once, instrumentation is checked for every report.
+        metrics = instrumentation.metrics
+        for data in reports:
+            #  Writing data too fast can cause incorrect settings to be set.
+            waited = pacer.wait()
+            try:
+                if metrics is None:
+                    cls._write_report(dev, data, report_type)
+                else:
+                    metrics.timed_write(
+                        cls._write_report, dev, data, report_type, waited
+                    )
+            finally:
+                pacer.mark()
+
+    @staticmethod
+    def _write_report(dev: Device, data: bytes | bytearray, report_type: int) -> None:
+        match report_type:
+            case 0x02:
+                result = dev.send_feature_report(data)
+            case 0x03:
+                result = dev.write(data)
+            case _:
+                raise ValueError(f"Unknown report type {report_type}.")
+
+        if result == -1:
+            raise OSError("Failed to write report to the keyboard.")
+
     def set_key_color(self, key: str, rgb: tuple[int, int, int]) -> None:
         """Set RGB values for only a specific key.
 
+        To set many keys use :meth:`update_keys`, which is much faster.
+
         Args:
             key: Label for the specified key.
             rgb: Red green and blue value.
         """
-        if key in self.valid_keys:
-            self[key].rgb = rgb
-            return
-        raise KeyNotFoundError(self.name, key)
+        if (position := self._compiled.key_positions.get(key)) is None:
+            raise KeyNotFoundError(self.name, key)
+        validate_color(rgb)
+        self._frame[position * 3 : position * 3 + 3] = bytes(rgb)
+
+    def update_keys(self, colors: Mapping[str, tuple[int, int, int]]) -> None:
+        """Set the colors of many keys at once, other keys keep their color.
+
+        Every key and color is checked before any key is changed.
+
+        Args:
+            colors: Red green and blue value of each key label.
+
+        Raises:
+            KeyNotFoundError: A key is not present on the keyboard.
+        """
+        positions = self._compiled.key_positions
+        encoded: dict[tuple[int, ...], bytes] = {}
+        updates = []
+        for label, rgb in colors.items():
+            if (position := positions.get(label)) is None:
+                raise KeyNotFoundError(self.name, label)
+            # Keys often share colors, each distinct color is only checked once.
+            if (color := encoded.get(rgb := tuple(rgb))) is None:
+                validate_color(rgb)
+                color = encoded[rgb] = bytes(rgb)
+            updates.append((position * 3, color))
+
+        frame = self._frame
+        for offset, color in updates:
+            frame[offset : offset + 3] = color
+
+    def set_group_color(self, group: str, rgb: tuple[int, int, int]) -> None:
+        """Set every key in a group to a color.
+
+        Built in groups are "letters", "numbers" (the number row), "arrows",
+        "modifiers" and a group for each row from "row1" at the top, if the
+        keyboard has them. Profiles and :meth:`add_group` can define more, the
+        :attr:`groups` property lists them.
+
+        Args:
+            group: Name of the group.
+            rgb: Red green and blue value.
+
+        Raises:
+            GroupNotFoundError: The group doesnt exist on this keyboard.
+        """
+        positions = self._group_positions(group)
+        validate_color(rgb)
+        color = bytes(rgb)
+        frame = self._frame
+        for position in positions:
+            frame[position * 3 : position * 3 + 3] = color
+
+    def add_group(self, name: str, keys: Iterable[str]) -> None:
+        """Define a group of keys, replacing any group with the same name.
+
+        Args:
+            name: Name of the group, used with :meth:`set_group_color`.
+            keys: Labels of the keys in the group.
+
+        Raises:
+            KeyNotFoundError: A key is not present on the keyboard.
+        """
+        try:
+            self._groups[name] = self._compiled.compile_group(keys)
+        except KeyError as error:
+            raise KeyNotFoundError(self.name, error.args[0]) from None
+
+    def remove_group(self, name: str) -> None:
+        """Remove a group defined with :meth:`add_group`.
+
+        Raises:
+            GroupNotFoundError: No group with the name was added.
+        """
+        if self._groups.pop(name, None) is None:
+            raise GroupNotFoundError(self.name, name)
+
+    def _group_positions(self, group: str) -> tuple[int, ...]:
+        try:
+            return self._groups[group]
+        except KeyError:
+            pass
+        try:
+            return self._compiled.groups[group]
+        except KeyError:
+            raise GroupNotFoundError(self.name, group) from None
 
     def set_color(
         self, rgb: tuple[int, int, int], options: dict[str, int] | None = None
@@ -185,10 +496,9 @@ class Keyboard:
                 :attr:`~color_params` property can be used.
         """
         validate_color(rgb)
-        for key in self:
-            key._rgb = rgb
+        self._frame[:] = bytes(rgb) * len(self._compiled.key_order)
 
-        parse_params(options, self._color_params)  # type: ignore
+        self._compiled.color_params.parse(options)  # type: ignore
 
     def set_color_params(self, options: dict[str, int]):
         """Set color parameters.
@@ -202,72 +512,188 @@ class Keyboard:
 
                 The integer is the value for whatever settings that corresponds.
         """
-        self._current_color_params = parse_params(
-            options, self._color_params  # type: ignore
+        self._current_color_params = self._compiled.color_params.parse(
+            options  # type: ignore
+        )
+        params = bytes(
+            value for param in self._current_color_params.values() for value in param
         )
+        param_slice = self._compiled.param_slice
+        self._color_buffer[param_slice] = params.ljust(
+            param_slice.stop - param_slice.start, b"\x00"
+        )
+
+    def set_frame(self, frame: Any) -> None:
+        """Set the color of every key at once.
+
+        The frame is copied over the colors of the keys at once, which is much
+        faster than setting keys one by one when whole frames are pushed at high
+        rates.
+
+        Args:
+            frame: A (N, 3) uint8 NumPy array or any buffer of N * 3 bytes, N being
+                the number of keys. Each key has a red, green and blue value and
+                keys are ordered as :attr:`frame_keys`.
+
+        Raises:
+            TypeError: The frame isnt a buffer of bytes.
+            ValueError: The frame doesnt have a color for every key.
+        """
+        self._frame[:] = self._frame_view(frame)
+
+    def get_frame(self) -> bytes:
+        """Get a copy of the color of every key, as accepted by :meth:`set_frame`.
+
+        Example:
+            >>> snapshot = keyboard.get_frame()
+            >>> keyboard.set_color((255, 0, 0))
+            >>> keyboard.set_frame(snapshot)  # Back to the colors before.
+        """
+        return bytes(self._frame)
+
+    def _frame_view(self, frame: Any) -> memoryview:
+        """Validate a frame and get it as a flat view of bytes."""
+        if (np := loaded_numpy()) is not None and isinstance(frame, np.ndarray):
+            if frame.dtype != np.uint8:
+                raise TypeError(f"Expected uint8 array, found {frame.dtype}.")
+            frame = np.ascontiguousarray(frame)
+
+        view = memoryview(frame)
+        if view.itemsize != 1:
+            raise TypeError(f"Expected a buffer of bytes, found {view.format}.")
+        view = view.cast("B")
+        if len(view) != len(self._frame):
+            raise ValueError(
+                f"Expected {len(self._frame)} bytes in frame, found {len(view)}."
+            )
+        return view
+
+    def presenter(self) -> Presenter:
+        """Create a presenter that writes frames from a background thread.
+
+        Example:
+            >>> with keyboard.presenter() as presenter:
+            ...     presenter.present(frame)  # Returns without waiting for the USB.
+            ...     presenter.flush()  # Waits until the newest frame is written.
+
+        While the presenter runs it owns the keyboard, apply methods should not be
+        called directly until it is stopped.
+        """
+        return Presenter(self)
+
+    def recorder(self, path: str) -> Recorder:
+        """Create a recorder that stores every report written to the keyboard.
+
+        Example:
+            >>> with keyboard.recorder("show.rkrec"):
+            ...     keyboard.apply_custom_animation(render, duration=60)
+
+        See :mod:`~regium_klavye.recording` to replay recordings.
+
+        Args:
+            path: Path of the file to write, replaced if it exists.
+        """
+        from ..recording import Recorder
+
+        return Recorder(self, path)
+
+    def _key_views(self) -> dict[str, Key]:
+        """Get a Key object of each key, viewing its color in the frame."""
+        if self._keys is None:
+            # Keys are in frame order since the frame is laid out from present_keys.
+            present_keys = PROFILES[(self._vid, self._pid)]["present_keys"]
+            self._keys = {
+                label: Key(label, indexes, colors=self._frame, position=position)
+                for position, (label, indexes) in enumerate(present_keys)
+            }
+        return self._keys
 
     def _color_data(self) -> None:
         """Construct final bytes to be written for static color selection."""
-        steps: list[list[int]] = self._colors["steps"]
-        # The steps are the blank version of the data to be sent.
-        for valid_key in self.valid_keys:
-            key: Key = self._keys[valid_key]
-            # Zipping results in iterating each key color index and each rgb value.
-            # As result indexes first value is the step count and the second value
-            # is its index on that step.
-            # Each value for indexes is an index for each color.
-
-            # Basically its iterating over:
-            # ((red_step, red_index), red_value),
-            # ((green_step, green_index), green_value)...
-            for indexes, color in zip(key.indexes, key.rgb):
-                step_index = indexes[0]  # responds to the nth list for the data.
-                color_index = indexes[1]  # responds to index in that list.
-                steps[step_index][color_index] = color
-
-        param_base = self._colors["color_params"]["base"]
-        new_param = list(param_base)
-        for param in self._current_color_params.values():
-            new_param += param
-        new_param += (self._anim_padding - len(new_param)) * [0x00]
-        steps.append(new_param)
-
-        self._final_color_data: tuple[bytearray, ...] = tuple(map(bytearray, steps))
+        self._compiled.scatter_into(self._color_buffer, self._frame)
+
+    def _changed_color_data(self) -> list[int]:
+        """Get indexes of color reports that differ from the last written ones."""
+        return [
+            index
+            for index, (data, sent, valid) in enumerate(
+                zip(
+                    self._final_color_data,
+                    self._sent_color_data,
+                    self._sent_color_valid,
+                )
+            )
+            if not valid or data != sent
+        ]
+
+    def invalidate(self) -> None:
+        """Forget what was last written to the keyboard.
+
+        The next :meth:`apply_color` call will send every report. This is useful
+        when the lighting was changed outside of this object, for example with the
+        keyboards own shortcuts or another program.
+        """
+        self._sent_color_valid = [False] * len(self._sent_color_valid)
+        self._sent_anim_data = None
 
     def apply_color(
         self,
         rgb: tuple[int, int, int] | None = None,
-    ) -> tuple[bytearray, ...]:
+        force: bool = False,
+    ) -> tuple[memoryview, ...]:
         """Write the final data to the interface.
 
         An rgb can also be provided to set and apply with a single call.
         The rgb value (if provided) will be applied to all keys.
-        """
-        validate_color(rgb)
-        if rgb:
-            self.set_color(rgb)
-        self._color_data()
-        report_type: int = self._colors["report_type"]
+        If a session is open (see :meth:`open`) its handle is reused.
 
-        dev = hid.device()
-        dev.open_path(self._path)
-        dev.set_nonblocking(True)
-
-        match report_type:
-            case 0x02:
-                write_data = dev.send_feature_report
-            case 0x03:
-                write_data = dev.write
+        Only the reports that changed since the last successful write are sent.
+        The color parameter report is only sent when :meth:`set_color_params`
+        changed its value.
 
-        for data in self._final_color_data:
-            write_data(data)
-
-            #  Writing data too fast can cause incorrect settings to be set.
-            sleep(0.005)
+        Args:
+            rgb: Red green and blue value to apply to all keys.
+            force: Send every report even if it was already written.
 
-        dev.close()
+        Returns:
+            Every color report, including the ones that were not sent. These are
+            views into the keyboards report buffer and change with the next encode.
+        """
+        if self._transaction is not None:
+            # Forcing is recorded, the written state only changes on commit.
+            self._prepare_color(rgb, False)
+            self._transaction.append(("color", bytes(self._color_buffer), force))
+            return self._final_color_data
+
+        changed = self._prepare_color(rgb, force)
+        self._write_reports(
+            [self._final_color_data[index] for index in changed],
+            self._colors["report_type"],
+        )
+        self._commit_color(changed)
         return self._final_color_data
 
+    def _prepare_color(
+        self, rgb: tuple[int, int, int] | None, force: bool
+    ) -> list[int]:
+        """Encode colors and get the indexes of reports that must be written."""
+        with timed("encode"):
+            validate_color(rgb)
+            if rgb:
+                self.set_color(rgb)
+            self._color_data()
+            if force:
+                self.invalidate()
+            return self._changed_color_data()
+
+    def _commit_color(self, written: Iterable[int]) -> None:
+        """Record reports as successfully written."""
+        for index in written:
+            self._sent_color_data[index][:] = self._final_color_data[index]
+            self._sent_color_valid[index] = True
+        # The keyboard is back in static color mode.
+        self._sent_anim_data = None
+
     def set_animation(
         self,
         anim_name: str,
@@ -288,36 +714,135 @@ class Keyboard:
             options: To get the accepted animation parameters for this keyboard, the
                 :attr:`~anim_params` property can be used.
         """
-        new_options = parse_params(options, self._anim_params)  # type: ignore
-
-        anim_data: list[int] = self._anim_base + self._anim_options[anim_name]["value"]
-        for option in new_options.values():
-            anim_data.extend(option)
-
-        self._final_anim_data = bytearray(
-            anim_data + (self._anim_padding - len(anim_data)) * [0x00]
-        )
+        with timed("encode"):
+            self._final_anim_data = bytearray(
+                self._compiled.encode_animation(anim_name, options)  # type: ignore
+            )
 
     def apply_animation(self) -> bytearray:
         """Apply the previously set animation to the keyboard."""
         if not self._final_anim_data:
             raise AnimationNotSetError
-        report_type = self._colors["report_type"]
+        if self._transaction is not None:
+            self._transaction.append(("animation", bytes(self._final_anim_data), False))
+            return self._final_anim_data
 
-        dev = hid.device()
-        dev.open_path(self._path)
+        self._write_reports((self._final_anim_data,), self._colors["report_type"])
+        self._commit_animation(self._final_anim_data)
+        return self._final_anim_data
 
-        if report_type == 0x02:
-            dev.send_feature_report(self._final_anim_data)
-        elif report_type == 0x03:
-            dev.write(self._final_anim_data)
+    def _commit_animation(self, written: bytes | bytearray) -> None:
+        """Record an animation report as successfully written."""
+        # The keyboard left static color mode, colors must be fully sent again.
+        self.invalidate()
+        self._sent_anim_data = bytes(written)
+
+    @contextmanager
+    def transaction(self) -> Iterator[Keyboard]:
+        """Group changes so they reach the keyboard as one update.
+
+        Inside the block :meth:`apply_color` and :meth:`apply_animation` dont
+        write anything, they only record what they would write. Static colors and
+        animations replace each other on the keyboard, so when the block exits
+        only the last apply is written, skipping reports the keyboard already
+        has. The reports are written over one handle with one pacing schedule,
+        the keyboard never shows the states in between and nothing is written
+        twice.
+
+        If the block raises, every change made in it is undone and nothing is
+        written. Custom animations and presenters write as they go and should
+        not be run inside a transaction.
+
+        Example:
+            >>> with keyboard.transaction():
+            ...     keyboard.set_color_params({"sleep": [2]})
+            ...     keyboard.set_color((0, 0, 255))
+            ...     keyboard.set_group_color("arrows", (255, 0, 0))
+            ...     keyboard.apply_color()
+
+        Raises:
+            RuntimeError: A transaction is already in progress.
+        """
+        if self._transaction is not None:
+            raise RuntimeError("A transaction is already in progress.")
+
+        frame, color_buffer = bytes(self._frame), bytes(self._color_buffer)
+        anim_data, color_params = self._final_anim_data, self._current_color_params
+        groups = dict(self._groups)
+        self._transaction = applied = []
+        try:
+            yield self
+        except BaseException:
+            self._frame[:] = frame
+            self._color_buffer[:] = color_buffer
+            self._final_anim_data = anim_data
+            self._current_color_params = color_params
+            self._groups = groups
+            raise
+        finally:
+            self._transaction = None
+
+        self._write_transaction(applied)
+
+    def _write_transaction(self, applied: list[tuple[str, bytes, bool]]) -> None:
+        """Write the reports recorded by a transaction."""
+        if not applied:
+            return
+        # Animations and static colors are exclusive modes, the last apply decides.
+        kind, data, _ = applied[-1]
+        if any(force for _kind, _, force in applied if _kind == kind):
+            self.invalidate()
+
+        if kind == "animation":
+            if data == self._sent_anim_data:
+                return
+            self._write_reports((data,), self._colors["report_type"])
+            self._commit_animation(data)
+            return
 
-        dev.close()
-        return self._final_anim_data
+        buffer = memoryview(data)
+        slices = self._compiled.color_report_slices
+        changed = [
+            index
+            for index, report in enumerate(slices)
+            if not self._sent_color_valid[index]
+            or self._sent_color_data[index] != buffer[report]
+        ]
+        self._write_reports(
+            [buffer[slices[index]] for index in changed], self._colors["report_type"]
+        )
+        for index in changed:
+            self._sent_color_data[index][:] = buffer[slices[index]]
+            self._sent_color_valid[index] = True
+        self._sent_anim_data = None
 
-    def apply_custom_animation(self, animation: str):
-        """TODO"""  # noqa
-        raise NotImplementedError
+    def apply_custom_animation(
+        self,
+        render: RenderCallback,
+        fps: float = 30,
+        duration: float | None = None,
+    ) -> AnimationStats:
+        """Run an animation rendered on the host.
+
+        Blocks until the duration passes or the render callback raises. Frames are
+        presented over a single session and frames that cant be written in time
+        are dropped instead of queued. For more control, such as stopping the
+        animation from another thread, use
+        :class:`~regium_klavye.animation.AnimationEngine` directly.
+
+        Args:
+            render: Called with the frame number and the elapsed time in seconds.
+                Returns a frame accepted by :meth:`set_frame`, or None if the
+                frame didnt change.
+            fps: Target frames per second.
+            duration: Time in seconds to run for, runs until interrupted if None.
+        """
+        if not self.has_custom_anim:
+            raise NotImplementedError(
+                f"{self.long_name} does not support custom animations."
+            )
+        with self._session():
+            return AnimationEngine(self, render, fps).run(duration)
 
 
 class KeyNotFoundError(Exception):
@@ -327,6 +852,13 @@ class KeyNotFoundError(Exception):
         super().__init__(f"The {key} key was not found on {keyboard_model}.")
 
 
+class GroupNotFoundError(Exception):
+    """Raised if a group of keys is not found on a keyboard."""
+
+    def __init__(self, keyboard_model: str, group: str):
+        super().__init__(f"The {group} group was not found on {keyboard_model}.")
+
+
 class AnimationNotSetError(Exception):
     """Raised if an animation is applied without setting first."""
 
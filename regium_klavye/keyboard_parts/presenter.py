@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from threading import Condition, Thread
+from typing import TYPE_CHECKING
+
+from ..instrumentation import count
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Any
+
+    from .keyboard import Keyboard
+
+
+class Presenter:
+    """Write frames to a keyboard from a background thread.
+
+    Frames are double buffered. :meth:`present` copies the frame into the back
+    buffer and returns right away, the writer thread swaps it with the front
+    buffer and writes it. If frames are presented faster than the keyboard can
+    take them, only the newest one is written and the others are dropped.
+    The producer only ever waits for the copy, never for USB I/O.
+
+    Presenters are usually created with :meth:`Keyboard.presenter` and used as
+    a context manager, which starts the writer thread and stops it on exit.
+
+    Args:
+        keyboard: Keyboard to write frames to.
+    """
+
+    __slots__ = (
+        "_keyboard",
+        "_cond",
+        "_back",
+        "_front",
+        "_pending",
+        "_submitted",
+        "_written",
+        "_error",
+        "_thread",
+        "_running",
+        "presented",
+        "dropped",
+    )
+
+    def __init__(self, keyboard: Keyboard):
+        self._keyboard = keyboard
+        self._cond = Condition()
+        self._back = bytearray(len(keyboard._frame))
+        self._front = bytearray(len(keyboard._frame))
+        self._pending = False
+        self._submitted = 0
+        self._written = 0
+        self._error: Exception | None = None
+        self._thread: Thread | None = None
+        self._running = False
+
+        self.presented = 0
+        """Number of frames written to the keyboard."""
+
+        self.dropped = 0
+        """Number of frames replaced by a newer one before they were written."""
+
+    def __repr__(self) -> str:
+        """Get presenter as string."""
+        return (
+            f"Presenter(keyboard={self._keyboard!r}, running={self._running}, "
+            f"presented={self.presented}, dropped={self.dropped})"
+        )
+
+    def __enter__(self) -> Presenter:
+        """Start the writer thread."""
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Stop the writer thread, writing the last frame if it is pending."""
+        self.stop()
+
+    @property
+    def running(self) -> bool:
+        """Check if the writer thread is running."""
+        return self._running
+
+    def start(self) -> None:
+        """Start the writer thread, does nothing if it is already running."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = Thread(
+                target=self._run, name="regium_klavye_presenter", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        """Stop the writer thread.
+
+        Args:
+            flush: Write the pending frame before stopping, otherwise it is dropped.
+        """
+        with self._cond:
+            if not flush and self._pending:
+                self._pending = False
+                self.dropped += 1
+                count("frames_dropped")
+            self._running = False
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def present(self, frame: Any) -> int:
+        """Queue a frame to be written, replacing any frame not written yet.
+
+        Args:
+            frame: A frame accepted by :meth:`Keyboard.set_frame`.
+
+        Returns:
+            Sequence number of the frame.
+        """
+        view = self._keyboard._frame_view(frame)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Presenter must be started before presenting.")
+            self._back[:] = view
+            if self._pending:
+                self.dropped += 1
+                count("frames_dropped")
+            self._pending = True
+            self._submitted += 1
+            self._cond.notify_all()
+            return self._submitted
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until the newest presented frame is written.
+
+        Args:
+            timeout: Maximum time to wait in seconds.
+
+        Returns:
+            False if the timeout passed before the frame was written.
+
+        Raises:
+            Exception: The error raised while writing the frame.
+        """
+        with self._cond:
+            target = self._submitted
+            done = self._cond.wait_for(
+                lambda: self._written >= target or not self._running, timeout
+            )
+            if self._error is not None:
+                raise self._error
+            return done and self._written >= target
+
+    def _run(self) -> None:
+        keyboard = self._keyboard
+        try:
+            with keyboard._session():
+                while True:
+                    with self._cond:
+                        self._cond.wait_for(lambda: self._pending or not self._running)
+                        if not self._pending:
+                            return
+                        self._back, self._front = self._front, self._back
+                        self._pending = False
+                        sequence = self._submitted
+
+                    error = None
+                    try:
+                        keyboard.set_frame(self._front)
+                        keyboard.apply_color()
+                    except Exception as _error:
+                        error = _error
+
+                    with self._cond:
+                        self._written = sequence
+                        self._error = error
+                        if error is None:
+                            self.presented += 1
+                        self._cond.notify_all()
+        except Exception as error:
+            # Opening the session failed, nothing can be written.
+            with self._cond:
+                self._error = error
+                self._written = self._submitted
+        finally:
+            with self._cond:
+                self._running = False
+                self._cond.notify_all()
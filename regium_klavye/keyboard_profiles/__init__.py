@@ -1,28 +1,146 @@
-"""Profile generator for device profiles."""
+"""Registry of device profiles.
+
+Profiles are only imported once a device they describe is looked up. Built in
+profiles are listed in a small (vendor ID, product ID) index below, adding a
+keyboard only requires adding its profile module and an index entry.
+
+Third party packages can provide profiles with entry points in the
+"regium_klavye.profiles" group. The entry point name should be the vendor ID and
+product ID in hexadecimal ("258a:005e") so the profile can be loaded lazily, the
+value is the module holding a ``profile`` variable ("package.module") or the
+variable itself ("package.module:my_profile"). Profiles with any other name are
+loaded once a lookup misses every indexed profile.
+"""
 
 from __future__ import annotations
 
+import re
+from collections.abc import Mapping
+from importlib import import_module
+from threading import RLock
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
+    from typing import Iterator
+
     from .profile_types import Profile
 
+ENTRY_POINT_GROUP = "regium_klavye.profiles"
+
+_BUILTIN_PROFILES: dict[tuple[int, int], str] = {
+    # (vendor id, product id): module relative to this package
+    (0x258A, 0x005E): ".profiles.RK68",
+}
+
+
+def _parse_device_ids(name: str) -> tuple[int, int] | None:
+    if (match := re.fullmatch(r"([0-9a-fA-F]{1,4}):([0-9a-fA-F]{1,4})", name)) is None:
+        return None
+    return int(match.group(1), 16), int(match.group(2), 16)
+
+
+class ProfileRegistry(Mapping):
+    """Mapping of (vendor ID, product ID) to profiles that loads them on demand.
+
+    Looking up or checking for a device only imports the profile module for that
+    device. Iterating over the registry loads every profile.
+
+    Args:
+        index: Built in (vendor ID, product ID) and their profile module.
+    """
+
+    def __init__(self, index: dict[tuple[int, int], str]):
+        self._index = dict(index)
+        self._profiles: dict[tuple[int, int], Profile] = {}
+        self._loaded: set[str] = set()
+        self._unindexed: list[str] = []
+        self._entry_points_loaded = False
+        self._lock = RLock()
+
+    def __repr__(self) -> str:
+        """Get registry as string."""
+        return (
+            f"ProfileRegistry(loaded={sorted(self._profiles)}, "
+            f"indexed={sorted(self._index)})"
+        )
 
-def _create_profiles() -> dict[tuple[int, int], "Profile"]:
-    from .profiles import RK68
+    def __getitem__(self, device_ids: tuple[int, int]) -> Profile:
+        """Get the profile for a (vendor ID, product ID), loading it if needed."""
+        try:
+            return self._profiles[device_ids]
+        except KeyError:
+            pass
 
-    # All profiles should be imported above.
+        with self._lock:
+            if (target := self._index.get(device_ids)) is None:
+                self._load_entry_points()
+                target = self._index.get(device_ids)
 
-    local_imports = locals()
-    # Take locals right after import so we can use create and use other variables.
+            if target is not None:
+                self._load(target)
+            else:
+                for target in self._unindexed:
+                    self._load(target)
+            return self._profiles[device_ids]
 
-    _profiles: dict[tuple[int, int], Profile] = dict()
+    def __contains__(self, device_ids: object) -> bool:
+        """Check if a device is supported without loading unrelated profiles."""
+        if device_ids in self._profiles or device_ids in self._index:
+            return True
+        try:
+            self[device_ids]  # type: ignore
+        except (KeyError, TypeError):
+            return False
+        return True
 
-    for module in local_imports.values():
-        profile: "Profile" = module.profile
-        for model in profile["models"]:
-            _profiles[(model["vendor_id"], model["product_id"])] = profile
-    return _profiles
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        """Iterate over every supported device, loading every profile."""
+        self._load_all()
+        return iter(dict(self._profiles))
+
+    def __len__(self) -> int:
+        """Get number of supported devices, loading every profile."""
+        self._load_all()
+        return len(self._profiles)
+
+    def register(self, profile: Profile) -> None:
+        """Register a profile for each model it defines.
+
+        Already registered devices are replaced.
+        """
+        with self._lock:
+            for model in profile["models"]:
+                self._profiles[(model["vendor_id"], model["product_id"])] = profile
+
+    def _load(self, target: str) -> None:
+        if target in self._loaded:
+            return
+        self._loaded.add(target)
+
+        module_name, _, attribute = target.partition(":")
+        module = import_module(module_name, __name__)
+        self.register(getattr(module, attribute or "profile"))
+
+    def _load_entry_points(self) -> None:
+        if self._entry_points_loaded:
+            return
+        self._entry_points_loaded = True
+
+        from importlib.metadata import entry_points
+
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            device_ids = _parse_device_ids(entry_point.name)
+            if device_ids is None:
+                self._unindexed.append(entry_point.value)
+            else:
+                # Built in profiles take precedence.
+                self._index.setdefault(device_ids, entry_point.value)
+
+    def _load_all(self) -> None:
+        with self._lock:
+            self._load_entry_points()
+            for target in (*self._index.values(), *self._unindexed):
+                self._load(target)
 
 
 def get_profile(vid: int, pid: int) -> Profile:
@@ -30,4 +148,9 @@ def get_profile(vid: int, pid: int) -> Profile:
     return PROFILES[(vid, pid)]
 
 
-PROFILES = _create_profiles()
+def register_profile(profile: Profile) -> None:
+    """Register a profile at runtime, see :meth:`ProfileRegistry.register`."""
+    PROFILES.register(profile)
+
+
+PROFILES = ProfileRegistry(_BUILTIN_PROFILES)
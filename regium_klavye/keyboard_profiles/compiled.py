@@ -0,0 +1,358 @@
+"""Data derived from profiles that is computed once per profile.
+
+Profiles describe keys as labels with (step, index) pairs for each color channel.
+Walking those pairs for every frame is slow, so they are compiled into flat
+offsets into one contiguous buffer that holds every color report back to back.
+Named groups of keys are compiled into the frame positions of their keys, and
+the layout into the position of each key on the keyboard. Parameter definitions
+are compiled into parsers, and encoded animation reports are cached.
+"""
+from __future__ import annotations
+
+import sys
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from typing import TYPE_CHECKING
+
+from ..helpers.param_parser import ParamParser
+
+if TYPE_CHECKING:
+    from types import ModuleType
+    from typing import Hashable, Iterable, Sequence
+
+    from .profile_types import Profile
+
+    Rect = tuple[float, float, float, float]
+
+ARROWS = ("UPAR", "LEAR", "DOAR", "RIAR")
+MODIFIERS = ("LSHFT", "RSHFT", "LCTRL", "RCTRL", "LALT", "RALT", "SPR", "FN")
+NUMBERS = ("1", "2", "3", "4", "5", "6", "7", "8", "9", "0")
+
+ANIMATION_CACHE_SIZE = 32
+"""Encoded animation reports kept for each profile, the least recently used go."""
+
+
+def loaded_numpy() -> ModuleType | None:
+    """Get NumPy if the application already imported it.
+
+    NumPy is optional and importing it takes longer than encoding many frames
+    without it, so it is never imported here. Applications that pass NumPy arrays
+    have it loaded already and get the vectorized paths.
+    """
+    return sys.modules.get("numpy")
+
+
+def layout_rows(
+    layout: Iterable[tuple[str | None, float]], width: float
+) -> list[list[tuple[str | None, float]]]:
+    """Split a layout into rows.
+
+    Layouts list keys row after row without separating them, a row ends once the
+    widths of its keys add up to the width of the keyboard.
+
+    Args:
+        layout: Labels and widths of keys, a None label being a gap.
+        width: Width of the keyboard in units.
+    """
+    rows: list[list[tuple[str | None, float]]] = [[]]
+    used = 0.0
+    for label, key_width in layout:
+        rows[-1].append((label, key_width))
+        used += key_width
+        # Widths such as 1.75 and 2.25 are exact in binary, but dont rely on it.
+        if used >= width - 1e-6:
+            rows.append([])
+            used = 0.0
+    if not rows[-1]:
+        rows.pop()
+    return rows
+
+
+class CompiledProfile:
+    """Precomputed lookup data for a profile.
+
+    The frame order of keys is the order they are defined in the profiles
+    ``present_keys``. A frame is laid out as red, green and blue values for each
+    key in that order.
+
+    Args:
+        profile: Profile to compile.
+    """
+
+    __slots__ = (
+        "key_order",
+        "key_positions",
+        "report_length",
+        "report_count",
+        "scatter",
+        "scatter_runs",
+        "color_template",
+        "color_report_slices",
+        "param_slice",
+        "groups",
+        "key_rects",
+        "key_centers",
+        "anim_params",
+        "color_params",
+        "_anim_base",
+        "_anim_options",
+        "_anim_padding",
+        "_anim_reports",
+        "_anim_lock",
+        "_np_scatter",
+    )
+
+    def __init__(self, profile: Profile):
+        steps = profile["commands"]["colors"]["steps"]
+        report_lengths = {len(step) for step in steps}
+        if len(report_lengths) != 1:
+            raise ValueError(
+                f"Color steps of {profile['name']} must all have the same length."
+            )
+
+        self.report_length: int = report_lengths.pop()
+        self.report_count: int = len(steps)
+
+        self.key_order: tuple[str, ...] = tuple(
+            key[0] for key in profile["present_keys"]
+        )
+        self.key_positions: dict[str, int] = {
+            label: position for position, label in enumerate(self.key_order)
+        }
+
+        # Offset of each color channel in the contiguous buffer, in frame order.
+        self.scatter = array(
+            "I",
+            (
+                step * self.report_length + index
+                for _, indexes in profile["present_keys"]
+                for step, index in indexes
+            ),
+        )
+
+        # Consecutive offsets are merged as (buffer offset, frame offset, length).
+        # Most keys have their channels next to each other and neighbouring keys
+        # are often next to each other as well, so this results in a few slices.
+        runs: list[list[int]] = []
+        for frame_offset, offset in enumerate(self.scatter):
+            if runs and runs[-1][0] + runs[-1][2] == offset:
+                runs[-1][2] += 1
+            else:
+                runs.append([offset, frame_offset, 1])
+        self.scatter_runs: tuple[tuple[int, int, int], ...] = tuple(
+            (offset, frame_offset, length) for offset, frame_offset, length in runs
+        )
+
+        # Every color report back to back followed by the color parameter report.
+        # Keyboards copy this once and encode into their copy for every frame.
+        colors = profile["commands"]["colors"]
+        param_base = bytes(colors["color_params"]["base"])
+        param_offset = self.report_count * self.report_length
+        param_length = colors["padding"]
+        self.color_template: bytes = b"".join(map(bytes, steps)) + param_base.ljust(
+            param_length, b"\x00"
+        )
+        step_slices = tuple(
+            slice(start, start + self.report_length)
+            for start in range(0, param_offset, self.report_length)
+        )
+        self.color_report_slices: tuple[slice, ...] = (
+            *step_slices,
+            slice(param_offset, param_offset + param_length),
+        )
+
+        # Part of the parameter report that holds the parameter values.
+        self.param_slice = slice(
+            param_offset + len(param_base), len(self.color_template)
+        )
+
+        self.groups: dict[str, tuple[int, ...]] = {}
+        self._compile_groups(profile)
+
+        # Rectangles as x, y, width and height in key units, in frame order.
+        self.key_rects: tuple[Rect, ...] = ()
+        self.key_centers: tuple[tuple[float, float], ...] = ()
+        self._compile_geometry(profile)
+
+        animations = profile["commands"]["animations"]
+        self.anim_params = ParamParser(animations["params"])
+        self.color_params = ParamParser(colors["color_params"]["params"])
+        self._anim_base = bytes(animations["base"])
+        self._anim_options: dict[str, bytes] = {
+            name: bytes(option["value"])
+            for name, option in animations["options"].items()
+        }
+        self._anim_padding: int = animations["padding"]
+        # Most recently used last, keyboards of the same profile share reports.
+        self._anim_reports: OrderedDict[Hashable, bytes] = OrderedDict()
+        self._anim_lock = Lock()
+
+        self._np_scatter = None
+
+    def _compile_groups(self, profile: Profile) -> None:
+        present = self.key_positions
+        builtin = {
+            "letters": sorted(label for label in present if _is_letter(label)),
+            "numbers": [label for label in NUMBERS if label in present],
+            "arrows": [label for label in ARROWS if label in present],
+            "modifiers": [label for label in MODIFIERS if label in present],
+        }
+        if layout := profile.get("layout"):
+            for number, row in enumerate(layout_rows(layout, profile["kb_size"][0]), 1):
+                # Keys taller than a row are listed in every row they cover.
+                labels = dict.fromkeys(label for label, _ in row if label in present)
+                builtin[f"row{number}"] = list(labels)
+
+        for name, labels in builtin.items():
+            if labels:
+                self.groups[name] = self.compile_group(labels)
+        for name, labels in profile.get("groups", {}).items():
+            try:
+                self.groups[name] = self.compile_group(labels)
+            except KeyError as error:
+                raise ValueError(
+                    f"Group {name} of {profile['name']} has unknown key {error}."
+                ) from None
+
+    def _compile_geometry(self, profile: Profile) -> None:
+        width, height = profile["kb_size"]
+        bounds: dict[str, list[float]] = {}
+        for y, row in enumerate(layout_rows(profile.get("layout", ()), width)):
+            x = 0.0
+            for label, key_width in row:
+                if label is None:
+                    pass
+                elif (rect := bounds.get(label)) is None:
+                    bounds[label] = [x, float(y), x + key_width, y + 1.0]
+                else:
+                    # Keys that span rows or arent rectangular are listed again.
+                    rect[0], rect[1] = min(rect[0], x), min(rect[1], y)
+                    rect[2], rect[3] = max(rect[2], x + key_width), max(rect[3], y + 1)
+                x += key_width
+
+        # Keys missing from the layout are placed in the middle of the keyboard.
+        middle = [width / 2, height / 2, width / 2, height / 2]
+        rects = [bounds.get(label, middle) for label in self.key_order]
+        self.key_rects = tuple(
+            (left, top, right - left, bottom - top)
+            for left, top, right, bottom in rects
+        )
+        self.key_centers = tuple(
+            ((left + right) / 2, (top + bottom) / 2)
+            for left, top, right, bottom in rects
+        )
+
+    def compile_group(self, labels: Iterable[str]) -> tuple[int, ...]:
+        """Get the frame positions of keys, duplicate keys are included once.
+
+        Raises:
+            KeyError: A key is not present on the keyboard.
+        """
+        positions = self.key_positions
+        return tuple(dict.fromkeys(positions[label] for label in labels))
+
+    def encode_animation(
+        self, anim_name: str, options: dict[str, Sequence[int]] | None = None
+    ) -> bytes:
+        """Get the report that sets an animation, encoding it on first use.
+
+        The last :data:`ANIMATION_CACHE_SIZE` reports are kept by animation and
+        options, switching between a few animations doesnt parse or encode again.
+
+        Args:
+            anim_name: Name of the animation.
+            options: Parameters of the animation, defaults fill in the rest.
+
+        Raises:
+            KeyError: The animation doesnt exist.
+            ValueError: A parameter is unknown or its value is invalid.
+        """
+        key = _options_key(anim_name, options)
+        if key is not None:
+            with self._anim_lock:
+                if (report := self._anim_reports.get(key)) is not None:
+                    self._anim_reports.move_to_end(key)
+                    return report
+
+        value = self._anim_options[anim_name]
+        params = self.anim_params.parse(options)
+        report = (
+            self._anim_base
+            + value
+            + bytes(val for param in params.values() for val in param)
+        ).ljust(self._anim_padding, b"\x00")
+
+        if key is not None:
+            with self._anim_lock:
+                self._anim_reports[key] = report
+                if len(self._anim_reports) > ANIMATION_CACHE_SIZE:
+                    self._anim_reports.popitem(last=False)
+        return report
+
+    @property
+    def frame_size(self) -> int:
+        """Number of bytes in a frame."""
+        return len(self.scatter)
+
+    @property
+    def np_scatter(self):
+        """Scatter offsets as a NumPy array, None if NumPy isnt loaded."""
+        if self._np_scatter is None and (np := loaded_numpy()) is not None:
+            self._np_scatter = np.frombuffer(self.scatter, dtype=np.uint32).astype(
+                np.intp
+            )
+        return self._np_scatter
+
+    def scatter_into(self, buffer: bytearray, frame: bytes | bytearray) -> None:
+        """Write a frame into the contiguous report buffer.
+
+        Args:
+            buffer: Buffer holding every color report back to back.
+            frame: Red, green and blue value of each key in frame order.
+        """
+        np_scatter = self.np_scatter
+        if np_scatter is not None:
+            np = sys.modules["numpy"]
+            np.frombuffer(buffer, dtype=np.uint8)[np_scatter] = np.frombuffer(
+                frame, dtype=np.uint8
+            )
+            return
+
+        view = memoryview(frame)
+        for offset, frame_offset, length in self.scatter_runs:
+            buffer[offset : offset + length] = view[
+                frame_offset : frame_offset + length
+            ]
+
+
+def _is_letter(label: str) -> bool:
+    return len(label) == 1 and "A" <= label <= "Z"
+
+
+def _options_key(
+    anim_name: str, options: dict[str, Sequence[int]] | None
+) -> Hashable | None:
+    """Get the cache key of animation options, None if they arent integer lists."""
+    if options is None:
+        return anim_name, None
+    items = []
+    for param, value in options.items():
+        if not isinstance(value, (list, tuple)) or not all(
+            [isinstance(val, int) for val in value]
+        ):
+            return None
+        items.append((param, tuple(value)))
+    return anim_name, frozenset(items)
+
+
+_COMPILED: dict[str, CompiledProfile] = {}
+
+
+def compile_profile(profile: Profile) -> CompiledProfile:
+    """Get the compiled version of a profile, compiling it on first use."""
+    try:
+        return _COMPILED[profile["name"]]
+    except KeyError:
+        compiled = _COMPILED[profile["name"]] = CompiledProfile(profile)
+        return compiled
@@ -22,4 +22,9 @@ class Profile(TypedDict):
     present_keys: tuple[
         tuple[str, tuple[tuple[int, int], tuple[int, int], tuple[int, int]]], ...
     ]
-    layout: NotRequired[tuple[tuple[str | None, int], ...]]
+    layout: NotRequired[tuple[tuple[str | None, float], ...]]
+    # Keys row after row, a row ends once its widths add up to the kb_size width.
+    groups: NotRequired[dict[str, tuple[str, ...]]]
+    # Named groups of keys in addition to the built in ones.
+    report_delay: NotRequired[float]
+    # Minimum delay in seconds between two reports. Defaults to 0.005.
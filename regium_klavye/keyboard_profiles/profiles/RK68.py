@@ -1,6 +1,8 @@
 profile = {
     "name": "Royal Kludge RK68",
     "kb_size": (16, 5),
+    #  Minimum delay in seconds between reports, can be overridden per device by calibrating.
+    "report_delay": 0.005,
     "models": (
         {
             "name": "Royal Kludge RK68",
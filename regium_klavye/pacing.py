@@ -0,0 +1,203 @@
+"""Pacing of reports written to keyboards.
+
+Keyboards can apply incorrect settings when reports are written faster than they
+can process them. Each keyboard waits for a minimum delay between two writes.
+The delay comes from a calibration stored per vendor ID and product ID, falling
+back to the profile default.
+"""
+from __future__ import annotations
+
+import os
+from time import monotonic, sleep
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Callable, Sequence
+
+    from .keyboard_parts import Keyboard
+
+DEFAULT_REPORT_DELAY = 0.005
+"""Delay in seconds used when neither a calibration or a profile value exists."""
+
+PACING_PATH = os.path.join(
+    os.environ.get("XDG_CONFIG_HOME") or os.path.expanduser("~/.config"),
+    "regium_klavye",
+    "pacing.json",
+)
+
+CALIBRATION_CANDIDATES = (0.005, 0.004, 0.003, 0.002, 0.0015, 0.001, 0.0005, 0.0)
+"""Delays tried during calibration, from the slowest to the fastest."""
+
+
+class Pacer:
+    """Enforce a minimum delay between consecutive writes.
+
+    Instead of sleeping after every write, a deadline is set once a write is done.
+    The next write only sleeps for whatever is left of it, so time spent encoding
+    or in between apply calls is not waited for twice.
+
+    Args:
+        delay: Minimum time in seconds between two writes.
+    """
+
+    __slots__ = ("delay", "_deadline")
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._deadline = 0.0
+
+    def __repr__(self) -> str:
+        """Get pacer as string."""
+        return f"Pacer(delay={self.delay})"
+
+    def wait(self) -> float:
+        """Block until the next write is allowed.
+
+        Returns:
+            Time in seconds that was waited for.
+        """
+        remaining = self._deadline - monotonic()
+        if remaining > 0:
+            sleep(remaining)
+            return remaining
+        return 0.0
+
+    def remaining(self) -> float:
+        """Get the time in seconds until the next write is allowed."""
+        return max(self._deadline - monotonic(), 0.0)
+
+    def mark(self) -> None:
+        """Record that a write was just done."""
+        self._deadline = monotonic() + self.delay
+
+
+def _device_key(vid: int, pid: int) -> str:
+    return f"{vid:>04x}:{pid:>04x}"
+
+
+_LOADED: dict[str, tuple[int, dict[str, float]]] = {}
+"""Delays loaded from each file with the modification time they were loaded at."""
+
+
+def _cached_report_delays(path: str) -> dict[str, float]:
+    """Load stored calibrations once, again only if the file changed."""
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    cached = _LOADED.get(path)
+    if cached is None or cached[0] != modified:
+        cached = _LOADED[path] = (modified, load_report_delays(path))
+    return cached[1]
+
+
+def load_report_delays(path: str = PACING_PATH) -> dict[str, float]:
+    """Load stored calibrations.
+
+    Keys are formatted as "vid:pid" in hexadecimal, for example "258a:005e".
+    A missing or unreadable file results in an empty dictionary.
+    """
+    try:
+        with open(path, "r") as file:
+            # Imported here since most users never calibrate and never have a file.
+            import json
+
+            delays = json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+    if not isinstance(delays, dict):
+        return {}
+    return {
+        key: float(delay)
+        for key, delay in delays.items()
+        if isinstance(delay, (int, float)) and delay >= 0
+    }
+
+
+def get_report_delay(
+    vid: int, pid: int, default: float = DEFAULT_REPORT_DELAY, path: str = PACING_PATH
+) -> float:
+    """Get the calibrated delay for a device or the default if it isnt calibrated.
+
+    The file is only read again when it changed, creating many keyboards doesnt
+    parse it for each of them.
+    """
+    return _cached_report_delays(path).get(_device_key(vid, pid), default)
+
+
+def save_report_delay(
+    vid: int, pid: int, delay: float | None, path: str = PACING_PATH
+) -> None:
+    """Store a calibrated delay for a device.
+
+    Passing None as the delay removes the stored calibration.
+    """
+    delays = load_report_delays(path)
+    if delay is None:
+        delays.pop(_device_key(vid, pid), None)
+    else:
+        delays[_device_key(vid, pid)] = delay
+
+    import json
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(delays, file, indent=2, sort_keys=True)
+
+
+def calibrate(
+    keyboard: Keyboard,
+    verify: Callable[[tuple[int, int, int], float], bool] | None = None,
+    candidates: Sequence[float] = CALIBRATION_CANDIDATES,
+    rounds: int = 3,
+) -> float:
+    """Find the smallest delay the keyboard accepts reports with.
+
+    Candidates are tried from the slowest to the fastest. Each candidate repaints
+    the whole keyboard a few times alternating between colors. The first candidate
+    that fails a write, or that is rejected by verify, stops the search.
+
+    Without a verify callable only write errors are detected. Since keyboards
+    rarely report a failure for a setting they applied incorrectly, the result is
+    then never below the profile default. Passing a verify callable (such as
+    asking the user) is needed to go below it.
+
+    Args:
+        keyboard: Keyboard to calibrate, the previous delay is restored after.
+        verify: Called with the last color applied and the candidate delay.
+            Should return True if the keyboard shows the color correctly.
+        candidates: Delays to try in seconds.
+        rounds: Full repaints done per candidate.
+
+    Returns:
+        The smallest delay that passed. The slowest candidate is returned if none
+        of them passed.
+    """
+    from .keyboard_profiles import PROFILES
+
+    colors = ((255, 0, 0), (0, 255, 0), (0, 0, 255))
+    candidates = sorted(candidates, reverse=True)
+    previous_delay = keyboard.report_delay
+    best = candidates[0]
+
+    try:
+        for delay in candidates:
+            keyboard.report_delay = delay
+            try:
+                for index in range(rounds):
+                    color = colors[index % len(colors)]
+                    keyboard.apply_color(color, force=True)
+            except (OSError, ValueError):
+                break
+            if verify is not None and not verify(color, delay):
+                break
+            best = delay
+    finally:
+        keyboard.report_delay = previous_delay
+
+    if verify is None:
+        # A candidate that wasnt looked at is only trusted down to the profile.
+        profile = PROFILES[(keyboard.vid, keyboard.pid)]
+        best = max(best, profile.get("report_delay", DEFAULT_REPORT_DELAY))
+    return best
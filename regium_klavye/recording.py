@@ -0,0 +1,451 @@
+"""Recording of the reports written to a keyboard and their replay.
+
+A recording holds exactly what apply methods wrote, in frames. A frame is the
+reports written by one apply call, along with the time it was written at.
+Reports that were already written once are stored once and referenced after,
+light shows repeat the same reports a lot and only changed reports are written to
+begin with.
+
+Replaying memory maps the recording and writes the stored reports as they are,
+nothing is encoded again. Frames are written in order and never dropped, since a
+frame only holds the reports that changed since the previous one.
+
+Example:
+    >>> with keyboard.recorder("show.rkrec"):
+    ...     keyboard.apply_custom_animation(render, duration=60)
+    >>> with Recording("show.rkrec") as recording:
+    ...     Player(keyboard, recording).run(loops=None)  # Until interrupted.
+
+File layout, every value is little endian:
+
+    header      Magic b"RKREC" and a null byte, version, vendor ID and product ID
+                as u16.
+    payloads    Every distinct report back to back.
+    tables      Aligned to 8 bytes, in this order:
+                time of each frame in seconds as f64,
+                offset of each payload as u64,
+                index of the first report of each frame and the end as u32,
+                payload of each written report as u32,
+                length of each payload as u32,
+                report type of each frame as u8.
+    footer      Offset of the tables as u64, duration in seconds as f64, number
+                of frames, written reports and payloads as u32 and b"RKEN".
+"""
+from __future__ import annotations
+
+import mmap
+import struct
+import sys
+from array import array
+from threading import Event, Lock
+from time import monotonic
+from typing import TYPE_CHECKING, TypedDict
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import BinaryIO, Iterable
+
+    from .keyboard_parts import Keyboard
+
+VERSION = 1
+
+LATE_THRESHOLD = 0.001
+"""Seconds a frame can be written after its time before it counts as late."""
+
+_HEADER = struct.Struct("<6sHHH")
+_HEADER_MAGIC = b"RKREC\x00"
+_FOOTER = struct.Struct("<QdIII4s")
+_FOOTER_MAGIC = b"RKEN"
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+class Recorder:
+    """Record the reports written to a keyboard into a file.
+
+    Recorders are usually created with :meth:`Keyboard.recorder` and used as a
+    context manager, which starts recording and finishes the file on exit.
+    Starting forgets what was written to the keyboard, so the first frame holds
+    every color report and the recording can be replayed from any state.
+
+    Args:
+        keyboard: Keyboard to record.
+        path: Path of the file to write, replaced if it exists.
+    """
+
+    __slots__ = (
+        "_keyboard",
+        "_path",
+        "_file",
+        "_lock",
+        "_payloads",
+        "_offsets",
+        "_lengths",
+        "_timestamps",
+        "_starts",
+        "_reports",
+        "_types",
+        "_start",
+    )
+
+    def __init__(self, keyboard: Keyboard, path: str):
+        self._keyboard = keyboard
+        self._path = path
+        self._file: BinaryIO | None = None
+        self._lock = Lock()
+        self._payloads: dict[bytes, int] = {}
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._timestamps = array("d")
+        self._starts = array("I")
+        self._reports = array("I")
+        self._types = array("B")
+        self._start: float | None = None
+
+    def __repr__(self) -> str:
+        """Get recorder as string."""
+        return (
+            f"Recorder(path={self._path!r}, frames={len(self._timestamps)}, "
+            f"payloads={len(self._payloads)})"
+        )
+
+    def __enter__(self) -> Recorder:
+        """Start recording."""
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Stop recording and finish the file."""
+        self.stop()
+
+    @property
+    def frames(self) -> int:
+        """Number of frames recorded."""
+        return len(self._timestamps)
+
+    def start(self) -> None:
+        """Start recording, does nothing if already recording.
+
+        Raises:
+            ValueError: Another recorder is recording the keyboard.
+        """
+        if self._file is not None:
+            return
+        if self._keyboard._recorder is not None:
+            raise ValueError("The keyboard is already being recorded.")
+
+        self._file = open(self._path, "wb")
+        keyboard = self._keyboard
+        self._file.write(
+            _HEADER.pack(_HEADER_MAGIC, VERSION, keyboard.vid, keyboard.pid)
+        )
+        keyboard.invalidate()
+        keyboard._recorder = self
+
+    def stop(self) -> None:
+        """Stop recording and write the tables, does nothing if not recording."""
+        if self._file is None:
+            return
+        self._keyboard._recorder = None
+
+        with self._lock:
+            file, self._file = self._file, None
+            duration = 0.0 if self._start is None else monotonic() - self._start
+            with file:
+                table_offset = file.tell()
+                if table_offset % 8:
+                    table_offset += file.write(b"\x00" * (8 - table_offset % 8))
+
+                starts = array("I", self._starts)
+                starts.append(len(self._reports))
+                for table in (
+                    self._timestamps,
+                    self._offsets,
+                    starts,
+                    self._reports,
+                    self._lengths,
+                    self._types,
+                ):
+                    file.write(_little_endian(table))
+                file.write(
+                    _FOOTER.pack(
+                        table_offset,
+                        duration,
+                        len(self._timestamps),
+                        len(self._reports),
+                        len(self._payloads),
+                        _FOOTER_MAGIC,
+                    )
+                )
+
+    def record(
+        self, started: float, reports: Iterable[bytes | bytearray], report_type: int
+    ) -> None:
+        """Add a frame, called by the keyboard once reports were written.
+
+        Args:
+            started: :func:`time.monotonic` time the write started at.
+            reports: Reports that were written.
+            report_type: Report type they were written with.
+        """
+        with self._lock:
+            if (file := self._file) is None:
+                return
+            if self._start is None:
+                self._start = started
+
+            payloads = self._payloads
+            self._timestamps.append(started - self._start)
+            self._starts.append(len(self._reports))
+            self._types.append(report_type)
+            for report in reports:
+                if (index := payloads.get(report := bytes(report))) is None:
+                    index = payloads[report] = len(payloads)
+                    self._offsets.append(file.tell())
+                    self._lengths.append(len(report))
+                    file.write(report)
+                self._reports.append(index)
+
+
+class Recording:
+    """A recording read from a file through a memory map.
+
+    Reports are views into the memory map, nothing is copied when reading them.
+    Views must not be kept after the recording is closed.
+
+    Args:
+        path: Path of the recording.
+
+    Raises:
+        ValueError: The file isnt a recording or has an unsupported version.
+    """
+
+    __slots__ = (
+        "vid",
+        "pid",
+        "duration",
+        "timestamps",
+        "_file",
+        "_mmap",
+        "_views",
+        "_payloads",
+        "_starts",
+        "_reports",
+        "_types",
+    )
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cant be mapped.
+            self._file.close()
+            raise ValueError(f"{path} is not a recording.") from None
+        self._views: list[memoryview] = []
+        try:
+            self._load(path)
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self, path: str) -> None:
+        data = self._mmap
+        if len(data) < _HEADER.size + _FOOTER.size:
+            raise ValueError(f"{path} is not a recording.")
+        magic, version, self.vid, self.pid = _HEADER.unpack_from(data)
+        (
+            table_offset,
+            self.duration,
+            frame_count,
+            report_count,
+            payload_count,
+            footer_magic,
+        ) = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+        if magic != _HEADER_MAGIC or footer_magic != _FOOTER_MAGIC:
+            raise ValueError(f"{path} is not a recording, or wasnt finished.")
+        if version != VERSION:
+            raise ValueError(f"Unsupported recording version {version}.")
+
+        offset = table_offset
+
+        def table(typecode: str, count: int) -> memoryview | array:
+            nonlocal offset
+            size = array(typecode).itemsize * count
+            view = memoryview(data)[offset : offset + size]
+            offset += size
+            self._views.append(view)
+            if sys.byteorder == "big" and size:
+                values = array(typecode, view.tobytes())
+                values.byteswap()
+                return values
+            values = view.cast(typecode)
+            self._views.append(values)
+            return values
+
+        # Time of each frame in seconds since the recording started.
+        self.timestamps = table("d", frame_count)
+        offsets = table("Q", payload_count)
+        self._starts = table("I", frame_count + 1)
+        self._reports = table("I", report_count)
+        lengths = table("I", payload_count)
+        self._types = table("B", frame_count)
+        if offset + _FOOTER.size != len(data):
+            raise ValueError(f"{path} is truncated or corrupted.")
+
+        view = memoryview(data)
+        self._views.append(view)
+        self._payloads = tuple(
+            view[start : start + length] for start, length in zip(offsets, lengths)
+        )
+        self._views.extend(self._payloads)
+
+    def __repr__(self) -> str:
+        """Get recording as string."""
+        return (
+            f"Recording(vid={self.vid}, pid={self.pid}, frames={len(self)}, "
+            f"duration={self.duration})"
+        )
+
+    def __enter__(self) -> Recording:
+        """Use the recording as a context manager, closing it on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the recording."""
+        self.close()
+
+    def __len__(self) -> int:
+        """Get number of frames."""
+        return len(self.timestamps)
+
+    def frame(self, index: int) -> tuple[float, int, tuple[memoryview, ...]]:
+        """Get the time, report type and reports of a frame."""
+        payloads = self._payloads
+        reports = self._reports[self._starts[index] : self._starts[index + 1]]
+        return (
+            self.timestamps[index],
+            self._types[index],
+            tuple(payloads[report] for report in reports),
+        )
+
+    def close(self) -> None:
+        """Release every view and unmap the file."""
+        for view in reversed(self._views):
+            view.release()
+        self._views.clear()
+        self._mmap.close()
+        self._file.close()
+
+
+class PlaybackStats(TypedDict):
+    """Counters of a finished playback."""
+
+    frames: int
+    # Frames written to the keyboard.
+
+    reports: int
+    # Reports written to the keyboard.
+
+    late: int
+    # Frames written after the time they were due, because writing fell behind.
+
+    elapsed: float
+    # Time in seconds the playback ran for.
+
+
+class Player:
+    """Replay a recording on a keyboard.
+
+    Frames are written at the time they were recorded at, relative to when the
+    playback started. The schedule is based on a monotonic clock, so time spent
+    writing does not make playback drift.
+
+    Args:
+        keyboard: Keyboard to write to.
+        recording: Recording to replay.
+        speed: Playback speed, 2 plays twice as fast.
+
+    Raises:
+        ValueError: The recording was made with another kind of keyboard.
+    """
+
+    __slots__ = ("keyboard", "recording", "speed", "_stop")
+
+    def __init__(self, keyboard: Keyboard, recording: Recording, speed: float = 1.0):
+        if (recording.vid, recording.pid) != (keyboard.vid, keyboard.pid):
+            raise ValueError(
+                f"Recording was made for {recording.vid:04x}:{recording.pid:04x}, "
+                f"not {keyboard.long_name}."
+            )
+        if speed <= 0:
+            raise ValueError("Speed must be above 0.")
+        self.keyboard = keyboard
+        self.recording = recording
+        self.speed = speed
+        self._stop = Event()
+
+    def stop(self) -> None:
+        """Stop a running playback, can be called from another thread."""
+        self._stop.set()
+
+    def run(self, loops: int | None = 1) -> PlaybackStats:
+        """Play the recording until stopped or every loop was played.
+
+        Args:
+            loops: Number of times to play the recording, forever if None.
+        """
+        self._stop.clear()
+        stats: PlaybackStats = {"frames": 0, "reports": 0, "late": 0, "elapsed": 0.0}
+        recording = self.recording
+        # A loop lasts as long as the recording did, at least as long as its frames.
+        period = max(recording.duration, recording.timestamps[-1] if recording else 0)
+        period /= self.speed
+        start = monotonic()
+
+        with self.keyboard._session():
+            loop = 0
+            while recording and (loops is None or loop < loops):
+                if not self._play(start + loop * period, stats):
+                    break
+                loop += 1
+
+            # Whatever was written before isnt what the keyboard shows anymore.
+            self.keyboard.invalidate()
+
+        stats["elapsed"] = monotonic() - start
+        return stats
+
+    def _play(self, start: float, stats: PlaybackStats) -> bool:
+        """Play every frame once, returns False if stopped."""
+        recording = self.recording
+        for index in range(len(recording)):
+            timestamp, report_type, reports = recording.frame(index)
+            remaining = start + timestamp / self.speed - monotonic()
+            if remaining > 0:
+                if self._stop.wait(remaining):
+                    return False
+            elif self._stop.is_set():
+                return False
+            elif remaining < -LATE_THRESHOLD:
+                stats["late"] += 1
+
+            self.keyboard._write_reports(reports, report_type)
+            stats["frames"] += 1
+            stats["reports"] += len(reports)
+        return True
@@ -1,32 +1,15 @@
 """Regium Klavye is a library to control various settings for supported keyboards."""
-import hid
-
-from .keyboard_parts import Keyboard
-from .keyboard_profiles import PROFILES
+from __future__ import annotations
 
+from typing import TYPE_CHECKING, TypedDict
 
-def _filter_device(device: dict) -> bool:
-    valid_device_ids = set(PROFILES.keys())
-    if (vid := device["vendor_id"], pid := device["product_id"]) in valid_device_ids:
-        for model in PROFILES[(vid, pid)]["models"]:
-            if model["endpoint"] == device["interface_number"]:
-                return True
-    return False
+from .devices import DEVICES
+from .keyboard_parts import Keyboard
 
+if TYPE_CHECKING:
+    from typing import Any, Callable, Iterable
 
-def _enumerate_devices(vid: int | None = None, pid: int | None = None) -> list[dict]:
-    match vid, pid:
-        case None, None:
-            devices = hid.enumerate()
-        case int(vid), None:
-            devices = hid.enumerate(vid)
-        case int(vid), int(pid):
-            devices = hid.enumerate(vid, pid)
-        case _, int(pid):
-            raise ValueError("Cannot take product id without vendor id.")
-        case _:
-            raise TypeError(f"Expected int or None, found {type(vid)} and {type(pid)}")
-    return [device for device in devices if _filter_device(device)]
+    from .keyboard_parts import AsyncKeyboard
 
 
 def get_keyboards(vid: int | None = None, pid: int | None = None) -> list[Keyboard]:
@@ -43,7 +26,7 @@ def get_keyboards(vid: int | None = None, pid: int | None = None) -> list[Keyboa
     """
     keyboards = [
         Keyboard(device["vendor_id"], device["product_id"], device["path"])
-        for device in _enumerate_devices(vid, pid)
+        for device in DEVICES.devices(vid, pid)
     ]
     keyboards.sort(key=lambda kb: kb.name + kb.long_name)
 
@@ -63,12 +46,115 @@ def get_keyboard(vid: int, pid: int | None = None) -> Keyboard:
     Raises:
         KeyboardNotFoundError: Requested keyboard was not found.
     """
-    for device in _enumerate_devices(vid, pid):
+    for device in DEVICES.devices(vid, pid):
         return Keyboard(device["vendor_id"], device["product_id"], device["path"])
 
     raise KeyboardNotFoundError(vid, pid)
 
 
+async def async_get_keyboards(
+    vid: int | None = None, pid: int | None = None
+) -> list[AsyncKeyboard]:
+    """Get all connected and supported keyboards without blocking the event loop.
+
+    Enumeration runs in the executor shared by async keyboards.
+    See :func:`get_keyboards` for the arguments.
+    """
+    import asyncio
+
+    from .keyboard_parts.async_keyboard import AsyncKeyboard, get_executor
+
+    loop = asyncio.get_running_loop()
+    keyboards = await loop.run_in_executor(get_executor(), get_keyboards, vid, pid)
+    return [AsyncKeyboard(keyboard) for keyboard in keyboards]
+
+
+async def async_get_keyboard(vid: int, pid: int | None = None) -> AsyncKeyboard:
+    """Get a single keyboard without blocking the event loop.
+
+    See :func:`get_keyboard` for the arguments.
+
+    Raises:
+        KeyboardNotFoundError: Requested keyboard was not found.
+    """
+    import asyncio
+
+    from .keyboard_parts.async_keyboard import AsyncKeyboard, get_executor
+
+    loop = asyncio.get_running_loop()
+    keyboard = await loop.run_in_executor(get_executor(), get_keyboard, vid, pid)
+    return AsyncKeyboard(keyboard)
+
+
+class FanOutResult(TypedDict):
+    """Outcome of a command applied to a single keyboard by :func:`fan_out`."""
+
+    keyboard: Keyboard
+    result: Any
+    # Value returned by the command, None if it raised.
+
+    error: Exception | None
+    # Exception raised by the command, None if it succeeded.
+
+
+def fan_out(
+    keyboards: Iterable[Keyboard],
+    command: Callable[[Keyboard], Any],
+    max_workers: int | None = None,
+) -> list[FanOutResult]:
+    """Apply a command to many keyboards in parallel.
+
+    The command is called with each keyboard on a thread pool, inside a session so
+    that several applies in the same command share one handle. Keyboards that point
+    to the same device are handled one after the other on the same thread, so
+    reports sent to a device stay in order. An exception raised for a keyboard is
+    stored in its result and doesnt affect the others.
+
+    Example:
+        >>> results = fan_out(get_keyboards(), lambda kb: kb.apply_color((0, 0, 255)))
+
+    Args:
+        keyboards: Keyboards to apply the command to.
+        command: Called with each keyboard.
+        max_workers: Maximum number of devices written to at the same time.
+            Defaults to the number of devices.
+
+    Returns:
+        A result for each keyboard in the same order they were provided.
+    """
+    keyboards = list(keyboards)
+    results: list[FanOutResult | None] = [None] * len(keyboards)
+    devices: dict[bytes, list[int]] = {}
+    for index, keyboard in enumerate(keyboards):
+        devices.setdefault(keyboard._path, []).append(index)
+
+    def apply(indexes: list[int]) -> None:
+        for index in indexes:
+            keyboard = keyboards[index]
+            try:
+                with keyboard._session():
+                    result = command(keyboard)
+            except Exception as error:
+                results[index] = {"keyboard": keyboard, "result": None, "error": error}
+            else:
+                results[index] = {"keyboard": keyboard, "result": result, "error": None}
+
+    if len(devices) <= 1:
+        for indexes in devices.values():
+            apply(indexes)
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(
+            max_workers=max_workers or len(devices),
+            thread_name_prefix="regium_klavye_fan_out",
+        ) as executor:
+            # Consume the iterator so exceptions from the pool itself are raised.
+            list(executor.map(apply, devices.values()))
+
+    return results  # type: ignore
+
+
 class KeyboardNotFoundError(Exception):
     """Raised if a single keyboard was requested but it wasnt found."""
 
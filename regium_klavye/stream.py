@@ -0,0 +1,264 @@
+"""Lighting streamed as raw RGB frames by another program.
+
+Frames are read from a file, a named pipe or stdin and have a fixed size, every
+pixel being a red, green and blue byte. Two frame formats are supported:
+
+Keys:
+    One pixel for each key in the order of :attr:`Keyboard.frame_keys`, which is
+    printed by ``regium_klavye stream --print-order``.
+Grid:
+    A row major grid of the keyboard layout, one pixel per key unit. The grid is
+    :attr:`Keyboard.size` wide and high, rounded up, and each key takes the color
+    of the cell its center lies in (see :attr:`Keyboard.key_centers`). Producers
+    can draw the layout without knowing the keys of the model.
+
+The producer sets the pace. Frames are read into a reused buffer and handed to
+a :class:`~regium_klavye.keyboard_parts.Presenter`, so writing to the keyboard
+never holds up reading. When more than :data:`MAX_BUFFERED` frames are waiting
+in a pipe the older ones are skipped, the newest complete frame is shown rather
+than building up latency.
+
+Example:
+    >>> with FrameStream(keyboard, open("/tmp/rk.fifo", "rb")) as stream:
+    ...     stream.run()
+"""
+from __future__ import annotations
+
+import os
+import sys
+from math import ceil
+from threading import Event
+from time import monotonic
+from typing import TYPE_CHECKING, TypedDict
+
+from .helpers.pipes import is_pipe, pending_bytes
+from .instrumentation import count
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import BinaryIO
+
+    from .keyboard_parts import Keyboard
+
+MAX_BUFFERED = 1
+"""Complete frames left waiting in a pipe before older frames are skipped."""
+
+
+def grid_size(keyboard: Keyboard) -> tuple[int, int]:
+    """Get the width and height of the grid format of a keyboard in pixels."""
+    width, height = keyboard.size
+    return ceil(width), ceil(height)
+
+
+def _grid_runs(keyboard: Keyboard) -> list[tuple[int, int, int]]:
+    """Get the copies that turn a grid into a frame.
+
+    Returns:
+        Offset in the frame, offset in the grid and length in bytes of each copy.
+        Neighbouring keys that are next to each other in the grid are merged.
+    """
+    width, height = grid_size(keyboard)
+    runs: list[tuple[int, int, int]] = []
+    for position, (x, y) in enumerate(keyboard.key_centers.values()):
+        column = min(max(int(x), 0), width - 1)
+        row = min(max(int(y), 0), height - 1)
+        frame_offset, grid_offset = position * 3, (row * width + column) * 3
+        if runs and (
+            runs[-1][0] + runs[-1][2] == frame_offset
+            and runs[-1][1] + runs[-1][2] == grid_offset
+        ):
+            runs[-1] = (runs[-1][0], runs[-1][1], runs[-1][2] + 3)
+        else:
+            runs.append((frame_offset, grid_offset, 3))
+    return runs
+
+
+class StreamStats(TypedDict):
+    """Counters of a finished stream."""
+
+    frames: int
+    # Frames read and presented.
+
+    skipped: int
+    # Frames skipped in the pipe because reading fell behind.
+
+    dropped: int
+    # Frames replaced by a newer one before they were written.
+
+    elapsed: float
+    # Time in seconds the stream ran for.
+
+
+class FrameReader:
+    """Read fixed size frames into a reused buffer.
+
+    Args:
+        file: Binary file to read from, "-" is stdin.
+        frame_size: Size of a frame in bytes.
+    """
+
+    __slots__ = ("file", "frame_size", "skipped", "_buffer", "_view", "_is_pipe")
+
+    def __init__(self, file: BinaryIO | str, frame_size: int):
+        if frame_size <= 0:
+            raise ValueError("Frame size must be above 0.")
+        if file == "-":
+            # A duplicate so closing the reader leaves stdin open.
+            file = os.fdopen(os.dup(sys.stdin.fileno()), "rb", buffering=0)
+        elif isinstance(file, str):
+            file = open(file, "rb", buffering=0)
+        self.file: BinaryIO = file
+        self.frame_size = frame_size
+
+        self.skipped = 0
+        """Number of frames skipped because reading fell behind."""
+
+        self._buffer = bytearray(frame_size)
+        self._view = memoryview(self._buffer)
+        self._is_pipe = is_pipe(file)
+
+    def __repr__(self) -> str:
+        """Get reader as string."""
+        return f"FrameReader(frame_size={self.frame_size}, skipped={self.skipped})"
+
+    def __enter__(self) -> FrameReader:
+        """Use the reader as a context manager."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the file."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the file."""
+        self._view.release()
+        self.file.close()
+
+    def read(self) -> memoryview | None:
+        """Read the next frame, skipping to the newest one if reading fell behind.
+
+        Returns:
+            A view of the frame that is overwritten by the next read, None when
+            the input ended. An incomplete frame at the end is discarded.
+        """
+        if self._is_pipe:
+            self._skip_stale()
+        if not self._fill():
+            return None
+        return self._view
+
+    def _fill(self) -> bool:
+        view, filled = self._view, 0
+        while filled < self.frame_size:
+            read = self.file.readinto(view[filled:])  # type: ignore
+            if not read:
+                return False
+            filled += read
+        return True
+
+    def _skip_stale(self) -> None:
+        pending = pending_bytes(self.file)
+        if pending is None:
+            return
+        stale = pending // self.frame_size - MAX_BUFFERED
+        if stale <= 0:
+            return
+        # Whole frames are skipped so the next read starts at a frame boundary.
+        for _ in range(stale):
+            if not self._fill():
+                return
+        self.skipped += stale
+        count("frames_dropped", stale)
+
+
+class FrameStream:
+    """Show frames read from a stream on a keyboard.
+
+    Args:
+        keyboard: Keyboard to show the frames on.
+        file: Binary file to read from, "-" is stdin.
+        grid: Read frames in the grid format instead of one pixel per key.
+    """
+
+    __slots__ = ("keyboard", "reader", "_runs", "_frame", "_stop")
+
+    def __init__(self, keyboard: Keyboard, file: BinaryIO | str, grid: bool = False):
+        self.keyboard = keyboard
+        frame_size = len(keyboard.frame_keys) * 3
+        self._runs: list[tuple[int, int, int]] | None = None
+        self._frame: bytearray | None = None
+        if grid:
+            width, height = grid_size(keyboard)
+            self._runs = _grid_runs(keyboard)
+            self._frame = bytearray(frame_size)
+            frame_size = width * height * 3
+        self.reader = FrameReader(file, frame_size)
+        self._stop = Event()
+
+    def __repr__(self) -> str:
+        """Get stream as string."""
+        return (
+            f"FrameStream(keyboard={self.keyboard!r}, grid={self._runs is not None}, "
+            f"skipped={self.reader.skipped})"
+        )
+
+    def __enter__(self) -> FrameStream:
+        """Use the stream as a context manager."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the input."""
+        self.close()
+
+    def close(self) -> None:
+        """Close the input."""
+        self.reader.close()
+
+    def stop(self) -> None:
+        """Stop a running stream after the frame being read.
+
+        Can be called from another thread, reading a pipe only stops once the
+        next frame arrives or the writer closes it.
+        """
+        self._stop.set()
+
+    def run(self) -> StreamStats:
+        """Show frames until the input ends or the stream is stopped.
+
+        Raises:
+            Exception: The error raised while writing the last frame.
+        """
+        self._stop.clear()
+        stats: StreamStats = {"frames": 0, "skipped": 0, "dropped": 0, "elapsed": 0.0}
+        runs, frame = self._runs, self._frame
+        start = monotonic()
+        skipped = self.reader.skipped
+
+        with self.keyboard.presenter() as presenter:
+            while not self._stop.is_set():
+                if (data := self.reader.read()) is None:
+                    break
+                if runs is not None:
+                    for frame_offset, grid_offset, length in runs:
+                        frame[frame_offset : frame_offset + length] = data[  # type: ignore
+                            grid_offset : grid_offset + length
+                        ]
+                    data = frame  # type: ignore
+                presenter.present(data)
+                stats["frames"] += 1
+            presenter.flush()
+
+        stats["skipped"] = self.reader.skipped - skipped
+        stats["dropped"] = presenter.dropped
+        stats["elapsed"] = monotonic() - start
+        return stats
@@ -0,0 +1,315 @@
+"""Transports used to enumerate and talk to HID devices.
+
+Two transports are available:
+
+``hidraw``
+    Linux only. Devices are enumerated from sysfs and opened as
+    ``/dev/hidrawN`` file descriptors. Feature reports are sent with the
+    ``HIDIOCSFEATURE`` ioctl and output reports with :func:`os.write`. It needs
+    neither hidapi nor any other dependency and file descriptors can be used with
+    :mod:`select`.
+``hidapi``
+    Uses the hid module provided by hidapi, available on every platform.
+
+hidraw is the default on Linux when the kernel exposes hidraw devices, hidapi is
+the default anywhere else. The default can be overridden with the
+``REGIUM_KLAVYE_TRANSPORT`` environment variable or :func:`set_transport`.
+
+hidapi is only installed by default off Linux. Linux systems without hidraw
+devices, such as some containers, need the "hidapi" extra.
+"""
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Protocol
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Any
+
+TRANSPORT_ENV = "REGIUM_KLAVYE_TRANSPORT"
+
+_HIDRAW_CLASS = "/sys/class/hidraw"
+
+
+class Device(Protocol):
+    """An open HID device, :class:`hid.device` has the same interface."""
+
+    def send_feature_report(self, data: bytes | bytearray) -> int:
+        """Send a feature report, the first byte is the report ID."""
+        ...
+
+    def write(self, data: bytes | bytearray) -> int:
+        """Send an output report, the first byte is the report ID."""
+        ...
+
+    def close(self) -> None:
+        """Close the device."""
+        ...
+
+
+class Transport:
+    """Enumerates and opens HID devices.
+
+    Subclasses implement :meth:`enumerate` and :meth:`open`.
+    """
+
+    __slots__ = ()
+
+    name = ""
+
+    def __repr__(self) -> str:
+        """Get transport as string."""
+        return f"{type(self).__name__}()"
+
+    def enumerate(self, vid: int = 0, pid: int = 0) -> list[dict]:
+        """Enumerate HID devices.
+
+        Each device is a dictionary with at least "vendor_id", "product_id",
+        "interface_number" and "path" keys, like :func:`hid.enumerate`.
+
+        Args:
+            vid: Only return devices with this vendor ID, 0 for any.
+            pid: Only return devices with this product ID, 0 for any.
+        """
+        raise NotImplementedError
+
+    def open(self, path: bytes) -> Device:
+        """Open a device by the path it was enumerated with.
+
+        Raises:
+            OSError: The device couldnt be opened.
+        """
+        raise NotImplementedError
+
+
+def _import_hid() -> Any:
+    try:
+        import hid
+    except ImportError:
+        raise ModuleNotFoundError(
+            "hidapi is required when hidraw devices are not available, install "
+            'the "hidapi" extra.',
+            name="hid",
+        ) from None
+    return hid
+
+
+class HidapiTransport(Transport):
+    """Transport using hidapi.
+
+    Raises:
+        ModuleNotFoundError: On use, if hidapi isnt installed.
+    """
+
+    __slots__ = ()
+
+    name = "hidapi"
+
+    def enumerate(self, vid: int = 0, pid: int = 0) -> list[dict]:  # noqa: D102
+        return _import_hid().enumerate(vid, pid)
+
+    def open(self, path: bytes) -> Device:  # noqa: D102
+        dev = _import_hid().device()
+        dev.open_path(path)
+        dev.set_nonblocking(True)
+        return dev
+
+
+def _hidiocsfeature(length: int) -> int:
+    # _IOC(_IOC_WRITE | _IOC_READ, 'H', 0x06, length) from linux/hidraw.h.
+    return (3 << 30) | (length << 16) | (ord("H") << 8) | 0x06
+
+
+class HidrawDevice:
+    """A hidraw device opened as a non blocking file descriptor.
+
+    Args:
+        path: Path of the device node, such as b"/dev/hidraw0".
+    """
+
+    __slots__ = ("_fd",)
+
+    def __init__(self, path: bytes):
+        self._fd: int | None = os.open(path, os.O_RDWR | os.O_NONBLOCK | os.O_CLOEXEC)
+
+    def __repr__(self) -> str:
+        """Get device as string."""
+        return f"HidrawDevice(fd={self._fd})"
+
+    def __enter__(self) -> HidrawDevice:
+        """Use the device as a context manager, closing it on exit."""
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
+    ) -> None:
+        """Close the device."""
+        self.close()
+
+    def fileno(self) -> int:
+        """Get the file descriptor, for use with :mod:`select`.
+
+        Raises:
+            ValueError: The device is closed.
+        """
+        if self._fd is None:
+            raise ValueError("I/O operation on closed device.")
+        return self._fd
+
+    def send_feature_report(self, data: bytes | bytearray) -> int:
+        """Send a feature report, the first byte is the report ID.
+
+        Raises:
+            OSError: The report couldnt be sent.
+        """
+        import fcntl
+
+        # The ioctl writes the report back into the buffer, so it must be mutable.
+        buffer = bytearray(data)
+        return fcntl.ioctl(self.fileno(), _hidiocsfeature(len(buffer)), buffer)
+
+    def write(self, data: bytes | bytearray) -> int:
+        """Send an output report, the first byte is the report ID.
+
+        Raises:
+            OSError: The report couldnt be sent.
+        """
+        return os.write(self.fileno(), data)
+
+    def close(self) -> None:
+        """Close the device, does nothing if already closed."""
+        if self._fd is not None:
+            fd, self._fd = self._fd, None
+            os.close(fd)
+
+
+def _read_uevent(path: str) -> dict[str, str]:
+    with open(path) as file:
+        return dict(line.rstrip("\n").split("=", 1) for line in file if "=" in line)
+
+
+class HidrawTransport(Transport):
+    """Transport using Linux hidraw device nodes directly.
+
+    Args:
+        sysfs: Directory with a directory for each hidraw device.
+        dev: Directory holding the device nodes.
+    """
+
+    __slots__ = ("sysfs", "dev")
+
+    name = "hidraw"
+
+    def __init__(self, sysfs: str = _HIDRAW_CLASS, dev: str = "/dev"):
+        self.sysfs = sysfs
+        self.dev = dev
+
+    def __repr__(self) -> str:
+        """Get transport as string."""
+        return f"HidrawTransport(sysfs={self.sysfs!r}, dev={self.dev!r})"
+
+    def enumerate(self, vid: int = 0, pid: int = 0) -> list[dict]:  # noqa: D102
+        try:
+            names = sorted(os.listdir(self.sysfs))
+        except FileNotFoundError:
+            return []
+
+        devices = []
+        for name in names:
+            hid_device = os.path.join(self.sysfs, name, "device")
+            try:
+                uevent = _read_uevent(os.path.join(hid_device, "uevent"))
+                # HID_ID is "bus:vendor:product", each in hexadecimal.
+                _, vendor_id, product_id = (
+                    int(value, 16) for value in uevent["HID_ID"].split(":")
+                )
+            except (OSError, KeyError, ValueError):
+                # Removed while enumerating, or not a device we can identify.
+                continue
+            if vid not in (0, vendor_id) or pid not in (0, product_id):
+                continue
+
+            devices.append(
+                {
+                    "vendor_id": vendor_id,
+                    "product_id": product_id,
+                    "interface_number": self._interface_number(hid_device),
+                    "path": os.path.join(self.dev, name).encode(),
+                    "product_string": uevent.get("HID_NAME", ""),
+                    "serial_number": uevent.get("HID_UNIQ", ""),
+                }
+            )
+        return devices
+
+    @staticmethod
+    def _interface_number(hid_device: str) -> int:
+        # USB HID devices are children of the USB interface they belong to.
+        try:
+            with open(os.path.join(hid_device, "..", "bInterfaceNumber")) as file:
+                return int(file.read(), 16)
+        except (OSError, ValueError):
+            # Not a USB device, hidapi reports -1 as well.
+            return -1
+
+    def open(self, path: bytes) -> Device:  # noqa: D102
+        return HidrawDevice(path)
+
+
+TRANSPORTS: dict[str, type[Transport]] = {
+    HidrawTransport.name: HidrawTransport,
+    HidapiTransport.name: HidapiTransport,
+}
+
+_transport: Transport | None = None
+
+
+def default_transport() -> Transport:
+    """Create the transport that should be used on this system.
+
+    Raises:
+        ValueError: The environment variable names an unknown transport.
+    """
+    if name := os.environ.get(TRANSPORT_ENV):
+        try:
+            return TRANSPORTS[name]()
+        except KeyError:
+            raise ValueError(
+                f"Unknown transport {name!r} in {TRANSPORT_ENV}, expected one of "
+                f"{', '.join(TRANSPORTS)}."
+            ) from None
+
+    if os.path.isdir(_HIDRAW_CLASS):
+        return HidrawTransport()
+    return HidapiTransport()
+
+
+def get_transport() -> Transport:
+    """Get the transport in use, see :func:`default_transport` for the default."""
+    global _transport
+    if _transport is None:
+        _transport = default_transport()
+    return _transport
+
+
+def set_transport(transport: Transport | str | None) -> None:
+    """Set the transport used to enumerate and open devices.
+
+    Keyboards that have an open session keep using the device they opened.
+
+    Args:
+        transport: A transport, the name of one, or None for the default.
+
+    Raises:
+        ValueError: The name of an unknown transport was provided.
+    """
+    global _transport
+    if isinstance(transport, str):
+        try:
+            transport = TRANSPORTS[transport]()
+        except KeyError:
+            raise ValueError(f"Unknown transport {transport!r}.") from None
+    _transport = transport
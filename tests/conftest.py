@@ -0,0 +1,89 @@
+"""Fixtures shared by the tests.
+
+Keyboards are reported by a fake transport that records every report written to
+them, so no physical keyboard is needed.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from regium_klavye.transports import Transport, get_transport, set_transport
+
+if TYPE_CHECKING:
+    from typing import Iterator
+
+    from regium_klavye.keyboard_parts import Keyboard
+
+RK68 = (0x258A, 0x005E, 1)
+"""Vendor ID, product ID and interface of the keyboard reported by the fake."""
+
+
+class FakeDevice:
+    """Open device that records reports instead of writing them."""
+
+    __slots__ = ("reports", "is_open")
+
+    def __init__(self, reports: list[bytes]):
+        self.reports = reports
+        self.is_open = True
+
+    def send_feature_report(self, data: bytes | bytearray) -> int:  # noqa: D102
+        if not self.is_open:
+            raise ValueError("Device is closed.")
+        self.reports.append(bytes(data))
+        return len(data)
+
+    write = send_feature_report
+
+    def close(self) -> None:  # noqa: D102
+        self.is_open = False
+
+
+class FakeTransport(Transport):
+    """Transport reporting one supported keyboard that opens :class:`FakeDevice`."""
+
+    __slots__ = ("reports",)
+
+    name = "fake"
+
+    def __init__(self, reports: list[bytes]):
+        self.reports = reports
+
+    def enumerate(self, vid: int = 0, pid: int = 0) -> list[dict]:  # noqa: D102
+        if vid not in (0, RK68[0]) or pid not in (0, RK68[1]):
+            return []
+        return [
+            {
+                "vendor_id": RK68[0],
+                "product_id": RK68[1],
+                "interface_number": RK68[2],
+                "path": b"/dev/fake-keyboard",
+            }
+        ]
+
+    def open(self, path: bytes) -> FakeDevice:  # noqa: D102
+        return FakeDevice(self.reports)
+
+
+@pytest.fixture
+def reports() -> Iterator[list[bytes]]:
+    """Use the fake transport for a test, yields every report written."""
+    written: list[bytes] = []
+    original = get_transport()
+    set_transport(FakeTransport(written))
+    try:
+        yield written
+    finally:
+        set_transport(original)
+
+
+@pytest.fixture
+def keyboard(reports: list[bytes]) -> Keyboard:
+    """Keyboard reported by the fake transport, written to without pacing."""
+    from regium_klavye.rkapi import get_keyboard
+
+    keyboard = get_keyboard(*RK68[:2])
+    keyboard.report_delay = 0
+    return keyboard
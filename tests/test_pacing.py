@@ -0,0 +1,96 @@
+"""Tests of stored report delays and calibration."""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from regium_klavye import pacing
+from regium_klavye.keyboard_profiles import PROFILES
+
+
+def _pacing_path(env: dict[str, str]) -> str:
+    """Get the pacing path a new process would use with the environment."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "from regium_klavye import pacing; print(pacing.PACING_PATH)",
+        ],
+        env={**os.environ, **env},
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return result.stdout.strip()
+
+
+def test_path_follows_xdg_config_home(tmp_path):
+    assert _pacing_path({"XDG_CONFIG_HOME": str(tmp_path)}) == str(
+        tmp_path / "regium_klavye" / "pacing.json"
+    )
+
+
+def test_path_without_xdg_config_home(tmp_path):
+    assert _pacing_path({"XDG_CONFIG_HOME": "", "HOME": str(tmp_path)}) == str(
+        tmp_path / ".config" / "regium_klavye" / "pacing.json"
+    )
+
+
+def test_saved_delay_is_loaded(tmp_path):
+    path = str(tmp_path / "regium_klavye" / "pacing.json")
+    assert pacing.get_report_delay(0x258A, 0x005E, 0.004, path) == 0.004
+
+    pacing.save_report_delay(0x258A, 0x005E, 0.002, path)
+    assert pacing.get_report_delay(0x258A, 0x005E, 0.004, path) == 0.002
+    with open(path) as file:
+        assert json.load(file) == {"258a:005e": 0.002}
+
+    pacing.save_report_delay(0x258A, 0x005E, None, path)
+    assert pacing.get_report_delay(0x258A, 0x005E, 0.004, path) == 0.004
+
+
+def test_cache_reads_file_again_only_when_rewritten(tmp_path, monkeypatch):
+    path = str(tmp_path / "pacing.json")
+    pacing.save_report_delay(0x258A, 0x005E, 0.002, path)
+
+    loads = []
+    load = pacing.load_report_delays
+    monkeypatch.setattr(
+        pacing, "load_report_delays", lambda path: loads.append(path) or load(path)
+    )
+    for _ in range(3):
+        assert pacing.get_report_delay(0x258A, 0x005E, path=path) == 0.002
+    assert len(loads) == 1
+
+    with open(path, "w") as file:
+        json.dump({"258a:005e": 0.001}, file)
+    # Rewrites within the resolution of the file system keep the same time.
+    modified = os.stat(path).st_mtime_ns + 1_000_000
+    os.utime(path, ns=(modified, modified))
+    assert pacing.get_report_delay(0x258A, 0x005E, path=path) == 0.001
+    assert len(loads) == 2
+
+
+def test_calibration_without_verify_is_clamped_to_profile(keyboard, reports):
+    profile_delay = PROFILES[(keyboard.vid, keyboard.pid)]["report_delay"]
+    # The fake keyboard never fails a write, so every candidate passes.
+    assert min(pacing.CALIBRATION_CANDIDATES) < profile_delay
+    assert pacing.calibrate(keyboard) == profile_delay
+    assert reports
+
+
+@pytest.mark.parametrize("rejected", [0.002, 0.0005])
+def test_calibration_with_verify_goes_below_profile(keyboard, rejected):
+    def verify(color, delay):
+        return delay > rejected
+
+    delay = pacing.calibrate(keyboard, verify)
+    assert delay == min(d for d in pacing.CALIBRATION_CANDIDATES if d > rejected)
+    # The delay in use before calibrating is restored.
+    assert keyboard.report_delay == 0
@@ -0,0 +1,105 @@
+"""Tests of parameter parsing, color checks and cached animation reports."""
+from __future__ import annotations
+
+import pytest
+
+from regium_klavye.helpers import validate_color
+from regium_klavye.helpers.param_parser import ParamParser, parse_params
+from regium_klavye.keyboard_profiles import PROFILES
+from regium_klavye.keyboard_profiles.compiled import (
+    ANIMATION_CACHE_SIZE,
+    CompiledProfile,
+)
+
+PROFILE = PROFILES[(0x258A, 0x005E)]
+ANIM_PARAMS = PROFILE["commands"]["animations"]["params"]
+ANIMATIONS = list(PROFILE["commands"]["animations"]["options"])
+
+
+def test_unknown_param_raises():
+    parser = ParamParser(ANIM_PARAMS)
+    with pytest.raises(ValueError, match="unknown"):
+        parser.parse({"speed": [1], "unknown": [1]})
+    with pytest.raises(ValueError, match="unknown"):
+        parse_params({"unknown": [1]}, ANIM_PARAMS)
+
+
+def test_unknown_param_raises_on_keyboard(keyboard):
+    with pytest.raises(ValueError):
+        keyboard.set_animation(keyboard.anim_options[0], {"unknown": [1]})
+    with pytest.raises(ValueError):
+        keyboard.set_color_params({"unknown": 1})
+
+
+def test_missing_params_use_defaults():
+    parser = ParamParser(ANIM_PARAMS)
+    assert parser.parse(None) == parser.defaults
+    assert parser.parse({"speed": [1]}) == {**parser.defaults, "speed": [1]}
+
+
+@pytest.mark.parametrize("rgb", [(256, 0, 0), (0, -1, 0), (0, 0, 1000)])
+def test_out_of_range_color_raises(rgb):
+    with pytest.raises(ValueError, match="between 0 and 255"):
+        validate_color(rgb)
+
+
+@pytest.mark.parametrize("rgb", [(0, 0), (0, 0, 0, 0)])
+def test_wrong_length_color_raises(rgb):
+    with pytest.raises(ValueError):
+        validate_color(rgb)
+
+
+def test_out_of_range_color_writes_nothing(keyboard, reports):
+    frame = keyboard.get_frame()
+    with pytest.raises(ValueError):
+        keyboard.apply_color((0, 0, 256))
+    with pytest.raises(ValueError):
+        keyboard.set_key_color("ESC", (300, 0, 0))
+    assert reports == []
+    assert keyboard.get_frame() == frame
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        None,
+        {},
+        {"speed": [1]},
+        {"speed": [4], "color": [255, 0, 100], "sleep": [1]},
+        {"brightness": (2,), "color_mix": [1]},
+    ],
+)
+def test_cached_animation_matches_uncached(options):
+    compiled = CompiledProfile(PROFILE)
+    for anim in ANIMATIONS:
+        first = compiled.encode_animation(anim, options)
+        # A hit returns the cached report, it must be what a fresh encode gives.
+        assert compiled.encode_animation(anim, options) is first
+        assert CompiledProfile(PROFILE).encode_animation(anim, options) == first
+
+
+def test_cache_key_ignores_option_order():
+    compiled = CompiledProfile(PROFILE)
+    anim = ANIMATIONS[0]
+    first = compiled.encode_animation(anim, {"speed": [1], "sleep": [1]})
+    assert compiled.encode_animation(anim, {"sleep": [1], "speed": [1]}) is first
+    assert compiled.encode_animation(anim, {"speed": [2], "sleep": [1]}) != first
+
+
+def test_evicted_animation_is_encoded_again():
+    compiled = CompiledProfile(PROFILE)
+    anim = ANIMATIONS[0]
+    first = compiled.encode_animation(anim, {"color": [0, 0, 0]})
+    for value in range(1, ANIMATION_CACHE_SIZE + 1):
+        compiled.encode_animation(anim, {"color": [value, 0, 0]})
+    again = compiled.encode_animation(anim, {"color": [0, 0, 0]})
+    assert again is not first
+    assert again == first
+
+
+def test_invalid_options_are_not_cached():
+    compiled = CompiledProfile(PROFILE)
+    anim = ANIMATIONS[0]
+    with pytest.raises(ValueError):
+        compiled.encode_animation(anim, {"speed": [99]})
+    assert not compiled._anim_reports
@@ -0,0 +1,109 @@
+"""Tests of the recording file format."""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from regium_klavye.recording import Player, Recording
+
+
+def _record(keyboard, reports, path) -> list[list[bytes]]:
+    """Record a few applies, returns the reports written by each of them."""
+    frames: list[list[bytes]] = []
+    anim = keyboard.anim_options[0]
+    with keyboard.recorder(str(path)):
+        for apply in (
+            lambda: keyboard.apply_color((255, 0, 0)),
+            lambda: keyboard.set_key_color("ESC", (0, 255, 0)),
+            lambda: keyboard.apply_color(),
+            lambda: keyboard.set_key_color("ESC", (255, 0, 0)),
+            lambda: keyboard.apply_color(),
+            lambda: keyboard.set_animation(anim),
+            lambda: keyboard.apply_animation(),
+        ):
+            written = len(reports)
+            apply()
+            if len(reports) > written:
+                frames.append(reports[written:])
+            time.sleep(0.01)
+    return frames
+
+
+def test_round_trip(keyboard, reports, tmp_path):
+    path = tmp_path / "show.rkrec"
+    frames = _record(keyboard, reports, path)
+    report_type = keyboard._colors["report_type"]
+
+    with Recording(str(path)) as recording:
+        assert (recording.vid, recording.pid) == (keyboard.vid, keyboard.pid)
+        assert len(recording) == len(frames) == 4
+
+        timestamps = list(recording.timestamps)
+        assert timestamps[0] == 0.0
+        assert timestamps == sorted(timestamps)
+        assert timestamps[1] >= 0.01
+        assert recording.duration >= timestamps[-1]
+
+        for index, expected in enumerate(frames):
+            timestamp, frame_type, frame_reports = recording.frame(index)
+            assert timestamp == timestamps[index]
+            assert frame_type == report_type
+            assert [bytes(report) for report in frame_reports] == expected
+
+
+def test_repeated_reports_are_stored_once(keyboard, reports, tmp_path):
+    path = tmp_path / "show.rkrec"
+    frames = _record(keyboard, reports, path)
+
+    with Recording(str(path)) as recording:
+        # The key went back to red, so the third frame repeats reports of the first.
+        assert set(frames[2]) <= set(frames[0])
+        distinct = {report for frame in frames for report in frame}
+        assert len(recording._payloads) == len(distinct)
+
+
+def test_replay_writes_recorded_reports(keyboard, reports, tmp_path):
+    path = tmp_path / "show.rkrec"
+    frames = _record(keyboard, reports, path)
+
+    reports.clear()
+    with Recording(str(path)) as recording:
+        stats = Player(keyboard, recording, speed=10).run()
+    assert stats["frames"] == len(frames)
+    assert reports == [report for frame in frames for report in frame]
+
+
+@pytest.mark.parametrize("cut", [1, 8, 40])
+def test_truncated_file(keyboard, reports, tmp_path, cut):
+    path = tmp_path / "show.rkrec"
+    _record(keyboard, reports, path)
+    data = path.read_bytes()
+    path.write_bytes(data[:-cut])
+
+    with pytest.raises(ValueError):
+        Recording(str(path))
+
+
+def test_corrupted_table_offset(keyboard, reports, tmp_path):
+    path = tmp_path / "show.rkrec"
+    _record(keyboard, reports, path)
+    data = bytearray(path.read_bytes())
+    # The footer starts with the offset of the tables.
+    data[-32:-24] = (8).to_bytes(8, "little")
+    path.write_bytes(bytes(data))
+
+    with pytest.raises(ValueError, match="truncated or corrupted"):
+        Recording(str(path))
+
+
+def test_not_a_recording(tmp_path):
+    empty = tmp_path / "empty.rkrec"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError, match="is not a recording"):
+        Recording(str(empty))
+
+    other = tmp_path / "other.rkrec"
+    other.write_bytes(b"\x00" * 64)
+    with pytest.raises(ValueError, match="is not a recording"):
+        Recording(str(other))
@@ -0,0 +1,64 @@
+"""Tests of keyboard transactions."""
+from __future__ import annotations
+
+import pytest
+
+from regium_klavye.rkapi import get_keyboard
+
+
+def test_raising_block_writes_nothing_and_rolls_back(keyboard, reports):
+    anim = keyboard.anim_options[0]
+    keyboard.set_color((0, 0, 255))
+    keyboard.set_color_params({"sleep": [2]})
+    keyboard.set_animation(anim, {"speed": [2]})
+    keyboard.add_group("corner", ["ESC"])
+    frame, groups = keyboard.get_frame(), keyboard.groups
+    anim_data = bytes(keyboard._final_anim_data)
+    color_params = dict(keyboard._current_color_params)
+    reports.clear()
+
+    with pytest.raises(RuntimeError):
+        with keyboard.transaction():
+            keyboard.set_color((255, 0, 0))
+            keyboard.set_color_params({"sleep": [4]})
+            keyboard.apply_color()
+            keyboard.set_animation(anim, {"speed": [4]})
+            keyboard.apply_animation()
+            keyboard.add_group("esc_and_tab", ["ESC", "TAB"])
+            keyboard.remove_group("corner")
+            raise RuntimeError
+
+    assert reports == []
+    assert keyboard.get_frame() == frame
+    assert keyboard.groups == groups
+    assert bytes(keyboard._final_anim_data) == anim_data
+    assert keyboard._current_color_params == color_params
+
+
+def test_several_applies_write_final_reports_once(keyboard, reports):
+    with keyboard.transaction():
+        keyboard.set_color((255, 0, 0))
+        keyboard.apply_color()
+        keyboard.set_key_color("ESC", (0, 255, 0))
+        keyboard.apply_color()
+        keyboard.set_group_color("arrows", (0, 0, 255))
+        keyboard.apply_color()
+        assert reports == []
+    written = list(reports)
+
+    # A keyboard that only applies the final colors writes the same reports.
+    reports.clear()
+    direct = get_keyboard(keyboard.vid, keyboard.pid)
+    direct.report_delay = 0
+    direct.set_color((255, 0, 0))
+    direct.set_key_color("ESC", (0, 255, 0))
+    direct.set_group_color("arrows", (0, 0, 255))
+    direct.apply_color()
+    assert written == reports
+    assert len(written) == len(set(written))
+
+    # Nothing changed since, so nothing is written again.
+    reports.clear()
+    with keyboard.transaction():
+        keyboard.apply_color()
+    assert reports == []